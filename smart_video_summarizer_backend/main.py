@@ -12,13 +12,22 @@ import json
 
 
 
-from services.summarization import summarize_text, extract_and_summarize
+from services.summarization import summarize_text_stream, extract_and_summarize_stream, collect_result
+from services.cascade import summary_cascade, BASE_LENGTH, BASE_FORMAT, VIDEO_BASE_LENGTH
 from services.export_service import export_service
 from services.video_service import video_service
 from services.video_service import video_service
-from database import engine, get_db
+from services.chunk_cache import chunk_score_cache
+from services.llm_client import local_llm
+from services.llm_cache import llm_cache
+from services.concurrency import limiter_stats
+from services.cloud_dispatch import cloud_dispatcher
+from services.quota import quota_ledger
+from services.model_tiers import model_tiers
+from services.token_budget import token_counter
+from database import engine, get_db, SessionLocal
 import models
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 
 # Global Task Registry for Cancellation
 active_tasks: Dict[str, bool] = {}
@@ -28,6 +37,11 @@ models.Base.metadata.create_all(bind=engine)
 
 app = FastAPI(title="Smart AI Video Summarizer Backend")
 
+@app.on_event("startup")
+def preload_local_model():
+    # Load Gemma 3 into VRAM now instead of on the first request (runs in the background)
+    local_llm.preload()
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -49,6 +63,9 @@ class TextSummaryRequest(BaseModel):
     format_mode: str = "paragraph"
     user_id: Optional[str] = None # New Field
     force_new: bool = False
+    scorer: str = "uamsa" # Extractive backend: "uamsa" or "textrank"
+    mode: str = "auto" # "auto" (LLM, degrades under load), "abstractive" or "extractive" (lite, no LLM)
+    cascade: bool = False # Derive this length/format from a stored long summary
 
 class ExportRequest(BaseModel):
     text: str
@@ -61,6 +78,7 @@ class YoutubeRequest(BaseModel):
     force_new: bool = False
     task: str = "summary" # "summary" or "highlights"
     request_id: Optional[str] = None # Unique ID for cancellation
+    cascade: bool = False # Derive this length/format from a stored detailed summary
 
 @app.post("/cancel_processing/{request_id}")
 async def cancel_processing(request_id: str):
@@ -93,11 +111,146 @@ class HistoryResponse(BaseModel):
     summ_sentences: int = 0
     orig_chars: int = 0
     summ_chars: int = 0
+    degraded: bool = False
+    model_used: Optional[str] = None
+
+def sse_event(payload: dict) -> str:
+    """Formats one Server-Sent Event."""
+    return f"data: {json.dumps(payload)}\n\n"
+
+def is_failed_summary(final_summary: str) -> bool:
+    return (
+        final_summary.startswith("[ERROR]") or 
+        final_summary.startswith("Critical Error") or 
+        final_summary.startswith("Failed to extract")
+    )
+
+def duplicate_summary(existing) -> dict:
+    """Summary payload rebuilt from a cached History row."""
+    return {
+         "summary_text": existing.summary_output,
+         "degraded": bool(existing.degraded),
+         "model_used": existing.model_used,
+         "stats": {
+             "original": {
+                 "words": existing.orig_words,
+                 "sentences": existing.orig_sentences,
+                 "chars": existing.orig_chars
+             },
+             "summary": {
+                 "words": existing.summ_words,
+                 "sentences": existing.summ_sentences,
+                 "chars": existing.summ_chars
+             }
+         }
+    }
+
+def save_history(db: Session, summary_result: dict, upgrade_id: Optional[int] = None, **fields) -> int:
+    """
+    Persists a History row (stats taken from summary_result) and returns its id.
+    `upgrade_id` overwrites that (degraded) row instead of adding a new one.
+    """
+    stats = summary_result.get("stats", {})
+    orig = stats.get("original", {})
+    summ = stats.get("summary", {})
+    values = dict(
+        summary_output=summary_result.get("summary_text", ""),
+        orig_words=orig.get("words", 0),
+        summ_words=summ.get("words", 0),
+        orig_sentences=orig.get("sentences", 0),
+        summ_sentences=summ.get("sentences", 0),
+        orig_chars=orig.get("chars", 0),
+        summ_chars=summ.get("chars", 0),
+        degraded=bool(summary_result.get("degraded", False)),
+        model_used=summary_result.get("model_used"),
+        **fields
+    )
+    db_record = None
+    if upgrade_id is not None:
+        db_record = db.query(models.History).filter(models.History.id == upgrade_id).first()
+    if db_record is None:
+        db_record = models.History(**values)
+        db.add(db_record)
+    else:
+        print(f"[HISTORY] Upgrading degraded entry {upgrade_id}")
+        for key, value in values.items():
+            setattr(db_record, key, value)
+    db.commit()
+    db.refresh(db_record)
+    return db_record.id
+
+def stream_summary_events(events, save=None):
+    """
+    Turns pipeline events into SSE: status/token/reset events pass through ("reset" means
+    discard the token text received so far), the final result is saved via
+    `save(result) -> history_id` and sent as a "done" event.
+    """
+    try:
+        for event in events:
+            if event["type"] != "result":
+                yield sse_event(event)
+                continue
+
+            summary_result = event["result"]
+            history_id = None
+            if save and not is_failed_summary(summary_result.get("summary_text", "")):
+                db = SessionLocal()
+                try:
+                    history_id = save(db, summary_result)
+                finally:
+                    db.close()
+            yield sse_event({"type": "done", "summary": summary_result, "history_id": history_id})
+    except Exception as e:
+        print(f"[STREAM-ERROR] {e}")
+        yield sse_event({"type": "error", "message": str(e)})
 
 @app.get("/")
 def read_root():
     return {"message": "Smart AI Video Summarizer API is running"}
 
+@app.get("/metrics")
+def get_metrics():
+    """Cache and load counters of the summarization pipeline."""
+    return {
+        "chunk_cache": chunk_score_cache.stats(),
+        "llm_cache": llm_cache.stats(),
+        "local_llm": local_llm.metrics(),
+        "limiters": limiter_stats(),
+        "cloud": cloud_dispatcher.stats(),
+        "quota": quota_ledger.stats(),
+        "model_tiers": model_tiers.stats(),
+        "tokens": token_counter.stats()
+    }
+
+def find_text_duplicate(db: Session, request: TextSummaryRequest, content_hash: str):
+    if not request.user_id:
+        return None
+    return db.query(models.History).filter(
+        models.History.user_id == request.user_id,
+        models.History.content_hash == content_hash,
+        models.History.preference == request.length,
+        models.History.format_mode == request.format_mode
+    ).first()
+
+def is_cache_hit(existing, force_new: bool, mode: str) -> bool:
+    """Degraded (extractive fallback) entries are re-summarized, unless lite mode was requested."""
+    if not existing or force_new:
+        return False
+    return not existing.degraded or mode == "extractive"
+
+def upgrade_target(existing) -> Optional[int]:
+    return existing.id if existing and existing.degraded else None
+
+def text_summary_events(request: TextSummaryRequest, content_hash: str):
+    """Pipeline events for a text request (cascade: derived from the stored long variant)."""
+    if request.cascade and request.mode != "extractive":
+        return summary_cascade.run_stream(
+            f"text:{request.scorer}:{content_hash}", request.length, request.format_mode,
+            lambda: summarize_text_stream(request.text, BASE_LENGTH, BASE_FORMAT, request.scorer, request.mode, request.force_new),
+            request.force_new
+        )
+    return summarize_text_stream(request.text, request.length, request.format_mode, request.scorer, request.mode, request.force_new)
+
 @app.post("/summarize/text")
 async def summarize_text_endpoint(
     request: TextSummaryRequest, 
@@ -108,72 +261,106 @@ async def summarize_text_endpoint(
         content_hash = hashlib.sha256(request.text.encode('utf-8')).hexdigest()
 
         # 2. Check for Duplicates BEFORE AI Processing
-        if request.user_id:
-            existing = db.query(models.History).filter(
-                models.History.user_id == request.user_id,
-                models.History.content_hash == content_hash,
-                models.History.preference == request.length,
-                models.History.format_mode == request.format_mode
-            ).first()
-
-            if existing and not request.force_new:
-                print(f"[CACHE] Text Hit found for user {request.user_id}")
-                return {
-                    "status": "duplicate",
-                    "summary": {
-                         "summary_text": existing.summary_output,
-                         "stats": {
-                             "original": {
-                                 "words": existing.orig_words,
-                                 "sentences": existing.orig_sentences,
-                                 "chars": existing.orig_chars
-                             },
-                             "summary": {
-                                 "words": existing.summ_words,
-                                 "sentences": existing.summ_sentences,
-                                 "chars": existing.summ_chars
-                             }
-                         }
-                    }
-                }
+        existing = find_text_duplicate(db, request, content_hash)
+        if is_cache_hit(existing, request.force_new, request.mode):
+            print(f"[CACHE] Text Hit found for user {request.user_id}")
+            return {"status": "duplicate", "summary": duplicate_summary(existing)}
 
         # 3. Proceed with AI Processing only if no duplicate
-        summary_result = summarize_text(request.text, request.length, request.format_mode)
+        summary_result = collect_result(text_summary_events(request, content_hash))
         final_summary = summary_result.get("summary_text", "")
-        stats = summary_result.get("stats", {})
-        orig = stats.get("original", {})
-        summ = stats.get("summary", {})
 
         # Save to History if user_id is present AND no error occurred
-        if request.user_id and not (
-            final_summary.startswith("[ERROR]") or 
-            final_summary.startswith("Critical Error") or 
-            final_summary.startswith("Failed to extract")
-        ):
-            db_record = models.History(
-                # ...
+        if request.user_id and not is_failed_summary(final_summary):
+            save_history(
+                db, summary_result,
+                upgrade_id=upgrade_target(existing),
                 content_hash=content_hash,
                 user_id=request.user_id,
                 input_type="text",
                 input_content=request.text,
-                summary_output=final_summary,
                 preference=request.length,
-                format_mode=request.format_mode,
-                orig_words=orig.get("words", 0),
-                summ_words=summ.get("words", 0),
-                orig_sentences=orig.get("sentences", 0),
-                summ_sentences=summ.get("sentences", 0),
-                orig_chars=orig.get("chars", 0),
-                summ_chars=summ.get("chars", 0)
+                format_mode=request.format_mode
             )
-            db.add(db_record)
-            db.commit()
-            db.refresh(db_record)
 
         return {"summary": summary_result}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/summarize/text/stream")
+def summarize_text_stream_endpoint(
+    request: TextSummaryRequest, 
+    db: Session = Depends(get_db)
+):
+    """Same as /summarize/text, but streams the summary as Server-Sent Events."""
+    content_hash = hashlib.sha256(request.text.encode('utf-8')).hexdigest()
+
+    existing = find_text_duplicate(db, request, content_hash)
+    if is_cache_hit(existing, request.force_new, request.mode):
+        print(f"[CACHE] Text Hit found for user {request.user_id}")
+        return StreamingResponse(
+            iter([sse_event({"type": "done", "status": "duplicate", "summary": duplicate_summary(existing), "history_id": existing.id})]),
+            media_type="text/event-stream"
+        )
+
+    upgrade_id = upgrade_target(existing)
+    def save(session, summary_result):
+        return save_history(
+            session, summary_result,
+            upgrade_id=upgrade_id,
+            content_hash=content_hash,
+            user_id=request.user_id,
+            input_type="text",
+            input_content=request.text,
+            preference=request.length,
+            format_mode=request.format_mode
+        )
+
+    events = text_summary_events(request, content_hash)
+    return StreamingResponse(
+        stream_summary_events(events, save if request.user_id else None),
+        media_type="text/event-stream"
+    )
+
+def save_upload(file: UploadFile, user_id: Optional[str]) -> tuple:
+    """Stores the uploaded file and returns (file_location, saved_filename, content_hash)."""
+    # Save file permanently if user is logged in
+    file_directory = "uploads" if user_id else "."
+    saved_filename = f"{file.filename}" 
+    file_location = os.path.join(file_directory, saved_filename)
+    
+    # If temp execution needed separately, we can handle logic, but let's overwrite for simplicity 
+    # or prefix with timestamp to avoid collisions (omitted for brevity)
+    with open(file_location, "wb") as buffer:
+        shutil.copyfileobj(file.file, buffer)
+        
+    # Compute Hash of File
+    sha256_hash = hashlib.sha256()
+    with open(file_location, "rb") as f:
+        for byte_block in iter(lambda: f.read(4096), b""):
+            sha256_hash.update(byte_block)
+    return file_location, saved_filename, sha256_hash.hexdigest()
+
+def file_summary_events(file_location: str, content_type: str, content_hash: str, length: str, format_mode: str, scorer: str, mode: str, force_new: bool, cascade: bool):
+    """Pipeline events for an uploaded file (cascade: derived from the stored long variant)."""
+    if cascade and mode != "extractive":
+        return summary_cascade.run_stream(
+            f"file:{scorer}:{content_hash}", length, format_mode,
+            lambda: extract_and_summarize_stream(file_location, content_type, BASE_LENGTH, BASE_FORMAT, scorer, mode, force_new),
+            force_new
+        )
+    return extract_and_summarize_stream(file_location, content_type, length, format_mode, scorer, mode, force_new)
+
+def find_file_duplicate(db: Session, user_id: Optional[str], content_hash: str, length: str, format_mode: str):
+    if not user_id:
+        return None
+    return db.query(models.History).filter(
+        models.History.user_id == user_id,
+        models.History.content_hash == content_hash,
+        models.History.preference == length,
+        models.History.format_mode == format_mode
+    ).first()
+
 @app.post("/summarize/upload_pdf")
 def summarize_pdf_endpoint(
     file: UploadFile = File(...), 
@@ -183,90 +370,37 @@ def summarize_pdf_endpoint(
     # Accept user_id from Form Data
     user_id: str = Form(None), 
     force_new: bool = Form(False),
+    scorer: str = Form("uamsa"), # Extractive backend: "uamsa" or "textrank"
+    mode: str = Form("auto"), # "auto", "abstractive" or "extractive" (lite, no LLM)
+    cascade: bool = Form(False), # Derive from the stored long summary of this file
     db: Session = Depends(get_db)
 ):
-    # Save file permanently if user is logged in
-    file_directory = "uploads" if user_id else "."
-    saved_filename = f"{file.filename}" 
-    file_location = os.path.join(file_directory, saved_filename)
-    
-    # If temp execution needed separately, we can handle logic, but let's overwrite for simplicity 
-    # or prefix with timestamp to avoid collisions (omitted for brevity)
-    
     try:
-        with open(file_location, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-            
-        # Compute Hash of File
-        sha256_hash = hashlib.sha256()
-        with open(file_location, "rb") as f:
-            for byte_block in iter(lambda: f.read(4096), b""):
-                sha256_hash.update(byte_block)
-        content_hash = sha256_hash.hexdigest()
+        file_location, saved_filename, content_hash = save_upload(file, user_id)
 
         # Check Duplicate
-        if user_id:
-            existing = db.query(models.History).filter(
-                models.History.user_id == user_id,
-                models.History.content_hash == content_hash,
-                models.History.preference == length,
-                models.History.format_mode == format_mode
-            ).first()
-
-            if existing and not force_new:
-                 return {
-                    "status": "duplicate",
-                    "summary": {
-                         "summary_text": existing.summary_output,
-                         "stats": {
-                             "original": {
-                                 "words": existing.orig_words,
-                                 "sentences": existing.orig_sentences,
-                                 "chars": existing.orig_chars
-                             },
-                             "summary": {
-                                 "words": existing.summ_words,
-                                 "sentences": existing.summ_sentences,
-                                 "chars": existing.summ_chars
-                             }
-                         }
-                    }
-                }
-
-        summary_result = extract_and_summarize(file_location, file.content_type, length, format_mode)
+        existing = find_file_duplicate(db, user_id, content_hash, length, format_mode)
+        if is_cache_hit(existing, force_new, mode):
+             return {"status": "duplicate", "summary": duplicate_summary(existing)}
+
+        summary_result = collect_result(file_summary_events(file_location, file.content_type, content_hash, length, format_mode, scorer, mode, force_new, cascade))
         final_summary = summary_result.get("summary_text", "")
-        stats = summary_result.get("stats", {})
-        orig = stats.get("original", {})
-        summ = stats.get("summary", {})
 
         # Save to History (Only if successful)
-        if user_id and not (
-            final_summary.startswith("[ERROR]") or 
-            final_summary.startswith("Critical Error") or 
-            final_summary.startswith("Failed to extract")
-        ):
+        if user_id and not is_failed_summary(final_summary):
             # Construct accessible URL or Relative Path
             # We'll store relative path: "uploads/filename.pdf"
-            relative_access_path = f"uploads/{saved_filename}"
-
-            db_record = models.History(
+            save_history(
+                db, summary_result,
+                upgrade_id=upgrade_target(existing),
                 content_hash=content_hash,
                 user_id=user_id,
                 input_type="pdf",
                 input_content=f"PDF: {file.filename}",
-                summary_output=final_summary,
-                file_path=relative_access_path,
+                file_path=f"uploads/{saved_filename}",
                 preference=length,
-                format_mode=format_mode,
-                orig_words=orig.get("words", 0),
-                summ_words=summ.get("words", 0),
-                orig_sentences=orig.get("sentences", 0),
-                summ_sentences=summ.get("sentences", 0),
-                orig_chars=orig.get("chars", 0),
-                summ_chars=summ.get("chars", 0)
+                format_mode=format_mode
             )
-            db.add(db_record)
-            db.commit()
         
         return {"summary": summary_result}
         
@@ -278,6 +412,53 @@ def summarize_pdf_endpoint(
     #     # For now, let's keep all files to support the "Open PDF" feature requested.
     #     pass
 
+@app.post("/summarize/upload_pdf/stream")
+def summarize_pdf_stream_endpoint(
+    file: UploadFile = File(...), 
+    length: str = Form("medium"),
+    format_mode: str = Form("paragraph"),
+    user_id: str = Form(None), 
+    force_new: bool = Form(False),
+    scorer: str = Form("uamsa"),
+    mode: str = Form("auto"),
+    cascade: bool = Form(False),
+    db: Session = Depends(get_db)
+):
+    """Same as /summarize/upload_pdf, but streams the summary as Server-Sent Events."""
+    try:
+        # The upload must be on disk before the response starts streaming
+        file_location, saved_filename, content_hash = save_upload(file, user_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    existing = find_file_duplicate(db, user_id, content_hash, length, format_mode)
+    if is_cache_hit(existing, force_new, mode):
+        return StreamingResponse(
+            iter([sse_event({"type": "done", "status": "duplicate", "summary": duplicate_summary(existing), "history_id": existing.id})]),
+            media_type="text/event-stream"
+        )
+
+    original_filename = file.filename
+    upgrade_id = upgrade_target(existing)
+    def save(session, summary_result):
+        return save_history(
+            session, summary_result,
+            upgrade_id=upgrade_id,
+            content_hash=content_hash,
+            user_id=user_id,
+            input_type="pdf",
+            input_content=f"PDF: {original_filename}",
+            file_path=f"uploads/{saved_filename}",
+            preference=length,
+            format_mode=format_mode
+        )
+
+    events = file_summary_events(file_location, file.content_type, content_hash, length, format_mode, scorer, mode, force_new, cascade)
+    return StreamingResponse(
+        stream_summary_events(events, save if user_id else None),
+        media_type="text/event-stream"
+    )
+
 @app.get("/history/{user_id}")
 def get_user_history(user_id: str, db: Session = Depends(get_db)):
     """Fetch all history items for a specific user, ordered by newest first."""
@@ -353,6 +534,168 @@ async def export_docx(request: ExportRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def find_video_duplicate(db: Session, request: YoutubeRequest, content_hash: str):
+    if not request.user_id:
+        return None
+    # Determine correct input type for database lookup
+    search_type = "highlights" if request.task == "highlights" else "video"
+    
+    return db.query(models.History).filter(
+        models.History.user_id == request.user_id,
+        models.History.content_hash == content_hash,
+        models.History.input_type == search_type,
+        models.History.preference == request.length, 
+        models.History.format_mode == request.format_mode
+    ).first()
+
+def video_duplicate_summary(existing) -> dict:
+    # Check if it was a highlights task and we have highlights data
+    highlights_data = None
+    if existing.highlights:
+        try:
+            highlights_data = json.loads(existing.highlights)
+        except:
+            highlights_data = existing.highlights
+
+    # Restore available qualities from DB
+    restored_qualities = ["720p"]
+    if existing.available_qualities:
+        restored_qualities = existing.available_qualities.split(',')
+
+    summary = duplicate_summary(existing)
+    summary["highlights"] = highlights_data
+    summary["available_qualities"] = restored_qualities
+    return summary
+
+def build_video_summary(request: YoutubeRequest, result_payload: dict) -> dict:
+    """Frontend payload for a processed video (summary stats + quality/size options)."""
+    final_summary = result_payload["summary_text"]
+    original_stats = result_payload["stats"]
+    
+    # 4. Generate Stats for Summary
+    summ_words = len(final_summary.split())
+    summ_chars = len(final_summary)
+    summ_sentences = final_summary.count('.') + final_summary.count('!') + final_summary.count('?')
+    
+    summary_result = {
+        "summary_text": final_summary,
+        "model_used": result_payload.get("model_used"),
+        "stats": {
+            "original": original_stats["original"], # Send correct structure to frontend
+            "summary": {
+                "words": summ_words,
+                "sentences": summ_sentences,
+                "chars": summ_chars
+            }
+        },
+        "highlights": result_payload.get("highlights", ""),
+        "available_qualities": result_payload.get("available_qualities", ["720p"]),
+        "original_video_url": request.url # useful context
+    }
+    for key in ("cascade", "cloud", "compression", "segments", "token_budget", "alignment"):
+        if key in original_stats:
+            summary_result["stats"][key] = original_stats[key]
+
+    # Calculate Estimated Sizes if bitrate data exists
+    quality_bitrates = result_payload.get("quality_bitrates", {})
+    highlights_data = result_payload.get("highlights", [])
+    
+    # Calculate Total Duration of Highlights
+    total_duration = 0
+    if isinstance(highlights_data, list):
+        for h in highlights_data:
+            start = h.get('start', 0)
+            end = h.get('end', 0)
+            if end > start:
+                total_duration += (end - start)
+    
+    # Add rich size info to available_qualities for Frontend
+    # Format: "720p" -> "720p (~45MB)"
+    rich_qualities = []
+    raw_qualities = result_payload.get("available_qualities", ["720p"])
+    
+    for q in raw_qualities:
+        label = q
+        size_mb = 0
+        if q in quality_bitrates and total_duration > 0:
+            # Bitrate is in kbps (usually). yt-dlp 'tbr' is kbit/s.
+            # Size (KB) = Bitrate (kbps) * Duration (s) / 8
+            # Size (MB) = Size (KB) / 1024
+            bitrate = quality_bitrates[q]
+            size_mb = (bitrate * total_duration) / (8 * 1024)
+            if size_mb < 1:
+                label = f"{q} (~{size_mb:.1f}MB)"
+            else:
+                label = f"{q} (~{int(size_mb)}MB)"
+        
+        # Frontend expects object or string? 
+        # Current frontend expects strings.
+        # We can change the contract to return objects in a NEW field, OR duplicate.
+        # Let's add 'quality_options' list of dicts.
+        rich_qualities.append({
+            "quality": q,
+            "label": label,
+            "estimated_size_mb": size_mb
+        })
+        
+    summary_result["quality_options"] = rich_qualities
+    return summary_result
+
+def save_video_history(db: Session, request: YoutubeRequest, content_hash: str, result_payload: dict, summary_result: dict) -> int:
+    video_title = result_payload.get("title", f"YouTube Video: {request.url}")
+
+    # Handle Highlights Serialization
+    highlights_data = result_payload.get("highlights")
+    highlights_json = None
+    if highlights_data:
+        if isinstance(highlights_data, list):
+            highlights_json = json.dumps(highlights_data)
+        elif isinstance(highlights_data, str):
+            highlights_json = highlights_data
+    
+    # Determine Input Type
+    record_input_type = "video"
+    if request.task == "highlights" or highlights_json:
+        record_input_type = "highlights"
+
+    return save_history(
+        db, summary_result,
+        content_hash=content_hash,
+        user_id=request.user_id,
+        input_type=record_input_type,
+        input_content=request.url,      # URL as Content
+        original_filename=video_title,  # Title as Filename
+        preference=request.length,
+        format_mode=request.format_mode,
+        highlights=highlights_json,     # SAVE HIGHLIGHTS
+        available_qualities=json.dumps(summary_result["quality_options"]) # SAVE AS JSON STRING (for size info persistence)
+    )
+
+def video_summary_events(request: YoutubeRequest, content_hash: str, check_cancel):
+    """Pipeline events for a video (cascade: summaries derived from the stored detailed variant)."""
+    if request.cascade and request.task == "summary":
+        return summary_cascade.run_stream(
+            f"video:{content_hash}", request.length, request.format_mode,
+            lambda: video_service.process_video_url_stream(
+                request.url, VIDEO_BASE_LENGTH, BASE_FORMAT,
+                task=request.task, check_cancel=check_cancel, force_new=request.force_new
+            ),
+            request.force_new,
+            base_length=VIDEO_BASE_LENGTH
+        )
+    return video_service.process_video_url_stream(
+        request.url, request.length, request.format_mode,
+        task=request.task, check_cancel=check_cancel, force_new=request.force_new
+    )
+
+def make_cancel_check(req_id: Optional[str]):
+    # Define Cancellation Callback
+    def check_cancel():
+        if req_id and req_id in active_tasks and active_tasks[req_id] is False:
+            print(f"[CANCEL] Aborting Task {req_id}...")
+            raise Exception("Task Cancelled by User")
+    return check_cancel
+
 @app.post("/summarize/youtube")
 async def summarize_youtube_endpoint(
     request: YoutubeRequest, 
@@ -364,11 +707,7 @@ async def summarize_youtube_endpoint(
         print(f"[START] Processing Task {req_id}")
 
     try:
-        # Define Cancellation Callback
-        def check_cancel():
-            if req_id and req_id in active_tasks and active_tasks[req_id] is False:
-                print(f"[CANCEL] Aborting Task {req_id}...")
-                raise Exception("Task Cancelled by User")
+        check_cancel = make_cancel_check(req_id)
 
         print(f"Processing YouTube URL (Cloud Mode): {request.url}")
 
@@ -376,175 +715,23 @@ async def summarize_youtube_endpoint(
         content_hash = hashlib.sha256(request.url.encode('utf-8')).hexdigest()
 
         # 2. Check for Duplicates (Re-enabled caching)
-        if request.user_id:
-            # Determine correct input type for database lookup
-            search_type = "highlights" if request.task == "highlights" else "video"
-            
-            existing = db.query(models.History).filter(
-                models.History.user_id == request.user_id,
-                models.History.content_hash == content_hash,
-                models.History.input_type == search_type,
-                models.History.preference == request.length, 
-                models.History.format_mode == request.format_mode
-            ).first()
-
-            if existing and not request.force_new:
-                print(f"[CACHE] Video/Highlights Hit found for {request.url}")
-                
-                # Check if it was a highlights task and we have highlights data
-                highlights_data = None
-                if existing.highlights:
-                    try:
-                        highlights_data = json.loads(existing.highlights)
-                    except:
-                        highlights_data = existing.highlights
-
-                # Restore available qualities from DB
-                restored_qualities = ["720p"]
-                if existing.available_qualities:
-                    restored_qualities = existing.available_qualities.split(',')
-
-                return {
-                    "status": "duplicate",
-                    "summary": {
-                         "summary_text": existing.summary_output,
-                         "stats": {
-                             "original": {
-                                 "words": existing.orig_words,
-                                 "sentences": existing.orig_sentences,
-                                 "chars": existing.orig_chars
-                             },
-                             "summary": {
-                                 "words": existing.summ_words,
-                                 "sentences": existing.summ_sentences,
-                                 "chars": existing.summ_chars
-                             }
-                         },
-                         "highlights": highlights_data,
-                         "available_qualities": restored_qualities
-                    }
-                }
+        existing = find_video_duplicate(db, request, content_hash)
+        if existing and not request.force_new:
+            print(f"[CACHE] Video/Highlights Hit found for {request.url}")
+            return {"status": "duplicate", "summary": video_duplicate_summary(existing)}
 
         # 3. Call Cloud API (Gemini/Gemma)
         # return dict: {'summary_text': str, 'stats': dict, 'highlights': str}
         # Check cancel before starting heavy work
         check_cancel()
 
-        result_payload = video_service.process_video_url(
-            request.url, 
-            request.length, 
-            request.format_mode,
-            task=request.task,
-            check_cancel=check_cancel
-        )
-        
-        final_summary = result_payload["summary_text"]
-        original_stats = result_payload["stats"]
-        video_title = result_payload.get("title", f"YouTube Video: {request.url}")
-        
-        # 4. Generate Stats for Summary
-        summ_words = len(final_summary.split())
-        summ_chars = len(final_summary)
-        summ_sentences = final_summary.count('.') + final_summary.count('!') + final_summary.count('?')
-        
-        summary_result = {
-            "summary_text": final_summary,
-            "stats": {
-                "original": original_stats["original"], # Send correct structure to frontend
-                "summary": {
-                    "words": summ_words,
-                    "sentences": summ_sentences,
-                    "chars": summ_chars
-                }
-            },
-            "highlights": result_payload.get("highlights", ""),
-            "available_qualities": result_payload.get("available_qualities", ["720p"]),
-            "original_video_url": request.url # useful context
-        }
-
-        # Calculate Estimated Sizes if bitrate data exists
-        quality_bitrates = result_payload.get("quality_bitrates", {})
-        highlights_data = result_payload.get("highlights", [])
-        
-        # Calculate Total Duration of Highlights
-        total_duration = 0
-        if isinstance(highlights_data, list):
-            for h in highlights_data:
-                start = h.get('start', 0)
-                end = h.get('end', 0)
-                if end > start:
-                    total_duration += (end - start)
-        
-        # Add rich size info to available_qualities for Frontend
-        # Format: "720p" -> "720p (~45MB)"
-        rich_qualities = []
-        raw_qualities = result_payload.get("available_qualities", ["720p"])
+        result_payload = collect_result(video_summary_events(request, content_hash, check_cancel))
         
-        for q in raw_qualities:
-            label = q
-            size_mb = 0
-            if q in quality_bitrates and total_duration > 0:
-                # Bitrate is in kbps (usually). yt-dlp 'tbr' is kbit/s.
-                # Size (KB) = Bitrate (kbps) * Duration (s) / 8
-                # Size (MB) = Size (KB) / 1024
-                bitrate = quality_bitrates[q]
-                size_mb = (bitrate * total_duration) / (8 * 1024)
-                if size_mb < 1:
-                    label = f"{q} (~{size_mb:.1f}MB)"
-                else:
-                    label = f"{q} (~{int(size_mb)}MB)"
-            
-            # Frontend expects object or string? 
-            # Current frontend expects strings.
-            # We can change the contract to return objects in a NEW field, OR duplicate.
-            # Let's add 'quality_options' list of dicts.
-            rich_qualities.append({
-                "quality": q,
-                "label": label,
-                "estimated_size_mb": size_mb
-            })
-            
-        summary_result["quality_options"] = rich_qualities
+        summary_result = build_video_summary(request, result_payload)
 
         # 5. Save to History (Re-enabled & Fixed)
         if request.user_id:
-             # Extract correct stats dict
-             stat_src = original_stats.get("original", {})
-             
-             # Handle Highlights Serialization
-             highlights_data = result_payload.get("highlights")
-             highlights_json = None
-             if highlights_data:
-                 if isinstance(highlights_data, list):
-                     highlights_json = json.dumps(highlights_data)
-                 elif isinstance(highlights_data, str):
-                     highlights_json = highlights_data
-             
-             # Determine Input Type
-             record_input_type = "video"
-             if request.task == "highlights" or highlights_json:
-                 record_input_type = "highlights"
-
-             db_record = models.History(
-                content_hash=content_hash,
-                user_id=request.user_id,
-                input_type=record_input_type,
-                input_content=request.url,      # URL as Content
-                original_filename=video_title,  # Title as Filename
-                summary_output=final_summary,
-                preference=request.length,
-                format_mode=request.format_mode,
-                highlights=highlights_json,     # SAVE HIGHLIGHTS
-                available_qualities=json.dumps(rich_qualities), # SAVE AS JSON STRING (for size info persistence)
-                orig_words=stat_src.get("words", 0),
-                orig_sentences=stat_src.get("sentences", 0),
-                orig_chars=stat_src.get("chars", 0),
-                summ_words=summ_words,
-                summ_sentences=summ_sentences,
-                summ_chars=summ_chars
-            )
-             db.add(db_record)
-             db.commit()
+            save_video_history(db, request, content_hash, result_payload, summary_result)
 
         return {"summary": summary_result}
 
@@ -561,6 +748,73 @@ async def summarize_youtube_endpoint(
             del active_tasks[req_id]
             print(f"[CLEANUP] Removed Task {req_id}")
 
+@app.post("/summarize/youtube/stream")
+def summarize_youtube_stream_endpoint(
+    request: YoutubeRequest, 
+    db: Session = Depends(get_db)
+):
+    """
+    Same as /summarize/youtube, but streams the summary as Server-Sent Events.
+    With task="highlights", "highlights" events carry the clips mapped so far after each
+    transcript chunk; the final "done" event holds the fully merged list saved to history.
+    """
+    content_hash = hashlib.sha256(request.url.encode('utf-8')).hexdigest()
+
+    existing = find_video_duplicate(db, request, content_hash)
+    if existing and not request.force_new:
+        print(f"[CACHE] Video/Highlights Hit found for {request.url}")
+        return StreamingResponse(
+            iter([sse_event({"type": "done", "status": "duplicate", "summary": video_duplicate_summary(existing), "history_id": existing.id})]),
+            media_type="text/event-stream"
+        )
+
+    req_id = request.request_id
+    check_cancel = make_cancel_check(req_id)
+
+    def video_events():
+        if req_id:
+            active_tasks[req_id] = True # Register task
+            print(f"[START] Processing Task {req_id}")
+        try:
+            print(f"Processing YouTube URL (Cloud Mode, Streaming): {request.url}")
+            yield sse_event({"type": "status", "stage": "started"})
+            for event in video_summary_events(request, content_hash, check_cancel):
+                if event["type"] != "result":
+                    yield sse_event(event)
+                    continue
+
+                result_payload = event["result"]
+                if "error" in result_payload:
+                    if "Task Cancelled" in result_payload["error"]:
+                        print(f"[CANCEL] Task {req_id} cancelled.")
+                        yield sse_event({"type": "cancelled", "message": "Task cancelled by user"})
+                    else:
+                        yield sse_event({"type": "error", "message": result_payload["error"]})
+                    return
+
+                summary_result = build_video_summary(request, result_payload)
+                history_id = None
+                if request.user_id:
+                    session = SessionLocal()
+                    try:
+                        history_id = save_video_history(session, request, content_hash, result_payload, summary_result)
+                    finally:
+                        session.close()
+                yield sse_event({"type": "done", "summary": summary_result, "history_id": history_id})
+        except Exception as e:
+            if "Task Cancelled" in str(e):
+                print(f"[CANCEL] Task {req_id} cancelled.")
+                yield sse_event({"type": "cancelled", "message": "Task cancelled by user"})
+            else:
+                print(f"YouTube Cloud Error: {e}")
+                yield sse_event({"type": "error", "message": str(e)})
+        finally:
+            if req_id and req_id in active_tasks:
+                del active_tasks[req_id]
+                print(f"[CLEANUP] Removed Task {req_id}")
+
+    return StreamingResponse(video_events(), media_type="text/event-stream")
+
 @app.post("/export/video")
 async def export_video_endpoint(request: ExportVideoRequest):
     from fastapi.responses import StreamingResponse
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean
 from sqlalchemy.sql import func
 from database import Base
 
@@ -16,6 +16,8 @@ class History(Base):
     format_mode = Column(String(20), default="paragraph") # paragraph, bullet points
     highlights = Column(Text, nullable=True) # JSON String of highlights
     available_qualities = Column(Text, nullable=True) # Comma-separated list of quality strings
+    degraded = Column(Boolean, default=False) # Extractive fallback (LLM was busy) -> re-summarized on next request
+    model_used = Column(String(100), nullable=True) # Model that wrote the summary (local tier, cloud model or "extractive")
 
     
     # Statistics
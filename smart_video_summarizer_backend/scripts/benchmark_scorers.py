@@ -0,0 +1,67 @@
+import sys
+import os
+import time
+import random
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from services.summarization import uamsa_algorithm
+from services.document import Document
+
+# Usage: python scripts/benchmark_scorers.py [path/to/file.pdf|.txt]
+#        python scripts/benchmark_scorers.py --sentences 20000
+
+
+def synthetic_text(n_sentences: int) -> str:
+    random.seed(42)
+    vocab = ("model data system network energy market policy research students climate "
+             "battery Google Paris government analysis results growth security the a of and "
+             "in to is for with on as by").split()
+    return " ".join(
+        " ".join(random.choice(vocab) for _ in range(random.randint(8, 30))).capitalize() + "."
+        for _ in range(n_sentences)
+    )
+
+
+def skeleton_for(document, chunks, scorer):
+    start = time.perf_counter()
+    scored = uamsa_algorithm.score_sentences(document, chunks, scorer)
+    parts = [uamsa_algorithm.extract_high_resolution_skeleton(idx, scores) for idx, scores in scored]
+    elapsed = time.perf_counter() - start
+    skeleton = np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+    return elapsed, skeleton
+
+
+def run(text: str):
+    build_start = time.perf_counter()
+    document = Document.from_text(text)
+    chunks = uamsa_algorithm.get_micro_chunks(document)
+    _ = document.tokens  # Tokenize once, shared by both backends
+    build_time = time.perf_counter() - build_start
+
+    print(f"\nDocument: {len(document)} sentences, {document.word_total} words, {len(chunks)} chunks (tokenize: {build_time:.2f}s)")
+    print(f"{'backend':<10} {'score+skeleton (s)':>20} {'skeleton sentences':>20} {'skeleton words':>16}")
+    for scorer in ["uamsa", "textrank"]:
+        elapsed, skeleton = skeleton_for(document, chunks, scorer)
+        words = int(document.word_counts[np.unique(skeleton)].sum()) if len(skeleton) else 0
+        print(f"{scorer:<10} {elapsed:>20.3f} {len(np.unique(skeleton)):>20} {words:>16}")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args and args[0] == "--sentences":
+        sizes = [int(a) for a in args[1:]] or [1000, 10000, 50000]
+        for n in sizes:
+            run(synthetic_text(n))
+    elif args:
+        path = args[0]
+        if path.endswith(".pdf") or path.endswith(".docx"):
+            text = uamsa_algorithm.extract_text_from_file(path, "")
+        else:
+            with open(path, encoding="utf-8") as f:
+                text = f.read()
+        run(text)
+    else:
+        for n in [1000, 10000, 50000]:
+            run(synthetic_text(n))
@@ -0,0 +1,155 @@
+"""
+Stand-in for the Gemini API (generateContent / streamGenerateContent, REST) for offline testing.
+Enforces the same per-model RPM / TPM / RPD quotas as services/quota.py and answers with
+the API's 429 error format when they run out, so quota routing, circuit breaking and
+hedging can be exercised without a key.
+
+Usage (from the backend directory):
+    python scripts/fake_model_server.py --port 8765 --quota-scale 0.1
+    GEMINI_API_ENDPOINT=http://127.0.0.1:8765 uvicorn main:app
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from services.quota import load_quotas
+from services.token_budget import token_counter, IMAGE_TOKENS
+
+app = FastAPI(title="Fake Gemini API")
+settings = {"first_token_delay": 0.5, "token_delay": 0.05, "quota_scale": 1.0, "exhausted": set()}
+# model -> deque of (timestamp, tokens)
+usage = {}
+
+
+def count_tokens(body: dict) -> int:
+    tokens = 0
+    for content in body.get("contents", []):
+        for part in content.get("parts", []):
+            if "text" in part:
+                tokens += token_counter.count(part["text"])
+            else:
+                tokens += IMAGE_TOKENS
+    return tokens
+
+
+def prompt_text(body: dict) -> str:
+    return " ".join(
+        part.get("text", "") for content in body.get("contents", []) for part in content.get("parts", [])
+    )
+
+
+def quota_error(model: str, tokens: int):
+    """Returns the violated quota name, or None after recording the request."""
+    if model in settings["exhausted"]:
+        return "requests_per_day"
+    limits = load_quotas().get(model)
+    if limits is None:
+        return None
+    now = time.time()
+    history = usage.setdefault(model, deque())
+    while history and now - history[0][0] > 86400:
+        history.popleft()
+    last_minute = [t for stamp, t in history if now - stamp <= 60]
+    scale = settings["quota_scale"]
+    if len(history) >= max(1, int(limits["rpd"] * scale)):
+        return "requests_per_day"
+    if len(last_minute) >= max(1, int(limits["rpm"] * scale)):
+        return "requests_per_minute"
+    if sum(last_minute) + tokens > max(1, int(limits["tpm"] * scale)):
+        return "input_tokens_per_minute"
+    history.append((now, tokens))
+    return None
+
+
+def answer_text(model: str, body: dict) -> str:
+    prompt = prompt_text(body)
+    if "Professional Video Editor" in prompt:
+        return json.dumps([
+            {"start": 10, "end": 40, "title": f"Opening ({model})"},
+            {"start": 120, "end": 160, "title": "Key Demonstration"}
+        ])
+    return (
+        f"This is a stand-in summary from {model}. The prompt had {len(prompt.split())} words. "
+        "It covers the main topic, the key arguments and the conclusion."
+    )
+
+
+def response_chunk(text: str, tokens: int, finished: bool) -> dict:
+    chunk = {"candidates": [{"content": {"parts": [{"text": text}], "role": "model"}, "index": 0}]}
+    if finished:
+        chunk["candidates"][0]["finishReason"] = 1
+        chunk["usageMetadata"] = {"promptTokenCount": tokens, "totalTokenCount": tokens + len(text.split())}
+    return chunk
+
+
+def error_response(model: str, violation: str) -> JSONResponse:
+    return JSONResponse(status_code=429, content={"error": {
+        "code": 429,
+        "status": "RESOURCE_EXHAUSTED",
+        "message": f"Resource has been exhausted (quota metric: generativelanguage.googleapis.com/{violation}, model: {model})."
+    }})
+
+
+@app.post("/v1beta/models/{model_action}")
+async def generate(model_action: str, request: Request):
+    model, _, action = model_action.partition(":")
+    body = await request.json()
+    tokens = count_tokens(body)
+    violation = quota_error(model, tokens)
+    if violation:
+        print(f"[FAKE-API] 429 {model}: {violation}")
+        return error_response(model, violation)
+
+    words = answer_text(model, body).split(" ")
+    print(f"[FAKE-API] {action} {model}: {tokens} prompt tokens")
+    if action == "generateContent":
+        await asyncio.sleep(settings["first_token_delay"] + settings["token_delay"] * len(words))
+        return response_chunk(" ".join(words), tokens, True)
+
+    async def stream():
+        await asyncio.sleep(settings["first_token_delay"])
+        yield "["
+        for i, word in enumerate(words):
+            if i:
+                await asyncio.sleep(settings["token_delay"])
+                yield ","
+            piece = word if i == len(words) - 1 else word + " "
+            yield json.dumps(response_chunk(piece, tokens, i == len(words) - 1))
+        yield "]"
+
+    return StreamingResponse(stream(), media_type="application/json")
+
+
+@app.get("/usage")
+def get_usage():
+    now = time.time()
+    return {model: {"last_minute": sum(1 for stamp, _ in history if now - stamp <= 60), "last_day": len(history)}
+            for model, history in usage.items()}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Fake Gemini API server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--first-token-delay", type=float, default=0.5, help="seconds before the first chunk")
+    parser.add_argument("--token-delay", type=float, default=0.05, help="seconds between chunks")
+    parser.add_argument("--quota-scale", type=float, default=1.0, help="multiply every quota (e.g. 0.1 to hit 429s quickly)")
+    parser.add_argument("--exhausted", nargs="*", default=[], help="models that always answer with a daily-quota 429")
+    args = parser.parse_args()
+
+    settings.update({
+        "first_token_delay": args.first_token_delay,
+        "token_delay": args.token_delay,
+        "quota_scale": args.quota_scale,
+        "exhausted": set(args.exhausted)
+    })
+    uvicorn.run(app, host="127.0.0.1", port=args.port)
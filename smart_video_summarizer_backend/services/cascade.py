@@ -0,0 +1,220 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from dotenv import load_dotenv
+from services.llm_client import local_llm
+from services.llm_load import local_llm_monitor
+from services.model_tiers import model_tiers
+from services.summarization import uamsa_algorithm
+
+load_dotenv()
+
+# Stored most-detailed variants (SQLite file next to the other caches)
+CASCADE_STORE_PATH = os.getenv("CASCADE_STORE_PATH", os.path.join("cache", "cascade.db"))
+CASCADE_TTL_SECONDS = float(os.getenv("CASCADE_TTL_SECONDS", 7 * 24 * 3600))
+CASCADE_MAX_ENTRIES = int(os.getenv("CASCADE_MAX_ENTRIES", 2000))
+# The variant generated once per source; every other length/format is derived from it
+BASE_LENGTH = "long"
+BASE_FORMAT = "paragraph"
+# Videos default to "detailed" (the frontend always asks for it), so that is their base
+VIDEO_BASE_LENGTH = "detailed"
+# Lengths a variant can be requested at
+LENGTHS = ("short", "medium", "long", "detailed")
+# Summary texts that are error messages, never stored as a base
+FAILED_PREFIXES = (
+    "[ERROR]", "Critical Error", "Failed to extract", "Error:",
+    "Error using Cloud API", "Visual Analysis Failed", "Cloud models are busy",
+    "The request exceeds every cloud model's token limit"
+)
+
+
+class SummaryCascade:
+    """
+    Multi-variant summaries from one expensive run.
+    The most detailed variant of a source (long, paragraph for texts and files; detailed,
+    paragraph for video URLs) is generated once with the full pipeline and stored. Shorter lengths and the
+    bullet/paragraph reformatting are derived from that stored text with one cheap local
+    condensation call, so switching lengths skips frame extraction and the cloud call.
+    """
+
+    def __init__(self, path: str = CASCADE_STORE_PATH, ttl_seconds: float = CASCADE_TTL_SECONDS, max_entries: int = CASCADE_MAX_ENTRIES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._conn = None
+        self._lock = threading.Lock()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS base_variants ("
+                "source_key TEXT PRIMARY KEY, payload TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    # --- Store ---
+
+    def load_base(self, source_key: str):
+        with self._lock:
+            try:
+                row = self.conn.execute("SELECT payload, created FROM base_variants WHERE source_key = ?", (source_key,)).fetchone()
+            except sqlite3.Error as e:
+                print(f"[CASCADE] Lookup failed: {e}")
+                return None
+        if row is None or time.time() - row[1] > self.ttl_seconds:
+            return None
+        return json.loads(row[0])
+
+    def store_base(self, source_key: str, result: dict):
+        with self._lock:
+            try:
+                conn = self.conn
+                conn.execute(
+                    "INSERT OR REPLACE INTO base_variants (source_key, payload, created) VALUES (?, ?, ?)",
+                    (source_key, json.dumps(result), time.time())
+                )
+                conn.execute(
+                    "DELETE FROM base_variants WHERE source_key NOT IN "
+                    "(SELECT source_key FROM base_variants ORDER BY created DESC LIMIT ?)",
+                    (self.max_entries,)
+                )
+                conn.commit()
+            except (sqlite3.Error, TypeError, ValueError) as e:
+                print(f"[CASCADE] Store failed: {e}")
+
+    def is_failed(self, result: dict) -> bool:
+        """No summary at all: missing, empty, an error payload or an error message as text."""
+        if not result:
+            return True
+        summary = result.get("summary_text", "")
+        return not summary or "error" in result or summary.startswith(FAILED_PREFIXES)
+
+    def is_usable(self, result: dict) -> bool:
+        """Good enough to store as the base (degraded/extractive output is not)."""
+        return not self.is_failed(result) and not result.get("degraded")
+
+    # --- Derivation ---
+
+    def _condense_prompt(self, base_text: str, length: str, format_mode: str) -> str:
+        directives = {
+            "short": "Condense it into a short executive summary of the core message (one short paragraph or 3-5 bullet points).",
+            "medium": "Condense it into a balanced summary of the major events and themes, about half the original length.",
+            "long": "Keep all of its details and nuances.",
+            "detailed": "Keep every topic, detail and nuance; do not shorten it."
+        }
+        style = "a structured list of bullet points" if format_mode == "bullet points" else "cohesive paragraphs"
+        return (
+            "You are a professional editor. The following is a detailed report. "
+            f"{directives[length]} "
+            f"Write it as {style}. Use only facts from the report. "
+            "Do not use first-person ('I', 'me') or meta-commentary ('The report says').\n\n"
+            f"Report: {base_text}"
+        )
+
+    def derive_stream(self, base_text: str, length: str, format_mode: str, stats: dict, force_new: bool = False, extractive: bool = False):
+        """
+        Yields the derived variant's text. Uses extractive condensation while the local LLM is
+        saturated (or when `extractive` is set, e.g. for a base that was itself degraded).
+        If the LLM fails after some pieces, stats["reset"] is set before the extractive text:
+        the pieces so far are to be discarded.
+        """
+        if extractive:
+            degraded, reason = True, "degraded base"
+        else:
+            degraded, reason = local_llm_monitor.should_degrade()
+        if not degraded:
+            model, _ = model_tiers.choose("report", len(base_text.split()), length)
+            stats["derived_by"] = model
+            sent = False
+            try:
+                for piece in local_llm.chat_stream(
+                    messages=[{'role': 'user', 'content': self._condense_prompt(base_text, length, format_mode)}],
+                    options={'temperature': 0.3, 'num_ctx': 16384},
+                    model=model,
+                    force_new=force_new
+                ):
+                    sent = True
+                    yield piece
+                return
+            except Exception as e:
+                reason = f"condensation failed: {e}"
+                stats["reset"] = sent
+
+        print(f"[CASCADE] Deriving extractively ({reason}).")
+        stats["derived_by"] = "extractive"
+        yield uamsa_algorithm.summarize(base_text, length, format_mode, mode="extractive")["summary_text"]
+
+    def run_stream(self, source_key: str, length: str, format_mode: str, base_events, force_new: bool = False, base_length: str = BASE_LENGTH):
+        """
+        Events like the wrapped pipeline (status / token / reset / result).
+        `base_events()` starts the full pipeline for the base variant (base_length, paragraph);
+        it only runs when no stored base exists (or force_new is set).
+        Raises ValueError for a length outside LENGTHS.
+        """
+        if length not in LENGTHS:
+            raise ValueError(f"Unknown summary length '{length}' (expected one of {', '.join(LENGTHS)}).")
+        start = time.perf_counter()
+        cascade_stats = {"base": "stored"}
+        wants_base = length == base_length and format_mode == BASE_FORMAT
+
+        base = None if force_new else self.load_base(source_key)
+        if base is None:
+            cascade_stats["base"] = "generated"
+            yield {"type": "status", "stage": "generating_base_variant"}
+            for event in base_events():
+                if event["type"] == "result":
+                    base = event["result"]
+                elif event["type"] == "status" or wants_base:
+                    # Base tokens are only the answer when the base variant was requested
+                    yield event
+
+            if base is None:
+                yield {"type": "result", "result": {"summary_text": "", "error": "The summary pipeline returned no result."}}
+                return
+            if self.is_failed(base) or (wants_base and not self.is_usable(base)):
+                yield {"type": "result", "result": base}
+                return
+            if self.is_usable(base):
+                self.store_base(source_key, base)
+                print(f"[CASCADE] Stored base variant for {source_key[:40]}.")
+            else:
+                # Degraded base: not stored, but the requested variant is still derived from it
+                cascade_stats["base"] = "degraded"
+
+        result = dict(base)
+        result["stats"] = dict(base.get("stats", {}))
+        if wants_base:
+            if cascade_stats["base"] == "stored":
+                yield {"type": "token", "text": base["summary_text"]}
+        else:
+            yield {"type": "status", "stage": "deriving_variant"}
+            derive_stats = {}
+            pieces = []
+            for piece in self.derive_stream(base["summary_text"], length, format_mode, derive_stats, force_new, extractive=cascade_stats["base"] == "degraded"):
+                if derive_stats.pop("reset", False):
+                    # An extractive fallback replaces the partial LLM output already streamed
+                    pieces = []
+                    yield {"type": "reset"}
+                pieces.append(piece)
+                yield {"type": "token", "text": piece}
+            result["summary_text"] = "".join(pieces)
+            result["stats"]["summary"] = uamsa_algorithm.get_text_stats(result["summary_text"])
+            result["model_used"] = derive_stats["derived_by"]
+            cascade_stats.update(derive_stats)
+
+        cascade_stats["seconds"] = round(time.perf_counter() - start, 2)
+        result["stats"]["cascade"] = cascade_stats
+        print(f"[CASCADE] {length}/{format_mode} ready in {cascade_stats['seconds']}s (base {cascade_stats['base']}).")
+        yield {"type": "result", "result": result}
+
+
+# Initialize Global Instance
+summary_cascade = SummaryCascade()
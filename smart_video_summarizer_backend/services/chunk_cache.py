@@ -0,0 +1,119 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Persistent per-chunk score cache (SQLite file, independent of the main MySQL database)
+SKELETON_CACHE_PATH = os.getenv("SKELETON_CACHE_PATH", os.path.join("cache", "skeleton_cache.db"))
+# Max cached chunks; least recently used entries are evicted beyond this
+SKELETON_CACHE_MAX_ENTRIES = int(os.getenv("SKELETON_CACHE_MAX_ENTRIES", 50000))
+# Bump when the scoring formula changes so stale scores are never reused
+SCORING_VERSION = "uamsa-1"
+# SQLite limit on bound parameters per statement
+LOOKUP_BATCH = 500
+
+
+class ChunkScoreCache:
+    """
+    Content-addressed cache for Stage 2 (Math Scoring).
+    UAMSA scores a chunk using only the chunk's own sentences, so a chunk's scores are a pure
+    function of its text. Keys are SHA-1 hashes of the chunk text; values are the chunk's
+    sentence scores (float32). A re-uploaded file with a few changed pages only rescores the
+    chunks that actually changed.
+    """
+
+    def __init__(self, path: str = SKELETON_CACHE_PATH, max_entries: int = SKELETON_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._conn = None
+        self._entries = 0
+        self._lock = threading.Lock()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunk_scores ("
+                "key TEXT PRIMARY KEY, scores BLOB NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunk_scores_last_used ON chunk_scores (last_used)")
+            self._conn.commit()
+            self._entries = self._conn.execute("SELECT COUNT(*) FROM chunk_scores").fetchone()[0]
+            print(f"[CHUNK-CACHE] Opened {self.path} ({self._entries} cached chunks).")
+        return self._conn
+
+    def chunk_key(self, chunk_text: str) -> str:
+        return hashlib.sha1(f"{SCORING_VERSION}\n{chunk_text}".encode('utf-8')).hexdigest()
+
+    def get_many(self, keys: list) -> dict:
+        """Returns {key: scores} for the cached keys and refreshes their LRU position."""
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        with self._lock:
+            conn = self.conn
+            for i in range(0, len(unique_keys), LOOKUP_BATCH):
+                batch = unique_keys[i:i + LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(f"SELECT key, scores FROM chunk_scores WHERE key IN ({placeholders})", batch).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).astype(np.float64)
+                if rows:
+                    conn.execute(
+                        f"UPDATE chunk_scores SET last_used = ? WHERE key IN ({','.join('?' * len(rows))})",
+                        [time.time()] + [key for key, _ in rows]
+                    )
+            conn.commit()
+            self.hits += sum(1 for key in keys if key in found)
+            self.misses += sum(1 for key in keys if key not in found)
+        return found
+
+    def put_many(self, items: dict):
+        """Stores {key: scores}, then evicts least recently used chunks above max_entries."""
+        if not items:
+            return
+        now = time.time()
+        rows = [(key, np.asarray(scores, dtype=np.float32).tobytes(), now) for key, scores in items.items()]
+        with self._lock:
+            conn = self.conn
+            before = conn.total_changes
+            conn.executemany("INSERT OR IGNORE INTO chunk_scores (key, scores, last_used) VALUES (?, ?, ?)", rows)
+            self._entries += conn.total_changes - before
+
+            excess = self._entries - self.max_entries
+            if excess > 0:
+                conn.execute(
+                    "DELETE FROM chunk_scores WHERE key IN (SELECT key FROM chunk_scores ORDER BY last_used LIMIT ?)",
+                    (excess,)
+                )
+                self._entries -= excess
+                self.evictions += excess
+            conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            _ = self.conn
+            lookups = self.hits + self.misses
+            return {
+                "entries": self._entries,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+
+# Initialize Global Instance
+chunk_score_cache = ChunkScoreCache()
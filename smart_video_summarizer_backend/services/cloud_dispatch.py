@@ -0,0 +1,349 @@
+import os
+import time
+import queue
+import threading
+from collections import deque
+import numpy as np
+from dotenv import load_dotenv
+from services.quota import quota_ledger
+
+load_dotenv()
+
+# Cloud models in order of preference (primary first)
+CLOUD_MODELS = [
+    "gemma-3-27b-it",
+    "gemini-2.5-flash",
+    "gemini-2.5-flash-lite",
+    "gemini-3-flash"
+]
+# Consecutive failures that open a model's circuit (a 429 opens it at once)
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", 3))
+# How long an open circuit skips the model before one probe request is let through
+CIRCUIT_COOLDOWN_SECONDS = float(os.getenv("CIRCUIT_COOLDOWN_SECONDS", 60))
+# Daily quota errors keep the circuit open much longer
+CIRCUIT_DAILY_COOLDOWN_SECONDS = float(os.getenv("CIRCUIT_DAILY_COOLDOWN_SECONDS", 3600))
+# Hedge delay before enough first-token samples exist for a p95
+HEDGE_DEFAULT_SECONDS = float(os.getenv("HEDGE_DEFAULT_SECONDS", 10))
+# Extra models fired per request while the primary is slow (0 disables hedging)
+HEDGE_MAX_EXTRA = int(os.getenv("HEDGE_MAX_EXTRA", 1))
+HEDGE_MIN_SAMPLES = 5
+LATENCY_WINDOW = 50
+POLL_SECONDS = 0.25
+
+
+def is_daily_quota(message: str) -> bool:
+    return "requests_per_day" in message or "PerDay" in message
+
+
+class CloudUnavailableError(RuntimeError):
+    """
+    No cloud model can take the request now: open circuits, spent local quota budget or 429s
+    from every model tried. `retry_after` is the estimated wait in seconds (None if unknown);
+    `too_large` means the request exceeds every model's token limit, so waiting will not help.
+    """
+
+    def __init__(self, message: str, retry_after: float = None, too_large: bool = False):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.too_large = too_large
+
+    def user_message(self) -> str:
+        if self.too_large:
+            return "The request exceeds every cloud model's token limit. Please try a shorter length video."
+        if self.retry_after is None:
+            return "Cloud models are busy. Please retry in a minute."
+        return f"Cloud models are busy. Please retry in {max(1, int(self.retry_after + 0.999))} s."
+
+
+class CircuitBreaker:
+    """closed -> open (skip the model) -> half_open (one probe) -> closed again on success."""
+
+    def __init__(self, model: str):
+        self.model = model
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.open_for = 0.0
+        self.probing = False
+        self.last_error = None
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "open" and time.time() - self.opened_at >= self.open_for:
+                self.state = "half_open"
+                self.probing = False
+            if self.state == "closed":
+                return True
+            if self.state == "half_open" and not self.probing:
+                self.probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                print(f"[CIRCUIT] {self.model} closed again.")
+            self.state = "closed"
+            self.failures = 0
+            self.probing = False
+
+    def abandon(self):
+        """The request was cancelled by the user: no verdict, free the probe slot."""
+        with self._lock:
+            self.probing = False
+
+    def record_failure(self, error: Exception):
+        message = str(error)
+        with self._lock:
+            self.failures += 1
+            self.last_error = message
+            if self.state == "half_open" or "429" in message or self.failures >= CIRCUIT_FAILURE_THRESHOLD:
+                self.state = "open"
+                self.opened_at = time.time()
+                self.open_for = CIRCUIT_DAILY_COOLDOWN_SECONDS if is_daily_quota(message) else CIRCUIT_COOLDOWN_SECONDS
+                self.probing = False
+                print(f"[CIRCUIT] {self.model} open for {self.open_for:.0f}s ({message[:80]})")
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            remaining = self.open_for - (time.time() - self.opened_at) if self.state == "open" else 0
+            return {
+                "state": self.state,
+                "failures": self.failures,
+                "open_seconds_left": round(max(0.0, remaining), 1),
+                "last_error": self.last_error[:200] if self.last_error else None
+            }
+
+
+class CloudDispatcher:
+    """
+    Runs one cloud generation across the model chain.
+    Models with an open circuit or without quota budget (see QuotaLedger) are skipped
+    without a request. The first usable model is started; if it has not produced its first
+    token within its observed p95 first-token latency, the next model is fired as a hedge
+    and whichever streams first wins (the other is abandoned). Failures before the first
+    token move on to the next model.
+    """
+
+    def __init__(self, models: list = CLOUD_MODELS):
+        self.models = list(models)
+        self.breakers = {model: CircuitBreaker(model) for model in self.models}
+        self.first_token_latency = {model: deque(maxlen=LATENCY_WINDOW) for model in self.models}
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._lock = threading.Lock()
+
+    def breaker(self, model: str) -> CircuitBreaker:
+        with self._lock:
+            if model not in self.breakers:
+                self.breakers[model] = CircuitBreaker(model)
+                self.first_token_latency[model] = deque(maxlen=LATENCY_WINDOW)
+            return self.breakers[model]
+
+    def hedge_delay(self, model: str) -> float:
+        with self._lock:
+            samples = list(self.first_token_latency.get(model, ()))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_SECONDS
+        return float(np.percentile(samples, 95))
+
+    def _record_first_token(self, model: str, seconds: float):
+        with self._lock:
+            self.first_token_latency[model].append(seconds)
+
+    def _run(self, model: str, open_stream, events: queue.Queue, cancelled: threading.Event, cached: bool = False):
+        """Worker thread: streams one model's pieces into the shared event queue."""
+        start = time.perf_counter()
+        breaker = self.breaker(model)
+        pieces = None
+        first = True
+        try:
+            pieces = open_stream(model)
+            for piece in pieces:
+                if first:
+                    # Recorded for losing hedges too, so the p95 is not biased towards winners;
+                    # instant cache hits say nothing about the model and would pull the hedge delay down
+                    first = False
+                    if not cached:
+                        self._record_first_token(model, time.perf_counter() - start)
+                    breaker.record_success()
+                if cancelled.is_set():
+                    return
+                events.put((model, "piece", piece))
+            if first:
+                breaker.record_success()
+            events.put((model, "end", None))
+        except Exception as e:
+            if "Task Cancelled" in str(e):
+                breaker.abandon()
+            else:
+                breaker.record_failure(e)
+                if "429" in str(e):
+                    quota_ledger.record_throttle(model, str(e))
+            events.put((model, "error", e))
+        finally:
+            if pieces is not None:
+                pieces.close()
+
+    def _wait_for_budget(self, model: str, tokens: int, max_wait: float, check_cancel=None) -> bool:
+        """
+        Waits (up to max_wait seconds) until the model's quota buckets can pay for the request,
+        then charges them. Returns False if the wait would be longer or the model's circuit is not closed.
+        """
+        deadline = time.perf_counter() + max_wait
+        while self.breaker(model).snapshot()["state"] == "closed":
+            has_budget, _ = quota_ledger.try_acquire(model, tokens)
+            if has_budget:
+                return True
+            wait = quota_ledger.retry_after(model, tokens)
+            if wait is None or time.perf_counter() + wait > deadline:
+                return False
+            # Short sleeps: waiters racing for the same refill retry the (atomic) acquire
+            if check_cancel: check_cancel()
+            time.sleep(min(max(wait, 0.05), POLL_SECONDS))
+        return False
+
+    def stream(self, open_stream, models: list = None, check_cancel=None, stats: dict = None, tokens: int = 0, is_cached=None, quota_wait: float = 0.0):
+        """
+        Generator of text pieces from the winning model.
+        `open_stream(model)` returns that model's piece generator (e.g. _generate_stream).
+        `tokens` is the estimated request size, charged against the quota ledger unless
+        `is_cached(model)` says the answer will come from the response cache.
+        `quota_wait` > 0 lets the request wait that long for the first model's quota to
+        refill before falling through to the next models (batch work such as long-video segments).
+        stats["cloud"] records the model used, whether a hedge fired, skipped, over-quota and failed models.
+        """
+        if stats is None:
+            stats = {}
+        pending = list(models or self.models)
+        events = queue.Queue()
+        attempts = {}
+        info = {"model": None, "hedged": False, "skipped": [], "over_quota": [], "failed": []}
+        stats["cloud"] = info
+        waits = {}  # model -> seconds until it could be tried again (None: never for this request)
+        prepaid = set()
+        if quota_wait > 0 and pending and not (is_cached and is_cached(pending[0])):
+            if self._wait_for_budget(pending[0], tokens, quota_wait, check_cancel):
+                prepaid.add(pending[0])
+
+        def launch():
+            while pending:
+                model = pending.pop(0)
+                breaker = self.breaker(model)
+                if not breaker.allow():
+                    info["skipped"].append(model)
+                    waits[model] = breaker.snapshot()["open_seconds_left"]
+                    continue
+                cached = bool(is_cached and is_cached(model))
+                if cached or model in prepaid:
+                    has_budget, reason = True, None
+                else:
+                    has_budget, reason = quota_ledger.try_acquire(model, tokens)
+                if not has_budget:
+                    breaker.abandon()
+                    info["over_quota"].append(f"{model}: {reason}")
+                    waits[model] = quota_ledger.retry_after(model, tokens)
+                    continue
+                attempts[model] = threading.Event()
+                threading.Thread(target=self._run, args=(model, open_stream, events, attempts[model], cached), daemon=True).start()
+                return model
+            return None
+
+        current = launch()
+        if current is None:
+            raise self._unavailable_error(info, waits)
+        running = 1
+        hedge_at = time.perf_counter() + self.hedge_delay(current)
+        extra = 0
+        last_error = None
+        winner = None
+        try:
+            while True:
+                if check_cancel: check_cancel()
+                try:
+                    model, kind, value = events.get(timeout=POLL_SECONDS)
+                except queue.Empty:
+                    if winner is None and extra < HEDGE_MAX_EXTRA and time.perf_counter() >= hedge_at:
+                        hedge = launch()
+                        if hedge is not None:
+                            extra += 1
+                            running += 1
+                            info["hedged"] = True
+                            with self._lock:
+                                self.hedges += 1
+                            print(f"[CLOUD-DISPATCH] No first token from {current} after {self.hedge_delay(current):.1f}s. Hedging with {hedge}...")
+                        hedge_at = float("inf")
+                    continue
+
+                if winner is not None and model != winner:
+                    continue
+                if kind == "error":
+                    if model == winner or "Task Cancelled" in str(value):
+                        raise value
+                    print(f"[CLOUD-DISPATCH] {model} failed: {str(value)[:120]}")
+                    info["failed"].append(model)
+                    last_error = value
+                    running -= 1
+                    if running == 0:
+                        current = launch()
+                        if current is None:
+                            if "429" not in str(last_error):
+                                raise last_error
+                            # Every model tried was throttled: their circuits are open now
+                            for failed in info["failed"]:
+                                waits[failed] = self.breaker(failed).snapshot()["open_seconds_left"]
+                            raise self._unavailable_error(info, waits, last_error) from last_error
+                        running = 1
+                        hedge_at = time.perf_counter() + self.hedge_delay(current)
+                    continue
+
+                if winner is None:
+                    winner = model
+                    info["model"] = model
+                    for other, cancelled in attempts.items():
+                        if other != model:
+                            cancelled.set()
+                    if info["hedged"] and model != self._primary(attempts):
+                        with self._lock:
+                            self.hedge_wins += 1
+                if kind == "end":
+                    return
+                yield value
+        finally:
+            for cancelled in attempts.values():
+                cancelled.set()
+
+    def _primary(self, attempts: dict):
+        return next(iter(attempts), None)
+
+    def _unavailable_error(self, info: dict, waits: dict, last_error: Exception = None) -> CloudUnavailableError:
+        """Typed error for an exhausted chain; the retry-after is the soonest any model frees up."""
+        reasons = []
+        if info["over_quota"]:
+            reasons.append(f"local quota budget exhausted ({'; '.join(info['over_quota'])})")
+        if info["skipped"]:
+            reasons.append(f"circuit open ({', '.join(info['skipped'])})")
+        if last_error is not None:
+            reasons.append(f"throttled ({str(last_error)[:120]})")
+        possible = [wait for wait in waits.values() if wait is not None]
+        return CloudUnavailableError(
+            f"All cloud models unavailable: {'; '.join(reasons) or 'no models configured'}",
+            retry_after=min(possible) if possible else None,
+            too_large=bool(waits) and not possible
+        )
+
+    def stats(self) -> dict:
+        models = {}
+        for model, breaker in list(self.breakers.items()):
+            entry = breaker.snapshot()
+            with self._lock:
+                samples = len(self.first_token_latency[model])
+            entry["first_token_samples"] = samples
+            entry["hedge_after_seconds"] = round(self.hedge_delay(model), 2)
+            models[model] = entry
+        return {"hedges": self.hedges, "hedge_wins": self.hedge_wins, "models": models}
+
+
+# Initialize Global Instance
+cloud_dispatcher = CloudDispatcher()
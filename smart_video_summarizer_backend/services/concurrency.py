@@ -0,0 +1,155 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Upper bounds per downstream (the adaptive limit moves between 1 and these)
+LIMIT_OLLAMA_MAX = int(os.getenv("LIMIT_OLLAMA_MAX", os.getenv("OLLAMA_MAX_IN_FLIGHT", 2)))
+LIMIT_GEMINI_MAX = int(os.getenv("LIMIT_GEMINI_MAX", 8))
+LIMIT_YTDLP_MAX = int(os.getenv("LIMIT_YTDLP_MAX", 6))
+
+# AIMD parameters
+ADDITIVE_INCREASE = 1.0       # +1 slot per `limit` healthy calls (~ +1 per round trip)
+MULTIPLICATIVE_DECREASE = 0.5
+LATENCY_SPIKE_FACTOR = 3.0    # latency above 3x the healthy baseline counts as congestion
+DECREASE_COOLDOWN_SECONDS = 2.0
+EWMA_ALPHA = 0.2
+
+
+def classify_error(error: Exception) -> str:
+    """'throttled' (429 / quota), 'ignored' (user cancellation) or 'error'."""
+    message = str(error)
+    if "Task Cancelled" in message:
+        return "ignored"
+    if "429" in message or "quota" in message.lower() or "Resource has been exhausted" in message:
+        return "throttled"
+    return "error"
+
+
+class Slot:
+    """One admitted call; streaming callers mark their first token, callers without exceptions can fail()."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.first_token_at = None
+        self.outcome = None
+
+    def first_token(self):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+
+    def fail(self, throttled: bool = False):
+        self.outcome = "throttled" if throttled else "error"
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit for one downstream (Ollama, Gemini API, yt-dlp).
+    Healthy calls raise the limit additively; errors, 429s and latency spikes
+    (vs. an EWMA baseline of healthy latency) cut it multiplicatively.
+    Baselines are kept per call kind (time to first token, full response, a whole
+    download...) so a healthy long call is never compared with a short one.
+    Callers above the limit wait; the wait is published as queueing delay.
+    """
+
+    def __init__(self, name: str, max_limit: int, initial: int = None, min_limit: int = 1):
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max(min_limit, max_limit)
+        self.limit = float(min(self.max_limit, initial or max(min_limit, self.max_limit // 2)))
+        self.in_flight = 0
+        self.waiting = 0
+        self.baselines = {}  # call kind -> EWMA of healthy latency
+        self.queue_delay = 0.0
+        self.max_queue_delay = 0.0
+        self.increases = 0
+        self.decreases = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def _acquire(self) -> float:
+        start = time.perf_counter()
+        with self._cond:
+            self.waiting += 1
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.waiting -= 1
+            self.in_flight += 1
+            delay = time.perf_counter() - start
+            self.queue_delay = delay if self.queue_delay == 0 else (1 - EWMA_ALPHA) * self.queue_delay + EWMA_ALPHA * delay
+            self.max_queue_delay = max(self.max_queue_delay, delay)
+        return delay
+
+    def _release(self, kind: str, latency: float, outcome: str):
+        with self._cond:
+            self.in_flight -= 1
+            baseline = self.baselines.get(kind)
+            if outcome == "ok" and baseline and latency > baseline * LATENCY_SPIKE_FACTOR:
+                outcome = "slow"
+
+            if outcome == "ok":
+                self.baselines[kind] = latency if baseline is None else (1 - EWMA_ALPHA) * baseline + EWMA_ALPHA * latency
+                if self.limit < self.max_limit:
+                    self.limit = min(self.max_limit, self.limit + ADDITIVE_INCREASE / self.limit)
+                    self.increases += 1
+            elif outcome in ("error", "throttled", "slow"):
+                now = time.monotonic()
+                # One cut per congestion event, not one per failed in-flight call
+                if now - self._last_decrease > DECREASE_COOLDOWN_SECONDS:
+                    self.limit = max(self.min_limit, self.limit * MULTIPLICATIVE_DECREASE)
+                    self.decreases += 1
+                    self._last_decrease = now
+                    print(f"[LIMITER-{self.name.upper()}] {outcome}: limit cut to {self.limit:.1f}")
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, kind: str = "call"):
+        """
+        `with limiter.slot("kind") as slot: call()` - waits for capacity, then reports the outcome.
+        Latency is compared only with earlier calls of the same kind.
+        """
+        self._acquire()
+        slot = Slot()
+        outcome = "ok"
+        try:
+            yield slot
+            outcome = slot.outcome or "ok"
+        except Exception as e:
+            outcome = classify_error(e)
+            raise
+        except BaseException:
+            # Generator closed early / interpreter exit: no signal about the downstream
+            outcome = "ignored"
+            raise
+        finally:
+            end = slot.first_token_at or time.perf_counter()
+            self._release(kind, end - slot.start, outcome)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "limit": round(self.limit, 2),
+                "max_limit": self.max_limit,
+                "in_flight": self.in_flight,
+                "waiting": self.waiting,
+                "queue_delay_seconds": round(self.queue_delay, 3),
+                "max_queue_delay_seconds": round(self.max_queue_delay, 3),
+                "baseline_latency_seconds": {kind: round(latency, 2) for kind, latency in self.baselines.items()},
+                "increases": self.increases,
+                "decreases": self.decreases
+            }
+
+
+# Initialize Global Instances (one limiter per downstream)
+limiters = {
+    "ollama": AdaptiveLimiter("ollama", LIMIT_OLLAMA_MAX),
+    "gemini": AdaptiveLimiter("gemini", LIMIT_GEMINI_MAX),
+    "ytdlp": AdaptiveLimiter("ytdlp", LIMIT_YTDLP_MAX)
+}
+
+
+def limiter_stats() -> dict:
+    return {name: limiter.stats() for name, limiter in limiters.items()}
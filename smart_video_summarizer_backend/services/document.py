@@ -0,0 +1,189 @@
+import re
+import numpy as np
+from nltk.tokenize import sent_tokenize, word_tokenize
+
+
+PSEUDO_SENTENCE_WORDS = 25
+
+
+class Document:
+    """
+    Tokenize-once representation of a request's text.
+    Built once per request and shared by chunking, scoring, skeleton extraction and stats.
+
+    Sentences are stored as character spans into the cleaned text, word tokens as one flat
+    list with per-sentence offsets. Chunks are (first_sentence, end_sentence) ranges into
+    this document, so overlapping chunks never tokenize the same words twice.
+    """
+
+    def __init__(self, text: str, sentences: list = None):
+        self.raw_chars = len(text)
+        # Basic Cleaning: Remove excessive whitespace and noise
+        self.text = " ".join(text.split())
+
+        # Word spans (whitespace split, the pipeline's token proxy)
+        word_spans = np.array([m.span() for m in re.finditer(r'\S+', self.text)], dtype=np.int64).reshape(-1, 2)
+        self.word_starts = word_spans[:, 0]
+        self.word_ends = word_spans[:, 1]
+        self.word_total = len(word_spans)
+
+        self.pseudo = False
+        self.raw_sentence_count = 0
+        if sentences is not None:
+            self.sent_starts, self.sent_ends = self._joined_spans(sentences)
+        else:
+            self.sent_starts, self.sent_ends = self._sentence_spans()
+        self.word_counts = self._count_words()
+
+        # Lazily built on first use (scoring only)
+        self._tokens = None
+        self._token_offsets = None
+        self.features = {}
+
+    @classmethod
+    def from_text(cls, text):
+        """Returns `text` unchanged if it is already a Document."""
+        if isinstance(text, Document):
+            return text
+        return cls(text or "")
+
+    @classmethod
+    def from_sentences(cls, sentences: list):
+        """Rebuilds a Document from already split (and cleaned) sentences, skipping sent_tokenize."""
+        return cls(" ".join(sentences), sentences=sentences)
+
+    # --- Sentences ---
+
+    def _joined_spans(self, sentences: list):
+        lengths = np.array([len(s) for s in sentences], dtype=np.int64)
+        starts = np.zeros(len(sentences), dtype=np.int64)
+        if len(sentences) > 1:
+            starts[1:] = np.cumsum(lengths[:-1] + 1)
+        self.raw_sentence_count = len(sentences)
+        return starts, starts + lengths
+
+    def _sentence_spans(self):
+        text = self.text
+        try:
+            sentences = sent_tokenize(text)
+        except LookupError:
+            sentences = text.split('. ')
+        self.raw_sentence_count = len(sentences)
+
+        # CRITICAL FIX: If punctuation is missing (e.g., raw transcripts), sent_tokenize fails.
+        # Detect by checking ratio of sentences to words.
+        word_count = self.word_total
+        unpunctuated = len(sentences) < (word_count // 50) and word_count > 100
+        if unpunctuated or (len(sentences) < 2 and word_count > PSEUDO_SENTENCE_WORDS):
+            if unpunctuated:
+                print(f"[WARN-TOKENIZE] Detected unpunctuated text (Words: {word_count}, Sentences: {len(sentences)}). Using Fallback Split.")
+            # Pseudo-sentences of 25 words
+            self.pseudo = True
+            idx = np.arange(0, word_count, PSEUDO_SENTENCE_WORDS)
+            last = np.minimum(idx + PSEUDO_SENTENCE_WORDS, word_count) - 1
+            return self.word_starts[idx].copy(), self.word_ends[last].copy()
+
+        # Locate every sentence in the cleaned text (tokenizer output is a substring)
+        starts = np.empty(len(sentences), dtype=np.int64)
+        ends = np.empty(len(sentences), dtype=np.int64)
+        cursor = 0
+        for i, sentence in enumerate(sentences):
+            pos = text.find(sentence, cursor)
+            if pos == -1:
+                pos = cursor
+            starts[i] = pos
+            ends[i] = max(pos, min(len(text), pos + len(sentence)))
+            cursor = ends[i]
+        return starts, ends
+
+    def _count_words(self) -> np.ndarray:
+        # Words whose start offset falls inside each sentence span
+        first = np.searchsorted(self.word_starts, self.sent_starts, side='left')
+        last = np.searchsorted(self.word_starts, self.sent_ends, side='left')
+        return (last - first).astype(np.int32)
+
+    def __len__(self):
+        return len(self.sent_starts)
+
+    def sentence(self, i: int) -> str:
+        s = self.text[self.sent_starts[i]:self.sent_ends[i]]
+        return s + "." if self.pseudo else s
+
+    def sentences(self, indices=None) -> list:
+        if indices is None:
+            indices = range(len(self))
+        return [self.sentence(i) for i in indices]
+
+    def join(self, indices) -> str:
+        return " ".join(self.sentence(i) for i in indices)
+
+    # --- Tokens ---
+
+    def _tokenize(self):
+        tokens = []
+        offsets = np.zeros(len(self) + 1, dtype=np.int64)
+        tokenizer = word_tokenize
+        for i in range(len(self)):
+            sentence = self.sentence(i).lower()
+            try:
+                sentence_tokens = tokenizer(sentence)
+            except LookupError:
+                # Punkt data missing: whitespace split for the rest of the document
+                tokenizer = str.split
+                sentence_tokens = sentence.split()
+            tokens.extend(sentence_tokens)
+            offsets[i + 1] = len(tokens)
+        self._tokens = tokens
+        self._token_offsets = offsets
+
+    @property
+    def tokens(self) -> list:
+        """Flat list of lower-cased word tokens for the whole document."""
+        if self._tokens is None:
+            self._tokenize()
+        return self._tokens
+
+    @property
+    def token_offsets(self) -> np.ndarray:
+        """Sentence i owns tokens[token_offsets[i]:token_offsets[i + 1]]."""
+        if self._token_offsets is None:
+            self._tokenize()
+        return self._token_offsets
+
+    def token_lists(self) -> list:
+        tokens, offsets = self.tokens, self.token_offsets
+        return [tokens[offsets[i]:offsets[i + 1]] for i in range(len(self))]
+
+    # --- Chunks ---
+
+    def chunk_ranges(self, max_tokens: int = 600, overlap: int = 50) -> list:
+        """
+        Groups sentences into chunks of at most `max_tokens` words.
+        Each new chunk re-uses the trailing sentences of the previous one covering ~`overlap` words.
+        """
+        chunks = []
+        start = 0
+        current_length = 0
+        for i in range(len(self)):
+            sentence_length = int(self.word_counts[i])
+            if current_length + sentence_length <= max_tokens or i == start:
+                current_length += sentence_length
+                continue
+
+            chunks.append((start, i))
+
+            # Carry trailing sentences of the finished chunk as overlap (never its first one)
+            new_start = i
+            carried = 0
+            while new_start - 1 > start and carried < overlap:
+                new_start -= 1
+                carried += int(self.word_counts[new_start])
+            start = new_start
+            current_length = carried + sentence_length
+
+        if len(self):
+            chunks.append((start, len(self)))
+        return chunks
+
+    def chunk_text(self, chunk: tuple) -> str:
+        return self.join(range(chunk[0], chunk[1]))
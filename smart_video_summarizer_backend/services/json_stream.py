@@ -0,0 +1,70 @@
+import json
+
+
+class JSONArrayStreamParser:
+    """
+    Incremental parser for a streamed JSON array of objects (LLM output like
+    `[{"quote": "..."}, {"quote": "..."}]`). feed() takes the next piece of text and
+    returns every object that closed in it, so callers can act on each element while the
+    model is still generating.
+    Tolerant of what local models produce: prose or ```json fences around the array,
+    a missing closing bracket (truncated output) and single malformed elements, which are
+    skipped without losing the rest. Only top-level objects are returned; text outside
+    objects is ignored, including a stray "{" in prose (an object must open with a key).
+    """
+
+    def __init__(self):
+        self.objects = 0
+        self.skipped = 0
+        self._buffer = []  # characters of the object being read
+        self._depth = 0
+        self._opening = False  # between an object's "{" and its first non-blank character
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, text: str) -> list:
+        closed = []
+        for char in text:
+            if self._opening and not char.isspace():
+                self._opening = False
+                if char not in '"}':
+                    # "{" followed by prose, not a key: drop it and read this character at the top level
+                    self._depth = 0
+            if self._depth == 0:
+                if char == '{':
+                    self._depth = 1
+                    self._opening = True
+                    self._buffer = [char]
+                continue
+
+            self._buffer.append(char)
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == '{':
+                self._depth += 1
+            elif char == '}':
+                self._depth -= 1
+                if self._depth == 0:
+                    closed.extend(self._parse("".join(self._buffer)))
+        return closed
+
+    def _parse(self, raw: str) -> list:
+        try:
+            # strict=False: raw newlines/tabs inside strings are common in model output
+            element = json.loads(raw, strict=False)
+        except json.JSONDecodeError:
+            # Not an object itself (e.g. prose in braces around the array): keep the objects inside it
+            inner = JSONArrayStreamParser()
+            elements = inner.feed(raw[1:])
+            self.objects += inner.objects
+            self.skipped += inner.skipped + (0 if elements else 1)
+            return elements
+        self.objects += 1
+        return [element]
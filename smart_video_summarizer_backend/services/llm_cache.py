@@ -0,0 +1,168 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Persistent LLM response cache (SQLite file, shared by local and cloud models)
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join("cache", "llm_cache.db"))
+# Entries older than this are regenerated (default 7 days)
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+# Max cached responses; least recently used entries are evicted beyond this
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 5000))
+
+
+def _part_digest(part):
+    """Stable digest for one prompt part: text, raw bytes, PIL image or inline-data dict."""
+    if isinstance(part, str):
+        return part
+    if isinstance(part, bytes):
+        return "bytes:" + hashlib.sha256(part).hexdigest()
+    if hasattr(part, "tobytes") and hasattr(part, "size") and hasattr(part, "mode"):
+        # PIL.Image frame
+        return f"image:{part.mode}:{part.size}:" + hashlib.sha256(part.tobytes()).hexdigest()
+    if isinstance(part, dict):
+        return {key: _part_digest(value) for key, value in sorted(part.items())}
+    if isinstance(part, (list, tuple)):
+        return [_part_digest(p) for p in part]
+    return repr(part)
+
+
+class LLMResponseCache:
+    """
+    Content-addressed cache in front of every model call (Ollama and Gemini).
+    Key = SHA-256 of (model, prompt parts incl. image digests, options). Stores the full
+    response text plus how long it took to generate, so hits can report the seconds saved.
+    Entries expire after a TTL; above max_entries the least recently used are evicted.
+    Callers pass force_new=True to skip the lookup (the fresh response still replaces the entry).
+    """
+
+    def __init__(self, path: str = LLM_CACHE_PATH, ttl_seconds: float = LLM_CACHE_TTL_SECONDS, max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self.evictions = 0
+        self._conn = None
+        self._entries = 0
+        self._lock = threading.Lock()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_responses ("
+                "key TEXT PRIMARY KEY, model TEXT, response TEXT NOT NULL, "
+                "seconds REAL NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_responses_last_used ON llm_responses (last_used)")
+            self._conn.commit()
+            self._entries = self._conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+            print(f"[LLM-CACHE] Opened {self.path} ({self._entries} cached responses).")
+        return self._conn
+
+    def key(self, model: str, prompt, options: dict = None) -> str:
+        payload = json.dumps(
+            {"model": model, "prompt": _part_digest(prompt), "options": options or {}},
+            sort_keys=True, default=repr
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str, force_new: bool = False):
+        """Returns the cached response text, or None (miss, expired or force_new)."""
+        if force_new:
+            with self._lock:
+                self.misses += 1
+            return None
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self.conn
+                row = conn.execute("SELECT response, seconds, created FROM llm_responses WHERE key = ?", (key,)).fetchone()
+                if row and now - row[2] > self.ttl_seconds:
+                    conn.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+                    conn.commit()
+                    self._entries -= 1
+                    row = None
+                if row is not None:
+                    conn.execute("UPDATE llm_responses SET last_used = ? WHERE key = ?", (now, key))
+                    conn.commit()
+            except sqlite3.Error as e:
+                print(f"[LLM-CACHE] Lookup failed: {e}")
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.saved_seconds += row[1]
+        print(f"[LLM-CACHE] Hit ({row[1]:.1f}s saved).")
+        return row[0]
+
+    def contains(self, key: str) -> bool:
+        """True if a live entry exists (no hit/miss accounting, no LRU refresh)."""
+        with self._lock:
+            try:
+                row = self.conn.execute("SELECT created FROM llm_responses WHERE key = ?", (key,)).fetchone()
+            except sqlite3.Error:
+                return False
+        return row is not None and time.time() - row[0] <= self.ttl_seconds
+
+    def put(self, key: str, model: str, response: str, seconds: float):
+        """Stores a complete response, then evicts least recently used entries above max_entries."""
+        if not response:
+            return
+        now = time.time()
+        with self._lock:
+            try:
+                self._store(key, model, response, seconds, now)
+            except sqlite3.Error as e:
+                print(f"[LLM-CACHE] Store failed: {e}")
+
+    def _store(self, key: str, model: str, response: str, seconds: float, now: float):
+        conn = self.conn
+        exists = conn.execute("SELECT 1 FROM llm_responses WHERE key = ?", (key,)).fetchone()
+        conn.execute(
+            "INSERT OR REPLACE INTO llm_responses (key, model, response, seconds, created, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+            (key, model, response, seconds, now, now)
+        )
+        if not exists:
+            self._entries += 1
+
+        excess = self._entries - self.max_entries
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM llm_responses WHERE key IN (SELECT key FROM llm_responses ORDER BY last_used LIMIT ?)",
+                (excess,)
+            )
+            self._entries -= excess
+            self.evictions += excess
+        conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            _ = self.conn
+            lookups = self.hits + self.misses
+            return {
+                "entries": self._entries,
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+                "saved_seconds": round(self.saved_seconds, 1)
+            }
+
+
+# Initialize Global Instance
+llm_cache = LLMResponseCache()
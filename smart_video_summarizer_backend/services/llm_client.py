@@ -0,0 +1,188 @@
+import os
+import time
+import queue
+import asyncio
+import threading
+from dotenv import load_dotenv
+import ollama
+from services.llm_load import local_llm_monitor
+from services.llm_cache import llm_cache
+from services.concurrency import limiters
+
+load_dotenv()
+
+LOCAL_MODEL = "gemma3:12b"
+# Max concurrent requests sent to Ollama (extra calls wait in the client queue)
+OLLAMA_MAX_IN_FLIGHT = int(os.getenv("OLLAMA_MAX_IN_FLIGHT", 2))
+# How long Ollama keeps the model in VRAM after the last request
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+
+
+class LocalLLMClient:
+    """
+    Single entry point for every local (Ollama) call.
+    Runs one pooled ollama.AsyncClient on a background event loop, so the connection pool
+    is shared by all request threads. In-flight requests are bounded by a semaphore
+    (hard cap) and the adaptive "ollama" limiter below it; keep_alive is sent explicitly and the model can be preloaded at startup.
+    Synchronous callers use chat() / chat_stream(); async callers can await achat().
+    """
+
+    def __init__(self, model: str = LOCAL_MODEL, max_in_flight: int = OLLAMA_MAX_IN_FLIGHT, keep_alive: str = OLLAMA_KEEP_ALIVE):
+        self.model = model
+        self.max_in_flight = max(1, max_in_flight)
+        self.keep_alive = keep_alive
+        self.queued = 0
+        self.running = 0
+        self.preloaded = False
+        self._loop = None
+        self._client = None
+        self._slots = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="ollama-client", daemon=True).start()
+            return self._loop
+
+    def _submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    # --- Runs on the client loop ---
+
+    def _ensure_client(self):
+        if self._client is None:
+            self._client = ollama.AsyncClient()
+            self._slots = asyncio.Semaphore(self.max_in_flight)
+
+    async def _acquire(self):
+        self._ensure_client()
+        self.queued += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.queued -= 1
+        self.running += 1
+
+    def _release(self):
+        self.running -= 1
+        self._slots.release()
+
+    async def _chat(self, messages: list, options: dict = None, model: str = None):
+        await self._acquire()
+        try:
+            return await self._client.chat(
+                model=model or self.model,
+                messages=messages,
+                options=options,
+                keep_alive=self.keep_alive
+            )
+        finally:
+            self._release()
+
+    async def _chat_stream(self, messages: list, options: dict, model: str, pieces: queue.Queue):
+        try:
+            await self._acquire()
+            try:
+                stream = await self._client.chat(
+                    model=model or self.model,
+                    messages=messages,
+                    options=options,
+                    keep_alive=self.keep_alive,
+                    stream=True
+                )
+                async for part in stream:
+                    pieces.put(("piece", part['message']['content']))
+            finally:
+                self._release()
+        except Exception as e:
+            pieces.put(("error", e))
+        finally:
+            pieces.put(("end", None))
+
+    async def _preload(self):
+        self._ensure_client()
+        start = time.perf_counter()
+        try:
+            # An empty prompt only loads the model
+            await self._client.generate(model=self.model, prompt="", keep_alive=self.keep_alive)
+            self.preloaded = True
+            print(f"[OLLAMA-CLIENT] {self.model} loaded in {time.perf_counter() - start:.1f}s (keep_alive={self.keep_alive}).")
+        except Exception as e:
+            print(f"[OLLAMA-CLIENT] Preload of {self.model} failed: {e}")
+
+    # --- Public API ---
+
+    async def achat(self, messages: list, options: dict = None, model: str = None):
+        """Awaitable chat from any event loop (the call itself runs on the client loop)."""
+        return await asyncio.wrap_future(self._submit(self._chat(messages, options, model)))
+
+    def chat(self, messages: list, options: dict = None, model: str = None, force_new: bool = False):
+        """Blocking chat call; returns the Ollama response (response['message']['content'])."""
+        model = model or self.model
+        key = llm_cache.key(model, messages, options)
+        cached = llm_cache.get(key, force_new)
+        if cached is not None:
+            return {'message': {'role': 'assistant', 'content': cached}}
+
+        start = time.perf_counter()
+        # Tracked before the limiter so callers waiting for a slot count towards the degrade queue depth
+        with local_llm_monitor.track(), limiters["ollama"].slot("response"):
+            response = self._submit(self._chat(messages, options, model)).result()
+        llm_cache.put(key, model, response['message']['content'], time.perf_counter() - start)
+        return response
+
+    def chat_stream(self, messages: list, options: dict = None, model: str = None, force_new: bool = False):
+        """Blocking generator of content pieces; closing it early cancels the request."""
+        model = model or self.model
+        key = llm_cache.key(model, messages, options)
+        cached = llm_cache.get(key, force_new)
+        if cached is not None:
+            yield cached
+            return
+
+        # Tracked before the limiter so callers waiting for a slot count towards the degrade queue depth
+        with local_llm_monitor.track() as call, limiters["ollama"].slot("first_token") as slot:
+            start = time.perf_counter()
+            collected = []
+            pieces = queue.Queue()
+            future = self._submit(self._chat_stream(messages, options, model, pieces))
+            try:
+                while True:
+                    kind, value = pieces.get()
+                    if kind == "end":
+                        break
+                    if kind == "error":
+                        raise value
+                    if value:
+                        call.first_token()
+                        slot.first_token()
+                        collected.append(value)
+                        yield value
+            finally:
+                future.cancel()
+        # Only complete responses are cached
+        llm_cache.put(key, model, "".join(collected), time.perf_counter() - start)
+
+    def preload(self):
+        """Loads the model in the background (used at server startup)."""
+        print(f"[OLLAMA-CLIENT] Preloading {self.model}...")
+        return self._submit(self._preload())
+
+    def metrics(self) -> dict:
+        metrics = {
+            "model": self.model,
+            "preloaded": self.preloaded,
+            "max_in_flight": self.max_in_flight,
+            "queue_depth": self.queued,
+            "running": self.running,
+            "adaptive_limit": limiters["ollama"].stats()["limit"]
+        }
+        metrics.update(local_llm_monitor.snapshot())
+        return metrics
+
+
+# Initialize Global Instance
+local_llm = LocalLLMClient()
@@ -0,0 +1,94 @@
+import os
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from dotenv import load_dotenv
+from services.concurrency import LIMIT_OLLAMA_MAX
+
+load_dotenv()
+
+# Degrade to extractive summaries when this many local LLM calls are running or waiting for
+# a slot; the default allows every Ollama slot to be busy plus two queued callers
+DEGRADE_QUEUE_DEPTH = int(os.getenv("DEGRADE_QUEUE_DEPTH", LIMIT_OLLAMA_MAX + 2))
+# ... or when recent calls took longer than this (seconds to first token / response)
+DEGRADE_LATENCY_SECONDS = float(os.getenv("DEGRADE_LATENCY_SECONDS", 60))
+# After a failed call (Ollama down / crashed), degrade for this long before trying again
+DEGRADE_COOLDOWN_SECONDS = float(os.getenv("DEGRADE_COOLDOWN_SECONDS", 30))
+LATENCY_WINDOW = 10
+
+
+class LLMCall:
+    """Handle for one tracked call; streaming callers mark their first token."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.first_token_at = None
+
+    def first_token(self):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+
+
+class LocalLLMMonitor:
+    """
+    Load signal for the local LLM (Ollama).
+    Counts in-flight calls (queue depth), keeps a window of recent latencies and remembers
+    the last failure. The pipeline asks should_degrade() before synthesis and switches to
+    extractive-only summaries while the local model is saturated or down.
+    """
+
+    def __init__(self):
+        self.in_flight = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.last_failure = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def track(self):
+        """Wraps one Ollama call: `with local_llm_monitor.track() as call: ...`"""
+        call = LLMCall()
+        with self._lock:
+            self.in_flight += 1
+        try:
+            yield call
+        except Exception:
+            with self._lock:
+                self.last_failure = time.monotonic()
+            raise
+        else:
+            end = call.first_token_at or time.perf_counter()
+            with self._lock:
+                self.latencies.append(end - call.start)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def recent_latency(self) -> float:
+        with self._lock:
+            if not self.latencies:
+                return 0.0
+            return sum(self.latencies) / len(self.latencies)
+
+    def should_degrade(self) -> tuple:
+        """Returns (degrade, reason)."""
+        with self._lock:
+            in_flight = self.in_flight
+            last_failure = self.last_failure
+        if last_failure is not None and time.monotonic() - last_failure < DEGRADE_COOLDOWN_SECONDS:
+            return True, "local_llm_unavailable"
+        if in_flight >= DEGRADE_QUEUE_DEPTH:
+            return True, f"queue_depth={in_flight}"
+        latency = self.recent_latency()
+        if latency > DEGRADE_LATENCY_SECONDS:
+            return True, f"latency={latency:.1f}s"
+        return False, None
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            in_flight = self.in_flight
+        return {"in_flight": in_flight, "recent_latency_seconds": round(self.recent_latency(), 2)}
+
+
+# Initialize Global Instance
+local_llm_monitor = LocalLLMMonitor()
@@ -0,0 +1,69 @@
+import os
+import threading
+from dotenv import load_dotenv
+from services.concurrency import limiters, LIMIT_OLLAMA_MAX
+from services.llm_client import LOCAL_MODEL
+
+load_dotenv()
+
+# Local models from most capable (and most expensive) to cheapest
+LOCAL_MODEL_TIERS = [m.strip() for m in os.getenv("LOCAL_MODEL_TIERS", f"{LOCAL_MODEL},gemma3:4b").split(",") if m.strip()]
+# Every this many queued/running Ollama calls moves cheap tasks one tier down; the default
+# (the Ollama slot limit) tiers only once a new call would have to queue
+TIER_BUSY_QUEUE_DEPTH = int(os.getenv("TIER_BUSY_QUEUE_DEPTH", LIMIT_OLLAMA_MAX))
+# Inputs longer than this (words) always stay on the top tier (small models lose track of long contexts)
+TIER_SMALL_MAX_WORDS = int(os.getenv("TIER_SMALL_MAX_WORDS", 4000))
+# Tasks the smaller models handle well enough; "report" qualifies only for short (and, under heavy load, medium) summaries
+CHEAP_TASKS = ("quotes", "condense")
+
+
+class ModelTierPolicy:
+    """
+    Picks the local model for one call from the tier list.
+    Idle box: always the top tier. Under load (queued + running Ollama calls) cheap work -
+    per-chunk quote extraction, map-step condensation, short reports - moves down one tier
+    per TIER_BUSY_QUEUE_DEPTH waiting calls. Long reports and long inputs never move down.
+    """
+
+    def __init__(self, tiers: list = None):
+        self.tiers = tiers or LOCAL_MODEL_TIERS or [LOCAL_MODEL]
+        self.routed = {}
+        self._lock = threading.Lock()
+
+    def queue_depth(self) -> int:
+        stats = limiters["ollama"].stats()
+        return stats["in_flight"] + stats["waiting"]
+
+    def choose(self, task: str, input_words: int = 0, length: str = None):
+        """Returns (model, reason)."""
+        depth = self.queue_depth()
+        tier, reason = 0, "idle"
+        if len(self.tiers) > 1 and depth >= TIER_BUSY_QUEUE_DEPTH:
+            steps = depth // max(1, TIER_BUSY_QUEUE_DEPTH)
+            if task == "report" and length == "medium":
+                # Medium reports only move down under heavy load
+                steps -= 1
+            if task == "report" and length not in ("short", "medium"):
+                reason = "long_report"
+            elif task not in CHEAP_TASKS and task != "report":
+                reason = "not_tiered"
+            elif input_words > TIER_SMALL_MAX_WORDS:
+                reason = f"input_words={input_words}"
+            else:
+                tier = max(0, min(steps, len(self.tiers) - 1))
+                reason = f"queue_depth={depth}"
+
+        model = self.tiers[tier]
+        with self._lock:
+            self.routed[model] = self.routed.get(model, 0) + 1
+        if tier:
+            print(f"[MODEL-TIER] {task} -> {model} ({reason})")
+        return model, reason
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"tiers": self.tiers, "queue_depth": self.queue_depth(), "routed": dict(self.routed)}
+
+
+# Initialize Global Instance
+model_tiers = ModelTierPolicy()
@@ -0,0 +1,110 @@
+import os
+import threading
+import traceback
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from dotenv import load_dotenv
+from services.document import Document
+from services.scoring import scoring_engine
+
+load_dotenv()
+
+# Hard cap on scoring processes for the whole server (shared by all concurrent requests)
+SCORING_WORKERS = int(os.getenv("SCORING_WORKERS", max(1, min(4, (os.cpu_count() or 2) - 1))))
+# Below this many sentences the IPC overhead costs more than it saves -> score inline
+PARALLEL_MIN_SENTENCES = int(os.getenv("SCORING_PARALLEL_MIN_SENTENCES", 3000))
+# Target sentences per batch sent to a worker
+BATCH_SENTENCES = int(os.getenv("SCORING_BATCH_SENTENCES", 1500))
+
+
+def _init_worker():
+    """Preload NLTK resources once per worker process (tokenizer, tagger, stopwords)."""
+    try:
+        from nltk.tokenize import sent_tokenize, word_tokenize
+        import nltk
+        _ = scoring_engine.stop_words
+        sent_tokenize("Warm up. Tokenizer.")
+        nltk.pos_tag_sents([word_tokenize("warm up the tagger")])
+    except Exception as e:
+        print(f"[SCORING-WORKER] NLTK preload incomplete: {e}")
+
+
+def _score_batch(sentences: list, chunks: list) -> list:
+    """Worker task: scores a contiguous batch of chunks given as local sentence ranges."""
+    document = Document.from_sentences(sentences)
+    return [scores for _, scores in scoring_engine.score_document(document, chunks)]
+
+
+class ParallelScorer:
+    """
+    Persistent process pool for Stage 2 (Math Scoring).
+    Splits the chunk list into contiguous batches, scores them in worker processes and
+    merges the results back in document order. Small documents are scored inline.
+    """
+
+    def __init__(self, max_workers: int = SCORING_WORKERS):
+        self.max_workers = max_workers
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                print(f"[SCORING-POOL] Starting {self.max_workers} scoring workers...")
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker)
+            return self._pool
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def make_batches(self, chunks: list) -> list:
+        """Groups consecutive chunks until a batch covers ~BATCH_SENTENCES sentences."""
+        batches = []
+        current = []
+        for chunk in chunks:
+            current.append(chunk)
+            if current[-1][1] - current[0][0] >= BATCH_SENTENCES:
+                batches.append(current)
+                current = []
+        if current:
+            batches.append(current)
+        return batches
+
+    def score(self, document: Document, chunks: list) -> list:
+        """
+        Same contract as scoring_engine.score_document:
+        returns one (sentence_indices, scores) pair per chunk, in chunk order.
+        """
+        if self.max_workers <= 1 or len(document) < PARALLEL_MIN_SENTENCES or len(chunks) < 2:
+            return scoring_engine.score_document(document, chunks)
+
+        batches = self.make_batches(chunks)
+        if len(batches) < 2:
+            return scoring_engine.score_document(document, chunks)
+
+        print(f"[SCORING-POOL] Scoring {len(chunks)} chunks in {len(batches)} batches on {self.max_workers} workers...")
+        try:
+            futures = []
+            for batch in batches:
+                first = batch[0][0]
+                last = max(end for _, end in batch)
+                local_chunks = [(start - first, end - first) for start, end in batch]
+                futures.append(self.pool.submit(_score_batch, document.sentences(range(first, last)), local_chunks))
+
+            results = []
+            for batch, future in zip(batches, futures):
+                for (start, end), scores in zip(batch, future.result()):
+                    results.append((np.arange(start, end, dtype=np.int64), scores))
+            return results
+        except Exception as e:
+            print(f"[SCORING-POOL] Parallel scoring failed ({e}). Falling back to inline scoring.")
+            traceback.print_exc()
+            return scoring_engine.score_document(document, chunks)
+
+
+# Initialize Global Instance
+parallel_scorer = ParallelScorer()
@@ -0,0 +1,189 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from dotenv import load_dotenv
+from services.token_budget import token_counter
+
+load_dotenv()
+
+# Free-tier quotas per cloud model: requests/minute, tokens/minute, requests/day
+MODEL_QUOTAS = {
+    "gemma-3-27b-it": {"rpm": 30, "tpm": 15000, "rpd": 14400},
+    "gemini-2.5-flash": {"rpm": 10, "tpm": 250000, "rpd": 250},
+    "gemini-2.5-flash-lite": {"rpm": 15, "tpm": 250000, "rpd": 1000},
+    "gemini-3-flash": {"rpm": 5, "tpm": 250000, "rpd": 20}
+}
+# Per-model overrides as JSON, e.g. {"gemini-2.5-flash": {"rpd": 1000}} for a paid tier
+QUOTA_OVERRIDES = os.getenv("QUOTA_OVERRIDES", "")
+# Persistent ledger (SQLite), so restarts don't hand out a fresh daily budget
+QUOTA_LEDGER_PATH = os.getenv("QUOTA_LEDGER_PATH", os.path.join("cache", "quota.db"))
+# Bucket -> (refill window in seconds, name the API uses in its 429 messages)
+BUCKETS = {
+    "rpm": (60, "requests_per_minute"),
+    "tpm": (60, "input_tokens_per_minute"),
+    "rpd": (86400, "requests_per_day")
+}
+
+
+def load_quotas() -> dict:
+    quotas = {model: dict(limits) for model, limits in MODEL_QUOTAS.items()}
+    if QUOTA_OVERRIDES:
+        try:
+            for model, limits in json.loads(QUOTA_OVERRIDES).items():
+                quotas.setdefault(model, {}).update(limits)
+        except (ValueError, AttributeError) as e:
+            print(f"[QUOTA] Ignoring invalid QUOTA_OVERRIDES: {e}")
+    return quotas
+
+
+def estimate_tokens(prompt_parts: list) -> int:
+    """
+    Request size charged to the TPM bucket: prompt tokens only (tokenizer count, fixed cost
+    per image). The free-tier TPM limit counts input tokens, so output is not reserved here.
+    """
+    return token_counter.count_parts(prompt_parts)
+
+
+class QuotaLedger:
+    """
+    Local token buckets for each cloud model's RPM, TPM and RPD quota.
+    Each bucket holds up to its limit and refills continuously over its window
+    (a minute or a day). A request is only routed to a model whose three buckets can
+    pay for it, so exhausted models are skipped before anything is sent. Bucket levels
+    are persisted in SQLite and refilled for the elapsed time on restart.
+    A 429 from the API drains the matching bucket, keeping the ledger honest when
+    other clients share the key.
+    """
+
+    def __init__(self, path: str = QUOTA_LEDGER_PATH, quotas: dict = None):
+        self.path = path
+        self.quotas = quotas or load_quotas()
+        self.rejections = {}
+        self._buckets = {}
+        self._conn = None
+        self._lock = threading.Lock()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS quota_buckets ("
+                "model TEXT NOT NULL, bucket TEXT NOT NULL, level REAL NOT NULL, updated REAL NOT NULL, "
+                "PRIMARY KEY (model, bucket))"
+            )
+            self._conn.commit()
+            for model, bucket, level, updated in self._conn.execute("SELECT model, bucket, level, updated FROM quota_buckets"):
+                self._buckets[(model, bucket)] = [level, updated]
+        return self._conn
+
+    def _level(self, model: str, bucket: str, now: float) -> float:
+        """Current bucket level after refilling for the time since its last update."""
+        capacity = self.quotas[model][bucket]
+        window = BUCKETS[bucket][0]
+        state = self._buckets.get((model, bucket))
+        if state is None:
+            state = self._buckets[(model, bucket)] = [float(capacity), now]
+        state[0] = min(capacity, state[0] + (now - state[1]) * capacity / window)
+        state[1] = now
+        return state[0]
+
+    def _save(self, model: str):
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO quota_buckets (model, bucket, level, updated) VALUES (?, ?, ?, ?)",
+            [(model, bucket, *self._buckets[(model, bucket)]) for bucket in BUCKETS if (model, bucket) in self._buckets]
+        )
+        self.conn.commit()
+
+    def try_acquire(self, model: str, tokens: int):
+        """Reserves one request and `tokens` tokens. Returns (True, None) or (False, exhausted quota name)."""
+        if model not in self.quotas:
+            return True, None
+        now = time.time()
+        with self._lock:
+            try:
+                _ = self.conn
+                needs = {"rpm": 1, "tpm": tokens, "rpd": 1}
+                for bucket, amount in needs.items():
+                    if bucket not in self.quotas[model]:
+                        continue
+                    if amount > self.quotas[model][bucket]:
+                        reason = f"{BUCKETS[bucket][1]} (request larger than the limit)"
+                    elif self._level(model, bucket, now) < amount:
+                        reason = BUCKETS[bucket][1]
+                    else:
+                        continue
+                    self.rejections[model] = self.rejections.get(model, 0) + 1
+                    return False, reason
+                for bucket, amount in needs.items():
+                    if bucket in self.quotas[model]:
+                        self._buckets[(model, bucket)][0] -= amount
+                self._save(model)
+            except sqlite3.Error as e:
+                # The ledger is advisory; never block a call because of it
+                print(f"[QUOTA] Ledger update failed: {e}")
+        return True, None
+
+    def retry_after(self, model: str, tokens: int):
+        """Seconds until try_acquire(model, tokens) can succeed; None if the request exceeds a limit outright."""
+        if model not in self.quotas:
+            return 0.0
+        now = time.time()
+        wait = 0.0
+        with self._lock:
+            try:
+                _ = self.conn
+            except sqlite3.Error:
+                pass
+            for bucket, amount in {"rpm": 1, "tpm": tokens, "rpd": 1}.items():
+                capacity = self.quotas[model].get(bucket)
+                if capacity is None:
+                    continue
+                if amount > capacity:
+                    return None
+                missing = amount - self._level(model, bucket, now)
+                if missing > 0:
+                    wait = max(wait, missing * BUCKETS[bucket][0] / capacity)
+        return wait
+
+    def record_throttle(self, model: str, error_message: str):
+        """The API returned a 429 anyway: empty the bucket it complained about."""
+        if model not in self.quotas:
+            return
+        bucket = "rpd" if "requests_per_day" in error_message or "PerDay" in error_message else "rpm"
+        if "tokens" in error_message.lower() and bucket == "rpm":
+            bucket = "tpm"
+        now = time.time()
+        with self._lock:
+            try:
+                _ = self.conn
+                self._level(model, bucket, now)
+                self._buckets[(model, bucket)][0] = 0.0
+                self._save(model)
+            except sqlite3.Error as e:
+                print(f"[QUOTA] Ledger update failed: {e}")
+        print(f"[QUOTA] {model}: {BUCKETS[bucket][1]} drained after a 429.")
+
+    def stats(self) -> dict:
+        now = time.time()
+        models = {}
+        with self._lock:
+            try:
+                _ = self.conn
+            except sqlite3.Error:
+                pass
+            for model, limits in self.quotas.items():
+                entry = {"rejections": self.rejections.get(model, 0)}
+                for bucket, limit in limits.items():
+                    entry[bucket] = {"remaining": int(self._level(model, bucket, now)), "limit": limit}
+                models[model] = entry
+        return models
+
+
+# Initialize Global Instance
+quota_ledger = QuotaLedger()
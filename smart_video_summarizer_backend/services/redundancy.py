@@ -0,0 +1,92 @@
+import zlib
+import numpy as np
+from collections import defaultdict
+from services.document import Document
+
+
+SHINGLE_SIZE = 3
+# Jaccard similarity (or containment in an already kept sentence) above which a sentence is dropped
+NEAR_DUPLICATE_THRESHOLD = 0.8
+
+
+class SkeletonDeduplicator:
+    """
+    Cross-chunk redundancy elimination for the Fact Skeleton.
+    Chunks overlap, so the same sentence can be selected by two neighbouring chunks. This stage
+    drops exact repeats and near-duplicates (hashed word shingles + inverted index) before the
+    skeleton is sent to the LLM.
+    """
+
+    def __init__(self, shingle_size: int = SHINGLE_SIZE, threshold: float = NEAR_DUPLICATE_THRESHOLD):
+        self.shingle_size = shingle_size
+        self.threshold = threshold
+
+    def shingles(self, words: list) -> set:
+        """Hashed word k-shingles (falls back to single words for very short sentences)."""
+        k = self.shingle_size if len(words) >= self.shingle_size else 1
+        return {zlib.crc32(" ".join(words[i:i+k]).encode('utf-8')) for i in range(len(words) - k + 1)}
+
+    def deduplicate(self, document: Document, sentence_indices) -> tuple:
+        """
+        Input: skeleton sentence indices (document order, may contain repeats from chunk overlap).
+        Returns: (kept_indices, report) where report counts what was removed.
+        """
+        sentence_indices = np.asarray(sentence_indices, dtype=np.int64)
+        report = {
+            "sentences_in": int(len(sentence_indices)),
+            "sentences_out": 0,
+            "exact_duplicates": 0,
+            "near_duplicates": 0,
+            "tokens_removed": 0
+        }
+
+        tokens, offsets = document.tokens, document.token_offsets
+        seen_sentences = set()
+        seen_hashes = set()
+        kept = []
+        kept_shingles = []
+        index = defaultdict(list)  # shingle -> positions in `kept`
+
+        for i in sentence_indices.tolist():
+            # 1. Exact: same sentence picked by two overlapping chunks, or identical text
+            words = [w for w in tokens[offsets[i]:offsets[i + 1]] if w.isalnum()]
+            text_hash = hash(" ".join(words))
+            if i in seen_sentences or text_hash in seen_hashes:
+                report["exact_duplicates"] += 1
+                report["tokens_removed"] += int(document.word_counts[i])
+                continue
+
+            # 2. Near-duplicate: compare only against kept sentences sharing a shingle
+            shingles = self.shingles(words)
+            overlaps = defaultdict(int)
+            for sh in shingles:
+                for pos in index.get(sh, ()):
+                    overlaps[pos] += 1
+
+            is_near_duplicate = False
+            for pos, shared in overlaps.items():
+                other = kept_shingles[pos]
+                jaccard = shared / (len(shingles) + len(other) - shared)
+                containment = shared / len(shingles) if shingles else 0.0
+                if jaccard >= self.threshold or containment >= self.threshold:
+                    is_near_duplicate = True
+                    break
+
+            seen_sentences.add(i)
+            if is_near_duplicate:
+                report["near_duplicates"] += 1
+                report["tokens_removed"] += int(document.word_counts[i])
+                continue
+
+            seen_hashes.add(text_hash)
+            for sh in shingles:
+                index[sh].append(len(kept))
+            kept.append(i)
+            kept_shingles.append(shingles)
+
+        report["sentences_out"] = len(kept)
+        return np.asarray(kept, dtype=np.int64), report
+
+
+# Initialize Global Instance
+skeleton_deduplicator = SkeletonDeduplicator()
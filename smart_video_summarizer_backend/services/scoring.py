@@ -0,0 +1,147 @@
+import string
+import traceback
+import nltk
+import numpy as np
+from scipy import sparse
+from nltk.corpus import stopwords
+from services.document import Document
+
+
+PROPER_NOUN_WEIGHT = 2.5
+LEAD_SENTENCE_BOOST = 1.5
+
+
+class SentenceScoringEngine:
+    """
+    Vectorized "Math Brain".
+    POS-tags every sentence of a Document once, builds a sparse sentence x term count
+    matrix and computes the hybrid scores for all chunks as array operations.
+    """
+
+    def __init__(self):
+        self._stop_words = None
+        self._punctuation = frozenset(string.punctuation)
+
+    @property
+    def stop_words(self) -> frozenset:
+        # Loaded once per process instead of once per chunk
+        if self._stop_words is None:
+            try:
+                self._stop_words = frozenset(stopwords.words('english'))
+            except LookupError:
+                print("[WARN-MATH-BRAIN] NLTK stopwords unavailable. Scoring without stopword filter.")
+                self._stop_words = frozenset()
+        return self._stop_words
+
+    def count_proper_nouns(self, token_lists: list) -> np.ndarray:
+        """Batch POS tagging of all sentences. Returns NNP counts per sentence."""
+        counts = np.zeros(len(token_lists), dtype=np.float64)
+        try:
+            tagged_sents = nltk.pos_tag_sents(token_lists)
+            for i, tagged in enumerate(tagged_sents):
+                counts[i] = sum(1 for _, pos in tagged if pos == 'NNP')
+        except Exception:
+            # Tagger missing -> no proper noun bonus (same as the per-sentence scorer)
+            pass
+        return counts
+
+    def term_matrix(self, token_lists: list):
+        """
+        Builds the sparse sentence x term count matrix.
+        Returns (matrix, vocabulary) where vocabulary maps term -> column.
+        """
+        vocabulary = {}
+        rows = []
+        cols = []
+        for row, tokens in enumerate(token_lists):
+            for token in tokens:
+                col = vocabulary.get(token)
+                if col is None:
+                    col = len(vocabulary)
+                    vocabulary[token] = col
+                rows.append(row)
+                cols.append(col)
+
+        data = np.ones(len(rows), dtype=np.float64)
+        matrix = sparse.csr_matrix(
+            (data, (np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64))),
+            shape=(len(token_lists), len(vocabulary))
+        )
+        matrix.sum_duplicates()
+        return matrix, vocabulary
+
+    def keyword_mask(self, vocabulary: dict) -> np.ndarray:
+        """1.0 for terms that count as keywords, 0.0 for stopwords and punctuation."""
+        stop_words = self.stop_words
+        mask = np.ones(len(vocabulary), dtype=np.float64)
+        for term, col in vocabulary.items():
+            if term in stop_words or term in self._punctuation:
+                mask[col] = 0.0
+        return mask
+
+    def document_features(self, document: Document) -> dict:
+        """
+        Per-document matrices, computed once and cached on the Document:
+        sentence x term counts, keyword mask per term and NNP counts per sentence.
+        """
+        if 'counts' not in document.features:
+            token_lists = document.token_lists()
+            counts, vocabulary = self.term_matrix(token_lists)
+            document.features['counts'] = counts
+            document.features['keyword'] = self.keyword_mask(vocabulary)
+            document.features['proper_nouns'] = self.count_proper_nouns(token_lists)
+        return document.features
+
+    def score_document(self, document: Document, chunks: list) -> list:
+        """
+        Scores the sentences of every chunk in one pass.
+          keyword    = sum over tokens of their keyword frequency inside the owning chunk
+          proper     = NNP count * 2.5
+          position   = x1.5 for the first sentence of every chunk
+        Input: chunks as (first_sentence, end_sentence) ranges into `document`.
+        Returns: list (one per chunk) of (sentence_indices, scores) arrays.
+        """
+        ranges = [np.arange(start, end, dtype=np.int64) for start, end in chunks]
+        if not ranges:
+            return []
+        rows = np.concatenate(ranges)
+        if len(rows) == 0:
+            return [(r, np.zeros(0, dtype=np.float64)) for r in ranges]
+
+        try:
+            features = self.document_features(document)
+            chunk_ids = np.repeat(np.arange(len(ranges)), [len(r) for r in ranges])
+            lead_mask = np.zeros(len(rows), dtype=bool)
+            lead_offsets = np.cumsum([0] + [len(r) for r in ranges[:-1]])
+            lead_mask[lead_offsets[[len(r) > 0 for r in ranges]]] = True
+
+            # Overlapping chunks share rows of the document matrix (no re-tokenizing)
+            entries = features['counts'][rows].tocoo()
+            keyword = features['keyword'][entries.col]
+
+            # Chunk-level keyword frequencies, keyed by (chunk, term) over the non-zero entries only
+            keys = chunk_ids[entries.row] * max(1, len(features['keyword'])) + entries.col
+            _, key_index = np.unique(keys, return_inverse=True)
+            chunk_freq = np.bincount(key_index, weights=entries.data)
+
+            # Each sentence sums the chunk frequency of every (non-stopword) token it contains
+            weights = entries.data * chunk_freq[key_index] * keyword
+            scores = np.bincount(entries.row, weights=weights, minlength=len(rows))
+
+            scores = scores + features['proper_nouns'][rows] * PROPER_NOUN_WEIGHT
+            scores[lead_mask] *= LEAD_SENTENCE_BOOST
+        except Exception as e:
+            print(f"[ERROR-MATH-BRAIN] Vectorized scoring failed: {e}")
+            traceback.print_exc()
+            scores = np.ones(len(rows), dtype=np.float64)
+
+        results = []
+        cursor = 0
+        for r in ranges:
+            results.append((r, scores[cursor:cursor + len(r)]))
+            cursor += len(r)
+        return results
+
+
+# Initialize Global Instance
+scoring_engine = SentenceScoringEngine()
@@ -2,19 +2,56 @@ import re
 import nltk
 import traceback
 import os
+import time
+import queue
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-import ollama
-from nltk.tokenize import sent_tokenize, word_tokenize
-from nltk.corpus import stopwords
-from collections import Counter
-import string
 import numpy as np
 import fitz  # PyMuPDF
 import docx2txt
+from services.document import Document
+from services.parallel_scoring import parallel_scorer
+from services.redundancy import skeleton_deduplicator
+from services.textrank import textrank_scorer
+from services.llm_load import local_llm_monitor
+from services.llm_client import local_llm
+from services.llm_cache import llm_cache
+from services.chunk_cache import chunk_score_cache
+from services.concurrency import limiters
+from services.cloud_dispatch import cloud_dispatcher, CLOUD_MODELS, CloudUnavailableError
+from services.quota import estimate_tokens
+from services.token_budget import token_counter
+from services.json_stream import JSONArrayStreamParser
+from services.model_tiers import model_tiers
 
 # Load environment variables
 load_dotenv()
 
+# Map-Reduce Synthesis: skeletons longer than this (words) are condensed in sections first
+SYNTHESIS_MAP_REDUCE_THRESHOLD = int(os.getenv("SYNTHESIS_MAP_REDUCE_THRESHOLD", 6000))
+SYNTHESIS_SECTION_WORDS = int(os.getenv("SYNTHESIS_SECTION_WORDS", 2500))
+SYNTHESIS_MAX_PARALLEL = int(os.getenv("SYNTHESIS_MAX_PARALLEL", 2))
+SYNTHESIS_MAX_ROUNDS = 3
+SYNTHESIS_SECTION_CTX = 8192
+
+# Skeleton Budget: share of the document's words that may reach the LLM, per summary length
+SKELETON_BUDGET_RATIO = {"short": 0.08, "medium": 0.18, "long": 0.35}
+# Floor (words) so short documents still get enough facts to write from
+SKELETON_MIN_WORDS = {"short": 120, "medium": 250, "long": 400}
+
+# Extractive ("lite") mode: summary length in words, and sentences per paragraph
+EXTRACTIVE_SUMMARY_WORDS = {"short": 120, "medium": 300, "long": 700, "detailed": 1200}
+EXTRACTIVE_PARAGRAPH_SENTENCES = 4
+
+# Pre-flight compression: selection passes before the tokenizer count fits the budget
+COMPRESS_MAX_PASSES = 3
+
+# Highlight quote extraction: transcript chunk size/overlap (chars) and chunks in flight at once
+QUOTE_CHUNK_CHARS = 12000
+QUOTE_CHUNK_OVERLAP = 500 # Overlap to catch sentences on boundaries
+QUOTE_MAX_PARALLEL = int(os.getenv("QUOTE_MAX_PARALLEL", 4))
+QUOTE_POLL_SECONDS = 0.25
+
 # Configure API Key (Try .env first, then placeholder)
 # Configure API Key - SKIPPED (Local Mode)
 # API_KEY = os.getenv("GEMINI_API_KEY")
@@ -64,113 +101,220 @@ class UAMSASummarizer:
         print("Initializing UAMSA Hybrid Pipeline...")
         # Check if API key is set
         self.api_key = os.getenv("GEMINI_API_KEY")
-        if not self.api_key:
+        # Optional stand-in server (scripts/fake_model_server.py) for offline testing
+        self.api_endpoint = os.getenv("GEMINI_API_ENDPOINT")
+        if self.api_endpoint:
+            print(f"[INFO] Using Gemini API endpoint {self.api_endpoint}")
+            genai.configure(api_key=self.api_key or "offline", transport="rest", client_options={"api_endpoint": self.api_endpoint})
+        elif not self.api_key:
             print("[WARN] Gemini API Key is missing. Cloud features will fail.")
         else:
             genai.configure(api_key=self.api_key)
 
-    def summarize_cloud(self, text: str, preference: str = "medium", format_mode: str = "paragraph", images: list = None, metadata: dict = {}, check_cancel=None) -> str:
+    def _stream_text(self, response, check_cancel=None):
+        """Yields the text of every streamed generate_content chunk (cancellable between chunks)."""
+        for chunk in response:
+            if check_cancel: check_cancel()
+            try:
+                if chunk.text:
+                    yield chunk.text
+            except ValueError:
+                pass
+
+    def _generate_stream(self, model_name: str, prompt_parts: list, check_cancel=None, force_new: bool = False):
+        """
+        Streams a generate_content call through the LLM response cache.
+        Hits yield the cached text at once; complete responses are stored for next time.
+        """
+        key = llm_cache.key(model_name, prompt_parts)
+        cached = llm_cache.get(key, force_new)
+        if cached is not None:
+            yield cached
+            return
+
+        # The adaptive "gemini" limiter holds concurrent API calls below the rate that triggers 429s
+        with limiters["gemini"].slot("first_token") as slot:
+            start = time.perf_counter()
+            model = genai.GenerativeModel(model_name)
+            response = model.generate_content(prompt_parts, stream=True)
+            collected = []
+            for piece in self._stream_text(response, check_cancel):
+                slot.first_token()
+                collected.append(piece)
+                yield piece
+        llm_cache.put(key, model_name, "".join(collected), time.perf_counter() - start)
+
+    def _dispatch_stream(self, prompt_parts: list, check_cancel=None, stats: dict = None, force_new: bool = False, models: list = None, quota_wait: float = 0.0):
+        """_generate_stream across the cloud model chain (quota routing, circuit breaking and hedging, see CloudDispatcher)."""
+        return cloud_dispatcher.stream(
+            lambda model_name: self._generate_stream(model_name, prompt_parts, check_cancel, force_new),
+            models or CLOUD_MODELS, check_cancel, stats, estimate_tokens(prompt_parts),
+            is_cached=lambda model_name: not force_new and llm_cache.contains(llm_cache.key(model_name, prompt_parts)),
+            quota_wait=quota_wait
+        )
+
+    def build_cloud_prompt(self, text: str, preference: str = "medium", format_mode: str = "paragraph", metadata: dict = {}) -> str:
+        """Text part of the multimodal cloud summary prompt (frames are appended after it)."""
+        # --- Rich Context Context Engine ---
+        category = metadata.get('category', 'General')
+        uploader = metadata.get('uploader', 'Unknown Creator')
+        title = metadata.get('title', 'Unknown Title')
+        tags = ", ".join(metadata.get('tags', []))
+        description = metadata.get('description', '')
+        
+        visual_focus = "Identify any specific people, speakers, or known figures visible in the frames."
+        
+        if "music" in category.lower():
+            visual_focus += " Focus on the visual aesthetic, mood, and instruments. Ignore lyrics if not in transcript."
+        elif "gaming" in category.lower():
+            visual_focus += " Focus on gameplay HUD, graphics quality, and key moments."
+        elif "tech" in category.lower():
+            visual_focus += " Focus on specific products, screens, and diagrams shown."
+
+        # Construct Prompt
+        directives = {
+            "short": "Provide a concise executive summary.",
+            "medium": "Provide a balanced, detailed narrative summary.",
+            "long": "Provide an extensive, comprehensive report covering all details.",
+            "detailed": "Provide a COMPLETE, DEEP-DIVE ANALYSIS. Cover every topic, chapter, and visual detail exhaustively. Do not leave out any significant information."
+        }
+        directive = directives.get(preference, "balanced summary")
+        
+        style_instruction = "Use a professional, third-person report style."
+        if format_mode == "bullet points":
+            style_instruction = "Use a structured list of bullet points."
+        
+        return f"""
+            You are an expert video analyst.
+            
+            --- VIDEO CONTEXT ---
+            Title: {title}
+            Creator: {uploader}
+            Category: {category}
+            Tags: {tags}
+            Description Excerpt: {description}
+            
+            --- INSTRUCTIONS ---
+            Task: {directive}
+            Visual Task: {visual_focus}
+            Style: {style_instruction}
+            Requirement: Use the metadata keys (tags/topics) to understand context, but DO NOT include any hashtags (e.g., #Example) in the final output.
+            
+            --- TRANSCRIPT ---
+            {text}
+            
+            --- ANALYSIS ---
+            Analyze the following frames and transcript together to produce the summary:
+            """
+
+    def summarize_cloud_stream(self, text: str, preference: str = "medium", format_mode: str = "paragraph", images: list = None, metadata: dict = {}, check_cancel=None, stats: dict = None, force_new: bool = False, quota_wait: float = 0.0):
         """
         Direct Cloud API Call for Video Transcripts + Images (Multimodal).
         Uses Gemma 3 27B IT (High RPD, Large Context).
         Accepts full metadata dict for rich context.
+        Generator: yields summary text pieces as they arrive. On failure the user-facing
+        message is yielded and also stored in stats["error"].
+        quota_wait: seconds the call may wait for the primary model's quota (see CloudDispatcher.stream).
         """
+        if stats is None:
+            stats = {}
         try:
             if check_cancel: check_cancel()
             print(f"[CLOUD-API] Sending {len(text)} chars + {len(images) if images else 0} frames to Gemma 3 27B IT...")
             
-            # Use Gemma 3 27B IT
-            model = genai.GenerativeModel('gemma-3-27b-it') 
+            prompt_parts = [self.build_cloud_prompt(text, preference, format_mode, metadata)]
             
-            # --- Rich Context Context Engine ---
-            category = metadata.get('category', 'General')
-            uploader = metadata.get('uploader', 'Unknown Creator')
-            title = metadata.get('title', 'Unknown Title')
-            tags = ", ".join(metadata.get('tags', []))
-            description = metadata.get('description', '')
-            
-            visual_focus = "Identify any specific people, speakers, or known figures visible in the frames."
+            # Append images if available
+            if images:
+                prompt_parts.extend(images)
             
-            if "music" in category.lower():
-                visual_focus += " Focus on the visual aesthetic, mood, and instruments. Ignore lyrics if not in transcript."
-            elif "gaming" in category.lower():
-                visual_focus += " Focus on gameplay HUD, graphics quality, and key moments."
-            elif "tech" in category.lower():
-                visual_focus += " Focus on specific products, screens, and diagrams shown."
+            # Gemma 3 27B IT first; the dispatcher skips exhausted models and hedges slow ones
+            yield from self._dispatch_stream(prompt_parts, check_cancel, stats, force_new, quota_wait=quota_wait)
+        except CloudUnavailableError as e:
+            print(f"[CLOUD-ERROR] {e}")
+            stats["error"] = e.user_message()
+            yield stats["error"]
+        except Exception as e:
+            error_str = str(e)
+            print(f"[CLOUD-ERROR] {error_str}")
+            stats["error"] = f"Error using Cloud API: {error_str}"
+            yield stats["error"]
+
+    def summarize_cloud(self, text: str, preference: str = "medium", format_mode: str = "paragraph", images: list = None, metadata: dict = {}, check_cancel=None, force_new: bool = False) -> str:
+        """Non-streaming cloud summary (see summarize_cloud_stream)."""
+        stats = {}
+        full_text = "".join(self.summarize_cloud_stream(text, preference, format_mode, images, metadata, check_cancel, stats, force_new))
+        return stats.get("error", full_text)
+
+    def summarize_segments_cloud_stream(self, segment_notes: list, preference: str = "medium", format_mode: str = "paragraph", metadata: dict = {}, check_cancel=None, stats: dict = None, force_new: bool = False):
+        """
+        Reduce step of long-video summarization.
+        `segment_notes` = [{"title", "start", "end", "summary"}] in time order (one per chapter/window).
+        Generator: yields the final summary pieces (errors also stored in stats["error"]).
+        """
+        if stats is None:
+            stats = {}
+        try:
+            if check_cancel: check_cancel()
+            print(f"[CLOUD-API] Reducing {len(segment_notes)} segment summaries...")
 
-            # Construct Prompt
             directives = {
-                "short": "Provide a concise executive summary.",
-                "medium": "Provide a balanced, detailed narrative summary.",
-                "long": "Provide an extensive, comprehensive report covering all details.",
-                "detailed": "Provide a COMPLETE, DEEP-DIVE ANALYSIS. Cover every topic, chapter, and visual detail exhaustively. Do not leave out any significant information."
+                "short": "Provide a concise executive summary of the whole video.",
+                "medium": "Provide a balanced, detailed narrative summary of the whole video.",
+                "long": "Provide an extensive, comprehensive report covering every part of the video.",
+                "detailed": "Provide a COMPLETE, DEEP-DIVE ANALYSIS of the whole video. Keep every topic and significant detail from every part."
             }
-            directive = directives.get(preference, "balanced summary")
-            
             style_instruction = "Use a professional, third-person report style."
             if format_mode == "bullet points":
                 style_instruction = "Use a structured list of bullet points."
-            
+
+            notes = "\n\n".join(
+                f"Part {i + 1} ({int(n['start'] // 60)}:{int(n['start'] % 60):02d}-{int(n['end'] // 60)}:{int(n['end'] % 60):02d}) {n['title']}:\n{n['summary']}"
+                for i, n in enumerate(segment_notes)
+            )
             prompt_parts = [
                 f"""
                 You are an expert video analyst.
                 
                 --- VIDEO CONTEXT ---
-                Title: {title}
-                Creator: {uploader}
-                Category: {category}
-                Tags: {tags}
-                Description Excerpt: {description}
+                Title: {metadata.get('title', 'Unknown Title')}
+                Creator: {metadata.get('uploader', 'Unknown Creator')}
+                Category: {metadata.get('category', 'General')}
                 
                 --- INSTRUCTIONS ---
-                Task: {directive}
-                Visual Task: {visual_focus}
+                The video is long, so each part was summarized separately (below, in time order).
+                Task: {directives.get(preference, directives['medium'])}
+                Merge the parts into one coherent summary; keep the order of events and do not repeat points.
                 Style: {style_instruction}
-                Requirement: Use the metadata keys (tags/topics) to understand context, but DO NOT include any hashtags (e.g., #Example) in the final output.
+                Do not mention "parts" or "segments" in the output.
                 
-                --- TRANSCRIPT ---
-                {text}
-                
-                --- ANALYSIS ---
-                Analyze the following frames and transcript together to produce the summary:
+                --- PART SUMMARIES ---
+                {notes}
                 """
             ]
-            
-            # Append images if available
-            if images:
-                prompt_parts.extend(images)
-            
-            # Use streaming to allow cancellation during generation
-            response = model.generate_content(prompt_parts, stream=True)
-            
-            full_text = ""
-            for chunk in response:
-                if check_cancel: check_cancel()
-                try:
-                    if chunk.text:
-                        full_text += chunk.text
-                except ValueError:
-                    pass
-                    
-            return full_text
+            yield from self._dispatch_stream(prompt_parts, check_cancel, stats, force_new)
+
+        except CloudUnavailableError as e:
+            print(f"[CLOUD-ERROR] Segment reduce failed: {e}")
+            stats["error"] = e.user_message()
+            yield stats["error"]
         except Exception as e:
             error_str = str(e)
-            print(f"[CLOUD-ERROR] {error_str}")
-            
-            if "429" in error_str:
-                return "The video is too long. Please try a shorter length video."
-            
-            return f"Error using Cloud API: {error_str}"
+            print(f"[CLOUD-ERROR] Segment reduce failed: {error_str}")
+            stats["error"] = f"Error using Cloud API: {error_str}"
+            yield stats["error"]
 
-    def summarize_visual_cloud(self, images: list, metadata: dict, length: str, format_mode: str, check_cancel=None) -> str:
+    def summarize_visual_cloud_stream(self, images: list, metadata: dict, length: str, format_mode: str, check_cancel=None, stats: dict = None, force_new: bool = False):
         """
         Visual-Only Fallback Pipeline.
         Used when transcripts are disabled/missing. Rely heavily on frames + metadata.
+        Generator: yields summary text pieces (errors also stored in stats["error"]).
         """
+        if stats is None:
+            stats = {}
         try:
             if check_cancel: check_cancel()
             print(f"[CLOUD-API-VISUAL] Using Gemma 3 27B IT for Visual Analysis ({len(images)} frames)...")
-            model = genai.GenerativeModel('gemma-3-27b-it')
             
             # --- Rich Context ---
             category = metadata.get('category', 'General')
@@ -212,47 +356,39 @@ class UAMSASummarizer:
                 prompt_parts.append("\n[NO FRAMES AVAILABLE] Please summarize based on metadata alone.")
             
             # Use streaming for visual summary to allow cancellation
-            response = model.generate_content(prompt_parts, stream=True)
-            
-            full_text = ""
-            for chunk in response:
-                if check_cancel: check_cancel()
-                try:
-                    if chunk.text:
-                        full_text += chunk.text
-                except ValueError:
-                    pass
-            
-            return full_text
+            yield from self._dispatch_stream(prompt_parts, check_cancel, stats, force_new)
             
+        except CloudUnavailableError as e:
+            print(f"[CLOUD-ERROR] Visual Summary Failed: {e}")
+            stats["error"] = e.user_message()
+            yield stats["error"]
         except Exception as e:
             error_str = str(e)
             print(f"[CLOUD-ERROR] Visual Summary Failed: {error_str}")
-            
-            if "429" in error_str:
-                return "The video is too long. Please try a shorter length video."
-                
-            return f"Visual Analysis Failed: {error_str}"
+            stats["error"] = f"Visual Analysis Failed: {error_str}"
+            yield stats["error"]
 
-    def generate_highlights_cloud(self, transcript_data: list, images: list = None, metadata: dict = {}, check_cancel=None) -> list:
+    def summarize_visual_cloud(self, images: list, metadata: dict, length: str, format_mode: str, check_cancel=None, force_new: bool = False) -> str:
+        """Non-streaming visual-only summary (see summarize_visual_cloud_stream)."""
+        stats = {}
+        full_text = "".join(self.summarize_visual_cloud_stream(images, metadata, length, format_mode, check_cancel, stats, force_new))
+        return stats.get("error", full_text)
+
+    def generate_highlights_cloud(self, transcript_data: list, images: list = None, metadata: dict = {}, check_cancel=None, force_new: bool = False) -> list:
         """
         Specialized Prompt for Extracting Video Highlights (JSON Timestamps).
         Returns: List of dicts [{'start': 10, 'end': 40, 'title': 'Intro'}, ...]
         """
-        FALLBACK_MODELS = [
-            "gemma-3-27b-it", 
-            "gemini-2.5-flash",
-            "gemini-2.5-flash-lite",
-            "gemini-3-flash"
-        ]
-
+        # Models still worth trying; the dispatcher skips open circuits and hedges slow models,
+        # this loop only moves past a model whose answer could not be parsed
+        remaining_models = list(CLOUD_MODELS)
         last_error = None
         
-        for model_name in FALLBACK_MODELS:
+        while remaining_models:
             if check_cancel: check_cancel()
+            model_name = None
             try:
-                print(f"[CLOUD-API] Generating Structured Highlights using {model_name}...")
-                model = genai.GenerativeModel(model_name)
+                print(f"[CLOUD-API] Generating Structured Highlights (trying {', '.join(remaining_models)})...")
                 
                 # Format Transcript with raw seconds for easier parsing by LLM
                 formatted_transcript = ""
@@ -295,16 +431,13 @@ class UAMSASummarizer:
                 if images: prompt_parts.extend(images)
                 
                 # Use streaming for highlights to allow cancellation
-                response = model.generate_content(prompt_parts, stream=True)
-                
-                full_text = ""
-                for chunk in response:
-                    if check_cancel: check_cancel()
-                    try:
-                        if chunk.text:
-                            full_text += chunk.text
-                    except ValueError:
-                        pass
+                dispatch_stats = {}
+                try:
+                    full_text = "".join(self._dispatch_stream(prompt_parts, check_cancel, dispatch_stats, force_new, remaining_models))
+                finally:
+                    # Every model up to the one that answered (or all of them) has had its chance
+                    model_name = dispatch_stats["cloud"]["model"] if dispatch_stats.get("cloud") else None
+                    remaining_models = remaining_models[remaining_models.index(model_name) + 1:] if model_name else []
                 
                 text_response = full_text.strip()
                 
@@ -379,7 +512,7 @@ class UAMSASummarizer:
                 print(f"[CLOUD-API] Merged {len(valid_highlights)} -> {len(merged_highlights)} highlights.")
                 
                 # ADD METADATA FOR UI IF FALLBACK HAPPENED (skip if primary model)
-                if model_name != "gemma-3-27b-it":
+                if model_name != CLOUD_MODELS[0]:
                      merged_highlights.insert(0, {
                          "warning": "MODEL_SWITCHED",
                          "details": f"Automatically switched to {model_name} due to high traffic."
@@ -390,11 +523,15 @@ class UAMSASummarizer:
             except Exception as e:
                 error_msg = str(e)
                 last_error = error_msg
-                print(f"[WARN] Model {model_name} failed: {error_msg}")
+                print(f"[WARN] Model {model_name or 'chain'} failed: {error_msg}")
+                if model_name is None:
+                    # The dispatcher already went through every remaining model
+                    if check_cancel: check_cancel()
+                    break
                 
                 # Only retry on Quota Errors (429)
                 if "429" in error_msg:
-                    print(f"[FALLBACK] Quota exceeded on {model_name}. Switching to next...")
+                    print(f"[FALLBACK] Quota exceeded on {model_name or 'all models'}. Switching to next...")
                     continue
                 else:
                     # Other errors (Parsing, etc) might be fatal or worth checking
@@ -412,331 +549,448 @@ class UAMSASummarizer:
                  violation = "Daily Quota Exceeded (All Models)"
             return [{"error": "QUOTA_EXCEEDED", "details": violation}]
             
-    def extract_key_quotes_local(self, transcript_text: str, metadata: dict = {}, check_cancel=None) -> list:
-        """
-        Uses Local Ollama (Gemma 3 12B) to find key sentences verbatim.
-        Handles long transcripts by splitting into chunks.
-        Returns: List of dicts [{'quote': 'Exact sentence text...'}]
-        """
-        import json
-        import re
-        
-        all_quotes = []
-        
+    def _quote_chunks(self, transcript_text: str) -> list:
+        """(start, end) character ranges of the transcript chunks sent for quote extraction."""
         # Chunking Strategy
         # 12000 chars ~= 3000 tokens. Safe for 8k context limit including instructions.
         # This ensures we don't truncate the start of the transcript.
-        CHUNK_SIZE = 12000 
-        OVERLAP = 500 # Overlap to catch sentences on boundaries
-        
         total_len = len(transcript_text)
-        print(f"[LOCAL-AI] Processing transcript of length {total_len} chars...")
-        
+        ranges = []
         start = 0
-        chunk_idx = 1
-        
-        # Loop until we process the whole text
         while start < total_len:
-            if check_cancel: check_cancel()
-            end = min(start + CHUNK_SIZE, total_len)
+            end = min(start + QUOTE_CHUNK_CHARS, total_len)
             
             # Snap end to nearest space to avoid cutting words
             if end < total_len:
                 last_space = transcript_text.rfind(' ', start, end)
                 if last_space != -1:
                     end = last_space
-            
-            chunk_text = transcript_text[start:end]
-            print(f"[LOCAL-AI] Processing Chunk {chunk_idx}: {len(chunk_text)} chars ({start}-{end})...")
-            
-            try:
-                # Context construction
-                prompt = f"""
-                --- TRANSCRIPT SEGMENT START ---
-                {chunk_text}
-                --- TRANSCRIPT SEGMENT END ---
-                
-                You are a JSON-Only Data Extractor.
-                
-                TASK: Identify ALL important verbatim sentences from the transcript segment above.
-                
-                OUTPUT RULES:
-                1. Return a VALID JSON List of objects.
-                2. Scan the ENTIRE segment found above.
-                3. Do NOT limit the number of quotes. If there are interesting points, extract them.
-                4. Each object must have a "quote" key containing the EXACT text.
-                5. NO introductory text. NO markdown. JUST the JSON list.
-                
-                EXAMPLE OUTPUT:
-                [
-                    {{ "quote": "The most important feature is the new battery life." }},
-                    {{ "quote": "It costs $999 which is a good deal." }}
-                ]
-                
-                YOUR OUTPUT:
-                """
-                
-                response = ollama.chat(model='gemma3:12b', messages=[
-                    {'role': 'user', 'content': prompt}
-                ])
-                
-                content = response['message']['content']
-                
-                # Robust Parsing
-                match = re.search(r'\[.*\]', content, re.DOTALL)
-                if match:
-                    json_str = match.group(0)
-                    try:
-                        chunk_quotes = json.loads(json_str)
-                        if isinstance(chunk_quotes, list):
-                            # Basic validation
-                            valid_quotes = [q for q in chunk_quotes if isinstance(q, dict) and 'quote' in q]
-                            all_quotes.extend(valid_quotes)
-                            print(f"[LOCAL-AI] Chunk {chunk_idx} yielded {len(valid_quotes)} quotes.")
-                    except json.JSONDecodeError:
-                        print(f"[WARN] Chunk {chunk_idx} produced invalid JSON.")
-                else:
-                    # Fallback for simple format
-                    if "```json" in content:
-                        try:
-                            clean = content.split("```json")[1].split("```")[0].strip()
-                            all_quotes.extend(json.loads(clean))
-                        except: pass
-            except Exception as e:
-                print(f"[WARN] Failed to process chunk {chunk_idx}: {e}")
-            
-            # Prepare for next iteration
+            ranges.append((start, end))
             
             # If we processed the very end of the text, stop.
             if end == total_len:
                 break
-                
-            start = end - OVERLAP # Move forward but keep some overlap
-            chunk_idx += 1
+            start = end - QUOTE_CHUNK_OVERLAP # Move forward but keep some overlap
+        return ranges
 
+    def _extract_chunk_quotes(self, chunk_idx: int, chunk_text: str, model: str, emit, check_cancel=None, force_new: bool = False):
+        """
+        One quote-extraction call for one transcript chunk with the request's model. The response is streamed through
+        an incremental JSON parser and every {"quote": ...} object is passed to
+        emit(("quote", chunk_idx, quote)) as soon as it closes; emit(("chunk_done", chunk_idx, model, count))
+        follows in every case except cancellation.
+        """
+        if check_cancel: check_cancel()
+        print(f"[LOCAL-AI] Processing Chunk {chunk_idx}: {len(chunk_text)} chars...")
+        count = 0
+        try:
+            # Context construction
+            prompt = f"""
+            --- TRANSCRIPT SEGMENT START ---
+            {chunk_text}
+            --- TRANSCRIPT SEGMENT END ---
             
-        print(f"[LOCAL-AI] Total extracted quotes: {len(all_quotes)}")
-        return all_quotes
-
-
-    def _preprocess_text(self, text: str) -> str:
-        # ... (rest of class)
-
-        # Basic Cleaning: Remove excessive whitespace and noise
-        text = " ".join(text.split())
-        return text.strip()
+            You are a JSON-Only Data Extractor.
+            
+            TASK: Identify ALL important verbatim sentences from the transcript segment above.
+            
+            OUTPUT RULES:
+            1. Return a VALID JSON List of objects.
+            2. Scan the ENTIRE segment found above.
+            3. Do NOT limit the number of quotes. If there are interesting points, extract them.
+            4. Each object must have a "quote" key containing the EXACT text.
+            5. NO introductory text. NO markdown. JUST the JSON list.
+            
+            EXAMPLE OUTPUT:
+            [
+                {{ "quote": "The most important feature is the new battery life." }},
+                {{ "quote": "It costs $999 which is a good deal." }}
+            ]
+            
+            YOUR OUTPUT:
+            """
+            
+            # Robust Parsing: objects are taken as they close, so fences/prose around the list,
+            # a malformed element or a truncated response only lose the broken part
+            parser = JSONArrayStreamParser()
+            for piece in local_llm.chat_stream(messages=[
+                {'role': 'user', 'content': prompt}
+            ], model=model, force_new=force_new):
+                if check_cancel: check_cancel()
+                for quote in parser.feed(piece):
+                    if isinstance(quote, dict) and 'quote' in quote:
+                        count += 1
+                        emit(("quote", chunk_idx, quote))
+            if parser.skipped:
+                print(f"[WARN] Chunk {chunk_idx}: skipped {parser.skipped} malformed JSON objects.")
+            print(f"[LOCAL-AI] Chunk {chunk_idx} yielded {count} quotes.")
+        except Exception as e:
+            if "Task Cancelled" in str(e):
+                raise
+            print(f"[WARN] Failed to process chunk {chunk_idx} after {count} quotes: {e}")
+        emit(("chunk_done", chunk_idx, model, count))
 
-    def get_micro_chunks(self, text: str, max_tokens: int = 600, overlap: int = 50) -> list:
+    def extract_key_quotes_local_stream(self, transcript_text: str, metadata: dict = {}, check_cancel=None, force_new: bool = False, stats: dict = None):
         """
-        Step 1.3: Divide raw text into small overlapping chunks.
+        Uses Local Ollama (Gemma 3 12B, or a smaller tier under load) to find key sentences verbatim.
+        Handles long transcripts by splitting into chunks, up to QUOTE_MAX_PARALLEL of them
+        in flight at once (the Ollama limiter still bounds real concurrency).
+        Generator of events while the chunks generate:
+            {"type": "quote", "chunk": i, "quote": {'quote': 'Exact sentence text...'}} as each quote closes,
+            {"type": "chunk_done", "chunk": i, "chunks": n, "done": k, "quotes": count} per finished chunk.
+        Chunks are numbered from 1 in transcript order. The models used are written to stats["models"].
         """
-        print(f"[MICRO-CHUNKING] splitting text with max_tokens={max_tokens}, overlap={overlap}...")
+        if stats is None:
+            stats = {}
+        stats["models"] = []
         
-        # 1. Basic Cleaning
-        text = self._preprocess_text(text)
+        ranges = self._quote_chunks(transcript_text)
+        # Chosen once per request: inside the workers the queue depth would count this request's own chunks
+        model, _ = model_tiers.choose("quotes", max(len(transcript_text[start:end].split()) for start, end in ranges) if ranges else 0)
+        print(f"[LOCAL-AI] Processing transcript of length {len(transcript_text)} chars in {len(ranges)} chunks with {model} (parallel={QUOTE_MAX_PARALLEL})...")
         
+        events = queue.Queue()
+        pool = ThreadPoolExecutor(max_workers=QUOTE_MAX_PARALLEL)
+        for i, (start, end) in enumerate(ranges):
+            pool.submit(self._extract_chunk_quotes, i + 1, transcript_text[start:end], model, events.put, check_cancel, force_new)
+        models = [None] * len(ranges)
+        done = 0
+        total = 0
         try:
-            # 2. Sentence Tokenization
-            sentences = sent_tokenize(text)
-            
-            # CRITICAL FIX: If punctuation is missing (e.g., raw transcripts), sent_tokenize fails.
-            # Detect by checking ratio of sentences to words.
-            word_count = len(text.split())
-            if len(sentences) < (word_count // 50) and word_count > 100:
-                print(f"[WARN-TOKENIZE] Detected unpunctuated text (Words: {word_count}, Sentences: {len(sentences)}). Using Fallback Split.")
-                words = text.split()
-                # Create pseudo-sentences of 25 words
-                sentences = [" ".join(words[i:i+25]) + "." for i in range(0, len(words), 25)]
-                
-        except Exception as e:
-            print(f"[ERROR-TOKENIZE] {e}")
-            sentences = text.split('. ')
+            while done < len(ranges):
+                # Poll so a cancelled task is noticed while chunks are still generating
+                if check_cancel: check_cancel()
+                try:
+                    event = events.get(timeout=QUOTE_POLL_SECONDS)
+                except queue.Empty:
+                    continue
+                if event[0] == "quote":
+                    total += 1
+                    yield {"type": "quote", "chunk": event[1], "quote": event[2]}
+                else:
+                    _, chunk_idx, model, count = event
+                    models[chunk_idx - 1] = model
+                    done += 1
+                    yield {"type": "chunk_done", "chunk": chunk_idx, "chunks": len(ranges), "done": done, "quotes": count}
+        except BaseException:
+            # Queued chunks never start; running ones stop at their next piece
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+        pool.shutdown()
         
-        chunks = []
-        current_chunk = ""
-        current_length = 0
+        for model in models:
+            if model and model not in stats["models"]:
+                stats["models"].append(model)
+        print(f"[LOCAL-AI] Total extracted quotes: {total}")
+
+    def get_micro_chunks(self, document, max_tokens: int = 600, overlap: int = 50) -> list:
+        """
+        Step 1.3: Divide the document into small overlapping chunks.
+        Returns (first_sentence, end_sentence) ranges into the Document, not copies of the text.
+        """
+        print(f"[MICRO-CHUNKING] splitting text with max_tokens={max_tokens}, overlap={overlap}...")
         
-        for sentence in sentences:
-            sentence_length = len(sentence.split()) # Basic word count as token proxy
-            
-            if current_length + sentence_length <= max_tokens:
-                current_chunk += " " + sentence
-                current_length += sentence_length
-            else:
-                if current_chunk:
-                    chunks.append(current_chunk.strip())
-                
-                words = current_chunk.split()
-                overlap_text = " ".join(words[-overlap:]) if len(words) > overlap else current_chunk
-                current_chunk = overlap_text + " " + sentence
-                current_length = len(current_chunk.split())
-                
-        if current_chunk:
-            chunks.append(current_chunk.strip())
+        # 1. Basic Cleaning + Sentence Tokenization (once per request)
+        document = Document.from_text(document)
+        
+        chunks = document.chunk_ranges(max_tokens, overlap)
             
         print(f"[MICRO-CHUNKING] Created {len(chunks)} chunks.")
         return chunks
 
-    def score_sentences(self, chunk: str):
+    def score_sentences(self, document, chunks: list = None, scorer: str = "uamsa") -> list:
         """
-        Step 2: Assign importance scores to sentences using a hybrid math formula.
+        Step 2: Assign importance scores to sentences.
+        scorer="uamsa": hybrid math formula (services/scoring.py), spread over the scoring
+                        process pool for large documents (services/parallel_scoring.py).
+                        Chunks seen before are served from the chunk score cache.
+        scorer="textrank": document-wide TF-IDF + TextRank (services/textrank.py).
+        Returns one (sentence_indices, scores) pair per chunk.
         """
+        document = Document.from_text(document)
+        if chunks is None:
+            chunks = [(0, len(document))]
         try:
-            stop_words = set(stopwords.words('english'))
-            sentences = sent_tokenize(chunk)
-            
-            # Fallback tokenization here too just in case
-            if len(sentences) < 2:
-                 words = chunk.split()
-                 sentences = [" ".join(words[i:i+25]) + "." for i in range(0, len(words), 25)]
-
-            # 1. Identify Keywords (Simple Frequency)
-            try:
-                words = word_tokenize(chunk.lower())
-            except LookupError:
-                words = chunk.lower().split()
-            
-            words = [w for w in words if w not in stop_words and w not in string.punctuation]
-            word_freq = Counter(words)
-            
-            # 2. Score each sentence
-            sentence_scores = []
-            for i, sentence in enumerate(sentences):
-                score = 0
-                try:
-                    tokens = word_tokenize(sentence.lower())
-                except LookupError:
-                    tokens = sentence.lower().split()
-                
-                # A. Keyword Density Score
-                keyword_score = sum([word_freq[w] for w in tokens if w in word_freq])
-                score += keyword_score
-                
-                # B. Proper Noun Weight
-                try:
-                    tagged = nltk.pos_tag(tokens)
-                    proper_nouns = [word for word, pos in tagged if pos == 'NNP']
-                    score += len(proper_nouns) * 2.5 
-                except Exception as e:
-                    pass
-                
-                # C. Position Bias
-                if i == 0:
-                    score *= 1.5 
-                    
-                sentence_scores.append(score)
-                
-            return list(zip(sentences, sentence_scores))
+            if scorer == "textrank":
+                return textrank_scorer.score_document(document, chunks)
+            return self._score_cached(document, chunks)
         except Exception as e:
-            print(f"[ERROR-MATH-BRAIN] Failed to score chunk: {e}")
+            print(f"[ERROR-MATH-BRAIN] Failed to score chunks: {e}")
             traceback.print_exc()
+            # Fallback: Just return sentences with score 1
+            return [(np.arange(start, end), np.ones(end - start)) for start, end in chunks]
+
+    def _score_cached(self, document, chunks: list) -> list:
+        """
+        UAMSA scoring with the content-addressed chunk cache (services/chunk_cache.py).
+        Only chunks whose text changed are scored, on a sub-document of just their sentences,
+        so unchanged regions skip tagging and scoring entirely.
+        """
+        report = {"hits": 0, "misses": len(chunks)}
+        document.features['chunk_cache'] = report
+        try:
+            keys = [chunk_score_cache.chunk_key(document.chunk_text(chunk)) for chunk in chunks]
+            cached = chunk_score_cache.get_many(keys)
+        except Exception as e:
+            print(f"[CHUNK-CACHE] Lookup failed ({e}). Scoring every chunk.")
+            return parallel_scorer.score(document, chunks)
+
+        missing = [j for j, key in enumerate(keys) if key not in cached]
+        report.update({"hits": len(chunks) - len(missing), "misses": len(missing)})
+        print(f"[CHUNK-CACHE] {report['hits']}/{len(chunks)} chunks cached, scoring {len(missing)}.")
+
+        scores = [cached.get(key) for key in keys]
+        if missing:
+            if len(missing) == len(chunks):
+                fresh = parallel_scorer.score(document, chunks)
+            else:
+                # Sub-document of the changed chunks' sentences (each chunk stays a contiguous range in it)
+                rows = np.unique(np.concatenate([np.arange(*chunks[j]) for j in missing]))
+                local_chunks = []
+                for j in missing:
+                    start, end = chunks[j]
+                    local_start = int(np.searchsorted(rows, start))
+                    local_chunks.append((local_start, local_start + end - start))
+                fresh = parallel_scorer.score(Document.from_sentences(document.sentences(rows)), local_chunks)
+
+            new_entries = {}
+            for j, (_, chunk_scores) in zip(missing, fresh):
+                scores[j] = np.asarray(chunk_scores, dtype=np.float64)
+                new_entries[keys[j]] = scores[j]
             try:
-                # Fallback: Just return sentences with score 1
-                return [(s, 1) for s in sent_tokenize(chunk)]
-            except:
-                return [(chunk, 1)]
+                chunk_score_cache.put_many(new_entries)
+            except Exception as e:
+                print(f"[CHUNK-CACHE] Store failed ({e}).")
+
+        return [(np.arange(start, end, dtype=np.int64), chunk_scores) for (start, end), chunk_scores in zip(chunks, scores)]
 
-    def extract_high_resolution_skeleton(self, chunk_with_scores):
+    def extract_high_resolution_skeleton(self, sentence_indices, scores) -> np.ndarray:
         """
         Step 3: Keep sentences that score above the average to form the 'Skeleton'.
+        Returns the kept sentence indices in document order.
         """
         try:
-            scores = [pair[1] for pair in chunk_with_scores]
-            if not scores:
-                return ""
+            scores = np.asarray(scores, dtype=np.float64)
+            sentence_indices = np.asarray(sentence_indices)
+            if len(scores) == 0:
+                return sentence_indices[:0]
             
-            mean_score = sum(scores) / len(scores)
+            mean_score = scores.mean()
             
             # Keep sentences scoring above 1.1x the mean
-            skeleton_sentences = [s for s, score in chunk_with_scores if score > (mean_score * 1.1)]
+            keep = scores > (mean_score * 1.1)
             
             # CRITICAL FALLBACK: If strict filtering removes everything, relax constraint
-            if not skeleton_sentences:
+            if not keep.any():
                  # Try 0.8x mean
-                 skeleton_sentences = [s for s, score in chunk_with_scores if score > (mean_score * 0.8)]
+                 keep = scores > (mean_score * 0.8)
             
             # If STILL empty (very rare, e.g. uniform scores), take top 3
-            if not skeleton_sentences:
-                 sorted_sentences = sorted(chunk_with_scores, key=lambda x: x[1], reverse=True)
-                 skeleton_sentences = [pair[0] for pair in sorted_sentences[:3]]
+            if not keep.any():
+                 top = np.argsort(-scores, kind='stable')[:3]
+                 return sentence_indices[np.sort(top)]
 
-            return " ".join(skeleton_sentences)
+            return sentence_indices[keep]
         except Exception as e:
              print(f"[ERROR-SKELETON] Failed to extract skeleton: {e}")
              traceback.print_exc()
-             return ""
+             return np.zeros(0, dtype=np.int64)
+
+    def skeleton_budget(self, document, preference: str) -> int:
+        """Step 3.6: Word budget for the Fact Skeleton, from the requested length and the document size."""
+        preference = preference if preference in SKELETON_BUDGET_RATIO else "medium"
+        return max(SKELETON_MIN_WORDS[preference], int(document.word_total * SKELETON_BUDGET_RATIO[preference]))
 
-    def generate_final_report(self, fact_skeleton: str, user_preference: str, format_mode: str = "paragraph") -> str:
+    def select_within_budget(self, document, sentence_indices, relevance: np.ndarray, budget_words: int) -> np.ndarray:
         """
-        Step 4: Synthesize facts into a report using Local Gemma 3 via Ollama.
-        This runs entirely on your RTX 4060 with NO daily limits.
+        Step 3.6: Global selection across chunks.
+        Takes the highest-relevance sentences (ties keep document order) until `budget_words` is met,
+        then returns them in document order. Always keeps at least one sentence.
         """
-        try:
-             # 1. Define the persona and style instructions
+        sentence_indices = np.asarray(sentence_indices, dtype=np.int64)
+        if len(sentence_indices) == 0:
+            return sentence_indices
+
+        words = document.word_counts[sentence_indices]
+        if int(words.sum()) <= budget_words:
+            return sentence_indices
+
+        order = np.argsort(-relevance[sentence_indices], kind='stable')
+        within = np.cumsum(words[order]) <= budget_words
+        within[0] = True
+        return np.sort(sentence_indices[order[within]])
+
+    def _report_prompt(self, fact_skeleton: str, user_preference: str, format_mode: str) -> str:
+        # 1. Define the persona and style instructions
+        base_instructions = (
+            "You are a professional third-person reporter. "
+            "Synthesize the following facts into a cohesive, fluid report. "
+            "Do not use first-person ('I', 'me') or meta-commentary ('The text says')."
+        )
+
+        if format_mode == "bullet points":
             base_instructions = (
-                "You are a professional third-person reporter. "
-                "Synthesize the following facts into a cohesive, fluid report. "
-                "Do not use first-person ('I', 'me') or meta-commentary ('The text says')."
+                "You are a professional analyst. "
+                "Synthesize the following facts into a structured list of bullet points. "
+                "Use clear, concise bullet points for the entire summary. "
+                "Do not use first-person ('I', 'me')."
             )
 
-            if format_mode == "bullet points":
-                base_instructions = (
-                    "You are a professional analyst. "
-                    "Synthesize the following facts into a structured list of bullet points. "
-                    "Use clear, concise bullet points for the entire summary. "
-                    "Do not use first-person ('I', 'me')."
-                )
+        directives = {
+            "short": "Provide a high-level executive summary of the core message.",
+            "medium": "Provide a balanced narrative summary of major events and themes.",
+            "long": "Provide an exhaustive, detailed report preserving all nuances."
+        }
+        
+        selected_directive = directives.get(user_preference, "balanced report")
 
-            directives = {
-                "short": "Provide a high-level executive summary of the core message.",
-                "medium": "Provide a balanced narrative summary of major events and themes.",
-                "long": "Provide an exhaustive, detailed report preserving all nuances."
-            }
-            
-            selected_directive = directives.get(user_preference, "balanced report")
+        # 2. Construct the single-turn prompt
+        return f"{base_instructions}\n\nTask: {selected_directive}\n\nFacts: {fact_skeleton}"
+
+    def _split_skeleton(self, fact_skeleton: str, section_words: int) -> list:
+        """Splits the skeleton into sections of ~section_words words on sentence boundaries."""
+        sentences = re.split(r'(?<=[.!?])\s+', fact_skeleton.strip())
+        sections = []
+        current = []
+        current_words = 0
+        for sentence in sentences:
+            words = len(sentence.split())
+            if current and current_words + words > section_words:
+                sections.append(" ".join(current))
+                current = []
+                current_words = 0
+            current.append(sentence)
+            current_words += words
+        if current:
+            sections.append(" ".join(current))
+        return sections
+
+    def _condense_section(self, section: str, index: int, total: int, force_new: bool = False, model: str = None) -> str:
+        """Map step: compress one skeleton section into dense notes (raw section on failure)."""
+        prompt = (
+            "You are a precise note-taker. "
+            "Condense the following facts into dense, factual notes. "
+            "Keep every name, number, date and key claim. Do not add commentary.\n\n"
+            f"Facts (section {index + 1} of {total}): {section}"
+        )
+        try:
+            response = local_llm.chat(
+                messages=[{'role': 'user', 'content': prompt}],
+                options={'temperature': 0.3, 'num_ctx': SYNTHESIS_SECTION_CTX},
+                model=model,
+                force_new=force_new
+            )
+            return response['message']['content']
+        except Exception as e:
+            print(f"[MAP-REDUCE] Section {index + 1}/{total} failed ({e}). Using raw section.")
+            return section
+
+    def _map_reduce_skeleton(self, fact_skeleton: str, stats: dict, force_new: bool = False) -> str:
+        """
+        Map phase of hierarchical synthesis: condense sections concurrently (bounded fan-out)
+        and repeat on the joined notes until they fit the single-call threshold.
+        """
+        notes = fact_skeleton
+        rounds = 0
+        map_start = time.perf_counter()
+        while len(notes.split()) > SYNTHESIS_MAP_REDUCE_THRESHOLD and rounds < SYNTHESIS_MAX_ROUNDS:
+            sections = self._split_skeleton(notes, SYNTHESIS_SECTION_WORDS)
+            rounds += 1
+            model, _ = model_tiers.choose("condense", SYNTHESIS_SECTION_WORDS)
+            print(f"[MAP-REDUCE] Round {rounds}: condensing {len(sections)} sections with {model} (parallel={SYNTHESIS_MAX_PARALLEL})...")
+            with ThreadPoolExecutor(max_workers=SYNTHESIS_MAX_PARALLEL) as pool:
+                # map() keeps section order
+                condensed = list(pool.map(
+                    self._condense_section, sections, range(len(sections)), [len(sections)] * len(sections),
+                    [force_new] * len(sections), [model] * len(sections)
+                ))
+            stats.setdefault("sections", []).append(len(sections))
+            stats.setdefault("map_models", []).append(model)
+            notes = "\n\n".join(condensed)
+
+        stats["map_rounds"] = rounds
+        stats["map_seconds"] = round(time.perf_counter() - map_start, 2)
+        return notes
+
+    def generate_final_report_stream(self, fact_skeleton: str, user_preference: str, format_mode: str = "paragraph", stats: dict = None, force_new: bool = False):
+        """
+        Step 4: Synthesize facts into a report using Local Gemma 3 via Ollama.
+        This runs entirely on your RTX 4060 with NO daily limits.
+        Generator: yields report text pieces as Ollama produces them.
+        Skeletons above SYNTHESIS_MAP_REDUCE_THRESHOLD words go through map-reduce synthesis
+        (concurrent section notes -> final reduce call). Stage timings are written to `stats`.
+        """
+        if stats is None:
+            stats = {}
+        try:
+            start = time.perf_counter()
+            facts = fact_skeleton
+            if len(fact_skeleton.split()) > SYNTHESIS_MAP_REDUCE_THRESHOLD:
+                stats["mode"] = "map_reduce"
+                facts = self._map_reduce_skeleton(fact_skeleton, stats, force_new)
+            else:
+                stats["mode"] = "single"
 
-            # 2. Construct the single-turn prompt
-            full_prompt = f"{base_instructions}\n\nTask: {selected_directive}\n\nFacts: {fact_skeleton}"
+            full_prompt = self._report_prompt(facts, user_preference, format_mode)
+            model, tier_reason = model_tiers.choose("report", len(facts.split()), user_preference)
+            stats["model"] = model
+            stats["model_reason"] = tier_reason
 
-            print(f"[OLLAMA] Sending {len(full_prompt)} chars to Gemma 3...")
+            print(f"[OLLAMA] Sending {len(full_prompt)} chars to {model}...")
 
-            # 3. Call the Local Model
-            response = ollama.chat(
-                model='gemma3:12b',
+            # 3. Call the Local Model (single call, or the reduce pass)
+            reduce_start = time.perf_counter()
+            pieces = local_llm.chat_stream(
                 messages=[
                     {'role': 'user', 'content': full_prompt}
                 ],
                 options={
                     'temperature': 0.7,
                     'num_ctx': 32768
-                }
+                },
+                model=model,
+                force_new=force_new
             )
             
-            return response['message']['content']
+            for piece in pieces:
+                if "first_token_seconds" not in stats:
+                    stats["first_token_seconds"] = round(time.perf_counter() - start, 2)
+                yield piece
+
+            stats["reduce_seconds"] = round(time.perf_counter() - reduce_start, 2)
+            stats["total_seconds"] = round(time.perf_counter() - start, 2)
 
         except Exception as e:
             print(f"[OLLAMA-ERROR] {e}")
             traceback.print_exc()
-            return f"[ERROR] Local Synthesis Failed: {e}\n\nBackup Skeleton:\n{fact_skeleton}"
+            stats["error"] = f"[ERROR] Local Synthesis Failed: {e}\n\nBackup Skeleton:\n{fact_skeleton}"
+            yield stats["error"]
 
-    def get_text_stats(self, text: str) -> dict:
-        """Helper to calculate text statistics."""
+    def generate_final_report(self, fact_skeleton: str, user_preference: str, format_mode: str = "paragraph", stats: dict = None, force_new: bool = False) -> str:
+        """Non-streaming Step 4 (see generate_final_report_stream)."""
+        if stats is None:
+            stats = {}
+        report = "".join(self.generate_final_report_stream(fact_skeleton, user_preference, format_mode, stats, force_new))
+        # Never mix a partial report with the error text
+        return stats.get("error", report)
+
+    def get_text_stats(self, text) -> dict:
+        """Helper to calculate text statistics (accepts raw text or a Document)."""
         if not text:
             return {"words": 0, "sentences": 0, "chars": 0}
         
-        try:
-            sentences = sent_tokenize(text)
-            # Fix for unpunctuated text (YouTube Transcripts)
-            if len(sentences) < (len(text.split()) // 20) and len(text) > 100:
-                 # Fallback: Assume ~20 words per sentence
-                 sentences = ["placeholder"] * (len(text.split()) // 20)
-        except:
-            sentences = text.split('.') 
+        document = Document.from_text(text)
+        words = document.word_total
+        sentences = document.raw_sentence_count
+        # Fix for unpunctuated text (YouTube Transcripts)
+        if sentences < (words // 20) and document.raw_chars > 100:
+             # Fallback: Assume ~20 words per sentence
+             sentences = words // 20
             
         return {
-            "words": len(text.split()),
-            "sentences": max(1, len(sentences)), # Ensure at least 1
-            "chars": len(text)
+            "words": words,
+            "sentences": max(1, sentences), # Ensure at least 1
+            "chars": document.raw_chars
         }
 
     def extract_text_from_file(self, file_path: str, content_type: str) -> str:
@@ -759,110 +1013,342 @@ class UAMSASummarizer:
             print(f"[ERROR] Text Extraction Failed: {e}")
             return ""
 
-    def summarize(self, text: str, preference: str = "medium", format_mode: str = "paragraph") -> dict:
+    def sentence_relevance(self, document, scored_chunks) -> np.ndarray:
+        """Relevance = score relative to its chunk mean (comparable across chunks; overlap keeps the best)."""
+        relevance = np.zeros(len(document), dtype=np.float64)
+        for sentence_indices, scores in scored_chunks:
+            scores = np.asarray(scores, dtype=np.float64)
+            if len(scores):
+                mean_score = scores.mean()
+                relative = scores / mean_score if mean_score > 0 else np.ones(len(scores))
+                np.maximum.at(relevance, np.asarray(sentence_indices, dtype=np.int64), relative)
+        return relevance
+
+    def compress_to_budget(self, text: str, budget_tokens: int, scorer: str = "uamsa") -> tuple:
         """
-        Pipeline Entry Point.
-        Stages 1 -> 2 -> 3 -> 4
+        Pre-flight compression for cloud prompts.
+        Scores every sentence with the local extractive scorer, drops repeats and keeps the
+        highest-relevance sentences, in original (time) order, until the text fits `budget_tokens`
+        (counted with the cloud tokenizer, see TokenCounter). Returns (text, report); short texts pass through unchanged.
+        """
+        start = time.perf_counter()
+        tokens_before = token_counter.count(text)
+        report = {"budget_tokens": int(budget_tokens), "tokens_before": tokens_before, "tokenizer": token_counter.tokenizer}
+        if tokens_before <= budget_tokens:
+            report.update({"compressed": False, "tokens_after": tokens_before})
+            return text, report
+
+        document = Document.from_text(text)
+        chunks = self.get_micro_chunks(document)
+        relevance = self.sentence_relevance(document, self.score_sentences(document, chunks, scorer))
+        deduplicated, _ = skeleton_deduplicator.deduplicate(document, np.arange(len(document), dtype=np.int64))
+
+        # Token budget -> word budget at this text's own tokens-per-word ratio; kept sentences
+        # can be denser than average, so re-select with a tighter word budget if the count overshoots
+        budget_words = int(budget_tokens * document.word_total / max(1, tokens_before))
+        for _ in range(COMPRESS_MAX_PASSES):
+            indices = self.select_within_budget(document, deduplicated, relevance, budget_words)
+            compressed = document.join(indices)
+            tokens_after = token_counter.count(compressed)
+            if tokens_after <= budget_tokens:
+                break
+            budget_words = int(budget_words * budget_tokens / tokens_after * 0.98)
+        report.update({
+            "compressed": True,
+            "tokens_after": tokens_after,
+            "sentences_before": len(document),
+            "sentences_after": int(len(indices)),
+            "seconds": round(time.perf_counter() - start, 2)
+        })
+        print(f"[COMPRESS] {tokens_before} -> {report['tokens_after']} tokens ({report['sentences_after']}/{len(document)} sentences kept).")
+        return compressed, report
+
+    def build_fact_skeleton(self, text, scorer: str = "uamsa", preference: str = "medium") -> tuple:
+        """
+        Stages 1 -> 3: Document, Micro-Chunking, Math Scoring, Skeleton Extraction, Dedup, Budget.
+        Returns: (document, fact_skeleton, skeleton_report)
+        """
+        # Stage 1: Tokenize once, then Micro-Chunking over sentence ranges
+        document = Document.from_text(text)
+        chunks = self.get_micro_chunks(document)
+        
+        # Stage 2 & 3: Math Scoring & Skeleton Extraction
+        skeleton_parts = []
+        print(f"[MATH-BRAIN] Scoring {len(chunks)} chunks ({scorer}) and extracting Fact Skeleton...")
+        
+        # Step 2: One vectorized pass over every chunk
+        scored_chunks = self.score_sentences(document, chunks, scorer)
+        
+        relevance = self.sentence_relevance(document, scored_chunks)
+        for sentence_indices, scores in scored_chunks:
+            # Step 3
+            skeleton_chunk = self.extract_high_resolution_skeleton(sentence_indices, scores)
+            if len(skeleton_chunk):
+                skeleton_parts.append(skeleton_chunk)
+        
+        skeleton_indices = np.concatenate(skeleton_parts) if skeleton_parts else np.zeros(0, dtype=np.int64)
+        
+        # Stage 3.5: Cross-chunk Redundancy Elimination (overlap repeats + near-duplicates)
+        skeleton_indices, skeleton_report = skeleton_deduplicator.deduplicate(document, skeleton_indices)
+        print(f"[DEDUP] Removed {skeleton_report['exact_duplicates']} exact + {skeleton_report['near_duplicates']} near-duplicate sentences ({skeleton_report['tokens_removed']} tokens).")
+        
+        # Stage 3.6: Preference-aware budget (short skeletons -> shorter LLM prefill)
+        budget_words = self.skeleton_budget(document, preference)
+        candidate_words = int(document.word_counts[skeleton_indices].sum())
+        skeleton_indices = self.select_within_budget(document, skeleton_indices, relevance, budget_words)
+        skeleton_words = int(document.word_counts[skeleton_indices].sum())
+        # Kept for the extractive summary (lite mode / degraded synthesis)
+        document.features['relevance'] = relevance
+        document.features['skeleton'] = skeleton_indices
+        skeleton_report.update({
+            "chunk_cache": document.features.get('chunk_cache'),
+            "preference": preference,
+            "budget_words": budget_words,
+            "candidate_words": candidate_words,
+            "skeleton_words": skeleton_words,
+            "sentences_out": int(len(skeleton_indices))
+        })
+        print(f"[SKELETON-BUDGET] {preference}: kept {skeleton_words}/{candidate_words} candidate words (budget {budget_words}).")
+        
+        final_fact_skeleton = document.join(skeleton_indices)
+        print(f"[DEBUG-INTERNAL] Chunks: {len(chunks)}")
+        print(f"[DEBUG-INTERNAL] Skeleton Parts: {len(skeleton_parts)}")
+        print(f"[DEBUG-INTERNAL] Skeleton Length: {len(final_fact_skeleton)} chars")
+        return document, final_fact_skeleton, skeleton_report
+
+    def extractive_summary(self, document, preference: str = "medium", format_mode: str = "paragraph") -> str:
         """
-        if not text: return {"summary_text": ""}
+        Lite mode: formats the best skeleton sentences as the summary, no LLM call.
+        Needs build_fact_skeleton() to have run on `document`.
+        """
+        preference = preference if preference in EXTRACTIVE_SUMMARY_WORDS else "medium"
+        indices = self.select_within_budget(
+            document, document.features['skeleton'], document.features['relevance'], EXTRACTIVE_SUMMARY_WORDS[preference]
+        )
+        sentences = []
+        for sentence in document.sentences(indices):
+            sentence = sentence.strip()
+            if sentence:
+                sentences.append(sentence[0].upper() + sentence[1:])
+
+        if format_mode == "bullet points":
+            return "\n".join(f"* {sentence}" for sentence in sentences)
+
+        paragraphs = [
+            " ".join(sentences[i:i + EXTRACTIVE_PARAGRAPH_SENTENCES])
+            for i in range(0, len(sentences), EXTRACTIVE_PARAGRAPH_SENTENCES)
+        ]
+        return "\n\n".join(paragraphs)
+
+    def summarize_stream(self, text: str, preference: str = "medium", format_mode: str = "paragraph", scorer: str = "uamsa", mode: str = "auto", force_new: bool = False):
+        """
+        Streaming Pipeline Entry Point.
+        Generator of events:
+          {"type": "status", "stage": ...}        progress markers
+          {"type": "token", "text": ...}          report text as the local model produces it
+          {"type": "reset"}                       discard the token text so far (a failed synthesis is replaced)
+          {"type": "result", "result": {...}}     final payload (same shape as summarize())
+        mode="auto":        LLM synthesis, degraded to extractive when the local LLM is saturated/down
+        mode="abstractive": always LLM synthesis
+        mode="extractive":  lite mode, formatted skeleton sentences only (no LLM)
+        force_new=True skips the LLM response cache.
+        """
+        if not text:
+            yield {"type": "result", "result": {"summary_text": ""}}
+            return
 
         print(f"\n[UAMSA-PIPELINE] Starting Hybrid Pipeline...")
         
         try:
-            # Stage 1: Micro-Chunking
-            chunks = self.get_micro_chunks(text)
-            
-            # Stage 2 & 3: Math Scoring & Skeleton Extraction
-            skeleton_parts = []
-            print(f"[MATH-BRAIN] Scoring {len(chunks)} chunks and extracting Fact Skeleton...")
-            
-            for i, chunk in enumerate(chunks):
-                # Step 2
-                scored_sentences = self.score_sentences(chunk)
-                # Step 3
-                skeleton_chunk = self.extract_high_resolution_skeleton(scored_sentences)
-                if skeleton_chunk:
-                    skeleton_parts.append(skeleton_chunk)
-            
-            final_fact_skeleton = " ".join(skeleton_parts)
-            print(f"[DEBUG-INTERNAL] Chunks: {len(chunks)}")
-            print(f"[DEBUG-INTERNAL] Skeleton Parts: {len(skeleton_parts)}")
-            print(f"[DEBUG-INTERNAL] Skeleton Length: {len(final_fact_skeleton)} chars")
+            yield {"type": "status", "stage": "extracting_facts"}
+            document, final_fact_skeleton, skeleton_report = self.build_fact_skeleton(text, scorer, preference)
             
             if not final_fact_skeleton.strip():
                  print("[CRITICAL] Skeleton is EMPTY! Check Scoring Logic or NLTK.")
-                 return {"summary_text": "Error: Could not extract facts from text. (Empty Skeleton)"}
+                 yield {"type": "result", "result": {"summary_text": "Error: Could not extract facts from text. (Empty Skeleton)"}}
+                 return
 
             print(f"[SKELETON-READY] Length: {len(final_fact_skeleton.split())} words.")
             
-            # Stage 4: API Synthesis
-            final_summary = self.generate_final_report(final_fact_skeleton, preference, format_mode)
+            degraded, degraded_reason = False, None
+            if mode == "auto":
+                degraded, degraded_reason = local_llm_monitor.should_degrade()
+                if degraded:
+                    print(f"[DEGRADED] Local LLM under load ({degraded_reason}). Using extractive summary.")
+            
+            synthesis_stats = {}
+            tokens_sent = False
+            if mode != "extractive" and not degraded:
+                yield {"type": "status", "stage": "synthesizing"}
+                
+                # Stage 4: API Synthesis (single call or map-reduce for long skeletons)
+                for event in _stream_tokens(self.generate_final_report_stream(final_fact_skeleton, preference, format_mode, synthesis_stats, force_new), synthesis_stats):
+                    tokens_sent = True
+                    yield event
+                final_summary = synthesis_stats.pop("text")
+                if "error" in synthesis_stats and mode == "auto":
+                    degraded, degraded_reason = True, "synthesis_failed"
+                    print(f"[DEGRADED] Local synthesis failed. Using extractive summary.")
+                synthesis_stats.pop("error", None)
+            
+            if mode == "extractive" or degraded:
+                # Stage 4 (lite): extractive summary from the scored skeleton
+                start = time.perf_counter()
+                final_summary = self.extractive_summary(document, preference, format_mode)
+                synthesis_stats = {"mode": "extractive", "total_seconds": round(time.perf_counter() - start, 3)}
+                if degraded:
+                    synthesis_stats["degraded_reason"] = degraded_reason
+                if tokens_sent:
+                    # Partial LLM text was already streamed before the failure
+                    yield {"type": "reset"}
+                yield {"type": "token", "text": final_summary}
             
             # Calculate Stats
-            orig_stats = self.get_text_stats(text)
+            orig_stats = self.get_text_stats(document)
             summ_stats = self.get_text_stats(final_summary)
 
             print(f"[SUCCESS] Pipeline Complete.")
 
-            return {
+            yield {"type": "result", "result": {
                 "summary_text": final_summary,
+                "degraded": degraded,
+                "model_used": synthesis_stats.get("model", "extractive"),
                 "stats": {
                     "original": orig_stats,
-                    "summary": summ_stats
+                    "summary": summ_stats,
+                    "skeleton": skeleton_report,
+                    "synthesis": synthesis_stats
                 }
-            }
+            }}
         except Exception as e:
             print(f"[CRITICAL-PIPELINE-FAILURE] {e}")
             traceback.print_exc()
-            return {"summary_text": f"Critical Error in Pipeline: {e}. Check backend logs."}
+            yield {"type": "result", "result": {"summary_text": f"Critical Error in Pipeline: {e}. Check backend logs."}}
+
+    def summarize(self, text: str, preference: str = "medium", format_mode: str = "paragraph", scorer: str = "uamsa", mode: str = "auto", force_new: bool = False) -> dict:
+        """
+        Pipeline Entry Point.
+        Stages 1 -> 2 -> 3 -> 4
+        `scorer` selects the extractive backend ("uamsa" or "textrank").
+        `mode` selects LLM synthesis or the extractive lite mode (see summarize_stream).
+        """
+        result = {"summary_text": ""}
+        for event in self.summarize_stream(text, preference, format_mode, scorer, mode, force_new):
+            if event["type"] == "result":
+                result = event["result"]
+        return result
 
 # Initialize Global Instance
 uamsa_algorithm = UAMSASummarizer()
 
-def summarize_text(text: str, length: str = "medium", format_mode: str = "paragraph") -> dict:
-    return uamsa_algorithm.summarize(text, length, format_mode)
+def collect_result(events) -> dict:
+    """Drains a streaming pipeline and returns its final result payload."""
+    result = {"summary_text": ""}
+    for event in events:
+        if event["type"] == "result":
+            result = event["result"]
+    return result
+
+def _stream_tokens(pieces, stats: dict):
+    """Turns a text-piece generator into token events (error text is not streamed as tokens)."""
+    collected = []
+    for piece in pieces:
+        collected.append(piece)
+        if "error" not in stats:
+            yield {"type": "token", "text": piece}
+    stats["text"] = stats.get("error", "".join(collected))
+
+def summarize_text(text: str, length: str = "medium", format_mode: str = "paragraph", scorer: str = "uamsa", mode: str = "auto", force_new: bool = False) -> dict:
+    return uamsa_algorithm.summarize(text, length, format_mode, scorer, mode, force_new)
+
+def summarize_text_stream(text: str, length: str = "medium", format_mode: str = "paragraph", scorer: str = "uamsa", mode: str = "auto", force_new: bool = False):
+    """Streaming wrapper for Text Summarization (events, see UAMSASummarizer.summarize_stream)"""
+    return uamsa_algorithm.summarize_stream(text, length, format_mode, scorer, mode, force_new)
     
     
-def summarize_text_cloud(text: str, length: str = "medium", format_mode: str = "paragraph", images: list = None, metadata: dict = {}, check_cancel=None) -> dict:
-    """Wrapper for Cloud-Based Video Summarization"""
-    summary = uamsa_algorithm.summarize_cloud(text, length, format_mode, images, metadata, check_cancel)
+def summarize_text_cloud_stream(text: str, length: str = "medium", format_mode: str = "paragraph", images: list = None, metadata: dict = {}, check_cancel=None, force_new: bool = False, quota_wait: float = 0.0):
+    """Streaming wrapper for Cloud-Based Video Summarization (token events + final result)"""
+    stats = {}
+    yield from _stream_tokens(uamsa_algorithm.summarize_cloud_stream(text, length, format_mode, images, metadata, check_cancel, stats, force_new, quota_wait), stats)
+    summary = stats["text"]
     
     # Generate Stats for consistency
     orig_stats = uamsa_algorithm.get_text_stats(text)
     summ_stats = uamsa_algorithm.get_text_stats(summary)
+    result_stats = {
+        "original": orig_stats,
+        "summary": summ_stats,
+        "cloud": stats.get("cloud")
+    }
+    if "error" in stats:
+        # The summary text is the error message (a call can fail after a model was chosen)
+        result_stats["error"] = stats["error"]
     
-    return {
+    yield {"type": "result", "result": {
         "summary_text": summary,
-        "stats": {
-            "original": orig_stats,
-            "summary": summ_stats
-        }
-    }
+        "model_used": stats["cloud"]["model"] if stats.get("cloud") else None,
+        "stats": result_stats
+    }}
+
+def summarize_text_cloud(text: str, length: str = "medium", format_mode: str = "paragraph", images: list = None, metadata: dict = {}, check_cancel=None, force_new: bool = False) -> dict:
+    """Wrapper for Cloud-Based Video Summarization"""
+    return collect_result(summarize_text_cloud_stream(text, length, format_mode, images, metadata, check_cancel, force_new))
 
-def generate_video_highlights(transcript_data: list, images: list = None, metadata: dict = {}, check_cancel=None) -> list:
+def generate_video_highlights(transcript_data: list, images: list = None, metadata: dict = {}, check_cancel=None, force_new: bool = False) -> list:
     """Wrapper for Video Highlights Generation"""
-    return uamsa_algorithm.generate_highlights_cloud(transcript_data, images, metadata, check_cancel)
-    
-def extract_and_summarize(file_path: str, content_type: str, length: str, format_mode: str) -> dict:
+    return uamsa_algorithm.generate_highlights_cloud(transcript_data, images, metadata, check_cancel, force_new)
+
+def extract_and_summarize_stream(file_path: str, content_type: str, length: str, format_mode: str, scorer: str = "uamsa", mode: str = "auto", force_new: bool = False):
+    """Streaming wrapper for File Summarization (events, see UAMSASummarizer.summarize_stream)"""
     # 1. Extract
+    yield {"type": "status", "stage": "extracting_text"}
     raw_text = uamsa_algorithm.extract_text_from_file(file_path, content_type)
     if not raw_text:
-        return {"summary_text": "Failed to extract text from file."}
+        yield {"type": "result", "result": {"summary_text": "Failed to extract text from file."}}
+        return
         
     # 2. Summarize
-    return uamsa_algorithm.summarize(raw_text, length, format_mode)
+    yield from uamsa_algorithm.summarize_stream(raw_text, length, format_mode, scorer, mode, force_new)
+    
+def extract_and_summarize(file_path: str, content_type: str, length: str, format_mode: str, scorer: str = "uamsa", mode: str = "auto", force_new: bool = False) -> dict:
+    return collect_result(extract_and_summarize_stream(file_path, content_type, length, format_mode, scorer, mode, force_new))
 
-def extract_key_quotes_local(transcript_text: str, metadata: dict = {}, check_cancel=None) -> list:
-    """Wrapper for Local Highlight Extraction"""
-    return uamsa_algorithm.extract_key_quotes_local(transcript_text, metadata, check_cancel)
+def extract_key_quotes_local_stream(transcript_text: str, metadata: dict = {}, check_cancel=None, force_new: bool = False, stats: dict = None):
+    """Streaming wrapper for Local Highlight Extraction (quote / chunk_done events)"""
+    return uamsa_algorithm.extract_key_quotes_local_stream(transcript_text, metadata, check_cancel, force_new, stats)
 
-def summarize_visual_fallback(images: list = None, metadata: dict = {}, length: str = "medium", format_mode: str = "paragraph", check_cancel=None) -> dict:
-    """Wrapper for Visual-Only Fallback Summary"""
-    summary = uamsa_algorithm.summarize_visual_cloud(images, metadata, length, format_mode, check_cancel)
+def summarize_segments_stream(segment_notes: list, length: str = "medium", format_mode: str = "paragraph", metadata: dict = {}, check_cancel=None, force_new: bool = False):
+    """Streaming wrapper for the long-video reduce step (token events + final result)"""
+    stats = {}
+    yield from _stream_tokens(uamsa_algorithm.summarize_segments_cloud_stream(segment_notes, length, format_mode, metadata, check_cancel, stats, force_new), stats)
+    summary = stats["text"]
+    yield {"type": "result", "result": {
+        "summary_text": summary,
+        "model_used": stats["cloud"]["model"] if stats.get("cloud") else None,
+        "stats": {
+            "summary": uamsa_algorithm.get_text_stats(summary),
+            "cloud": stats.get("cloud")
+        }
+    }}
+
+def compress_transcript(text: str, budget_tokens: int) -> tuple:
+    """Wrapper for pre-flight transcript compression (returns (text, report))"""
+    return uamsa_algorithm.compress_to_budget(text, budget_tokens)
+
+def cloud_prompt_tokens(metadata: dict = {}, length: str = "medium", format_mode: str = "paragraph") -> int:
+    """Tokens of the cloud summary prompt around the transcript (instructions + metadata)"""
+    return token_counter.count(uamsa_algorithm.build_cloud_prompt("", length, format_mode, metadata))
+
+def summarize_visual_fallback_stream(images: list = None, metadata: dict = {}, length: str = "medium", format_mode: str = "paragraph", check_cancel=None, force_new: bool = False):
+    """Streaming wrapper for Visual-Only Fallback Summary (token events + final result)"""
+    stats = {}
+    yield from _stream_tokens(uamsa_algorithm.summarize_visual_cloud_stream(images, metadata, length, format_mode, check_cancel, stats, force_new), stats)
+    summary = stats["text"]
     
     # Generate Stats (Visual Only stats are estimated or flagged)
-    return {
+    yield {"type": "result", "result": {
         "summary_text": summary,
+        "model_used": stats["cloud"]["model"] if stats.get("cloud") else None,
         "stats": {
             "original": {
                 "words": 0,
@@ -870,6 +1356,11 @@ def summarize_visual_fallback(images: list = None, metadata: dict = {}, length:
                 "chars": 0,
                 "note": "Visual Analysis Only (No Transcript)"
             },
-            "summary": uamsa_algorithm.get_text_stats(summary)
+            "summary": uamsa_algorithm.get_text_stats(summary),
+            "cloud": stats.get("cloud")
         }
-    }
+    }}
+
+def summarize_visual_fallback(images: list = None, metadata: dict = {}, length: str = "medium", format_mode: str = "paragraph", check_cancel=None, force_new: bool = False) -> dict:
+    """Wrapper for Visual-Only Fallback Summary"""
+    return collect_result(summarize_visual_fallback_stream(images, metadata, length, format_mode, check_cancel, force_new))
@@ -0,0 +1,135 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# SentencePiece model of the cloud model family (Gemma 3 tokenizer.model)
+TOKENIZER_MODEL_PATH = os.getenv("TOKENIZER_MODEL_PATH", os.path.join("models", "tokenizer.model"))
+# Memoized counts (per text hash) kept in memory
+TOKEN_COUNT_CACHE_SIZE = int(os.getenv("TOKEN_COUNT_CACHE_SIZE", 2048))
+# Used only when the tokenizer model is missing
+CHARS_PER_TOKEN = 4
+# Gemma 3 / Gemini bill a fixed amount per image frame
+IMAGE_TOKENS = 258
+# Texts shorter than this are counted directly (hashing would cost about as much)
+MEMO_MIN_CHARS = 256
+# Put into budget stats while counts are estimates (no tokenizer model)
+HEURISTIC_WARNING = (
+    f"Token counts are estimated (~{CHARS_PER_TOKEN} chars/token): no tokenizer model at TOKENIZER_MODEL_PATH. "
+    "Budgets may be off; see the README for getting Gemma 3's tokenizer.model."
+)
+
+
+class TokenCounter:
+    """
+    Token counts with the real SentencePiece tokenizer, memoized per text hash.
+    A transcript is counted once no matter how many budget decisions look at it.
+    Falls back to ~4 chars per token when sentencepiece or the model file is missing,
+    and says so in `tokenizer` so stats show which estimate was used.
+    """
+
+    def __init__(self, model_path: str = TOKENIZER_MODEL_PATH, cache_size: int = TOKEN_COUNT_CACHE_SIZE):
+        self.model_path = model_path
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._processor = None
+        self._loaded = False
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def processor(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    try:
+                        import sentencepiece as spm
+                        if os.path.exists(self.model_path):
+                            self._processor = spm.SentencePieceProcessor(model_file=self.model_path)
+                            print(f"[TOKENS] Loaded tokenizer {self.model_path} ({self._processor.get_piece_size()} pieces).")
+                        else:
+                            print(f"[TOKENS] WARNING: No tokenizer at {self.model_path}. Estimating ~{CHARS_PER_TOKEN} chars/token; prompt budgets are NOT exact (see README).")
+                    except Exception as e:
+                        print(f"[TOKENS] Tokenizer unavailable ({e}). Estimating ~{CHARS_PER_TOKEN} chars/token.")
+                    self._loaded = True
+        return self._processor
+
+    @property
+    def tokenizer(self) -> str:
+        return "sentencepiece" if self.processor is not None else "heuristic"
+
+    def _count(self, text: str) -> int:
+        processor = self.processor
+        if processor is None:
+            return len(text) // CHARS_PER_TOKEN
+        return len(processor.encode(text))
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if len(text) < MEMO_MIN_CHARS:
+            return self._count(text)
+
+        key = hashlib.sha1(text.encode('utf-8')).hexdigest()
+        with self._lock:
+            if key in self._memo:
+                self._memo.move_to_end(key)
+                self.hits += 1
+                return self._memo[key]
+            self.misses += 1
+        tokens = self._count(text)
+        with self._lock:
+            self._memo[key] = tokens
+            if len(self._memo) > self.cache_size:
+                self._memo.popitem(last=False)
+        return tokens
+
+    def count_parts(self, prompt_parts: list) -> int:
+        """Prompt tokens of a multimodal prompt (text parts + a fixed cost per image)."""
+        return sum(self.count(part) if isinstance(part, str) else IMAGE_TOKENS for part in prompt_parts)
+
+    def frame_budget(self, limit: int, text_tokens: int, instruction_tokens: int, max_frames: int, min_frames: int = 0) -> dict:
+        """
+        Splits a prompt token limit between instructions (incl. metadata), text and frames.
+        At least min_frames are always allocated; the text is held to what is left after them
+        (`text_limit`), and `text_over_limit` says how much the caller has to cut.
+        Returns the decision with all its inputs, ready to be put into response stats.
+        """
+        min_frames = min(min_frames, max_frames)
+        remaining = limit - instruction_tokens - text_tokens
+        frames = max(min_frames, min(max_frames, remaining // IMAGE_TOKENS))
+        text_limit = limit - instruction_tokens - frames * IMAGE_TOKENS
+        budget = {
+            "tokenizer": self.tokenizer,
+            "limit": limit,
+            "instruction_tokens": instruction_tokens,
+            "text_tokens": text_tokens,
+            "text_limit": int(text_limit),
+            "text_over_limit": int(max(0, text_tokens - text_limit)),
+            "tokens_per_frame": IMAGE_TOKENS,
+            "min_frames": min_frames,
+            "max_frames": max_frames,
+            "frames": int(frames),
+            "frame_tokens": int(frames) * IMAGE_TOKENS,
+            "unused_tokens": int(max(0, text_limit - text_tokens))
+        }
+        if budget["tokenizer"] == "heuristic":
+            budget["warning"] = HEURISTIC_WARNING
+        return budget
+
+    def stats(self) -> dict:
+        # Read before taking the lock: the first access loads the tokenizer under the same lock
+        tokenizer = self.tokenizer
+        with self._lock:
+            stats = {"tokenizer": tokenizer, "memoized": len(self._memo), "hits": self.hits, "misses": self.misses}
+        if tokenizer == "heuristic":
+            stats["warning"] = HEURISTIC_WARNING
+        return stats
+
+
+# Initialize Global Instance
+token_counter = TokenCounter()
@@ -0,0 +1,317 @@
+import os
+import re
+from bisect import bisect_left, bisect_right
+from collections import Counter
+import ahocorasick
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Approximate matches below this confidence (0-1) are dropped
+ALIGN_MIN_CONFIDENCE = float(os.getenv("ALIGN_MIN_CONFIDENCE", 0.6))
+# Word n-gram size used to seed approximate matches
+ALIGN_NGRAM = 3
+# N-grams occurring more often than this in the transcript are too common to seed from
+ALIGN_MAX_POSTINGS = 50
+# Candidate windows scored per quote (best seeded first)
+ALIGN_CANDIDATES = 3
+# Local alignment scores: match, mismatch, gap
+ALIGN_SCORES = (2, -1, -1)
+# Padding (seconds) around every mapped quote
+CLIP_PADDING_SECONDS = 1.0
+# Clips starting within this many seconds of the previous clip's end are merged
+MERGE_GAP_SECONDS = 3.0
+
+
+def normalize(text: str) -> str:
+    """Lowercase, keep only word characters (punctuation/spacing differences never block a match)."""
+    return re.sub(r'\W+', '', text.lower())
+
+
+class TranscriptIndex:
+    """
+    Alignment index over one video's transcript, built once and shared by all its quotes.
+    Holds the normalized transcript text, each snippet's character offsets and times;
+    character positions map back to times by bisection. Quotes arriving one at a time while
+    the model streams are located with a substring search (map_quote); a finished batch is
+    located in a single Aho-Corasick pass over the text (map_quotes).
+    Quotes the LLM paraphrased are aligned approximately: a word n-gram inverted index
+    (built on first use) seeds candidate windows from shared n-grams, and a local
+    alignment over each bounded window picks the span and its confidence.
+    """
+
+    def __init__(self, transcript_data: list):
+        pieces = []
+        self.words = []
+        self.word_offsets = []  # position of each word in the normalized text
+        self._ngrams = None
+        self._aligned = {}  # quote words -> align() result (the batch pass re-maps streamed quotes)
+        self.matches = {"exact": 0, "approximate": 0, "unmatched": 0}
+        self.offsets = []  # snippet i covers text[offsets[i]:ends[i]]
+        self.ends = []
+        self.start_times = []
+        self.end_times = []
+        position = 0
+        for i, chunk in enumerate(transcript_data):
+            text, start, duration = self._fields(chunk)
+            piece = normalize(text)
+            word_offset = position
+            for word in re.findall(r'\w+', text.lower()):
+                self.words.append(word)
+                self.word_offsets.append(word_offset)
+                word_offset += len(word)
+            # Clamp End Time: Use min(start + duration, next_start)
+            end = start + duration
+            if i + 1 < len(transcript_data):
+                end = min(end, self._fields(transcript_data[i + 1])[1])
+            pieces.append(piece)
+            self.offsets.append(position)
+            position += len(piece)
+            self.ends.append(position)
+            self.start_times.append(start)
+            self.end_times.append(end)
+        self.text = "".join(pieces)
+
+    @staticmethod
+    def _fields(chunk) -> tuple:
+        # Handle both object (FetchedTranscriptSnippet) and dict access
+        if hasattr(chunk, 'text'):
+            return chunk.text, chunk.start, chunk.duration
+        return chunk.get('text', ''), chunk.get('start', 0.0), chunk.get('duration', 0.0)
+
+    def span_to_times(self, match_start: int, match_end: int) -> tuple:
+        """(start, end) seconds of text[match_start:match_end]; the end is interpolated inside its snippet."""
+        # Last snippet starting at or before the match (empty snippets share the next one's offset)
+        first = bisect_right(self.offsets, match_start) - 1
+        # First snippet reaching the end of the match
+        last = min(bisect_left(self.ends, match_end), len(self.ends) - 1)
+        length = self.ends[last] - self.offsets[last]
+        if length > 0:
+            ratio = (match_end - self.offsets[last]) / length
+            t_end = self.start_times[last] + (self.end_times[last] - self.start_times[last]) * ratio
+        else:
+            t_end = self.end_times[last]
+        return self.start_times[first], t_end
+
+    def find_all(self, targets: list) -> dict:
+        """First position of every (normalized) target in the transcript, in one pass over the text."""
+        automaton = ahocorasick.Automaton()
+        for target in set(targets):
+            if target:
+                automaton.add_word(target, len(target))
+        if not len(automaton) or not self.text:
+            return {}
+        automaton.make_automaton()
+
+        found = {}
+        for end, length in automaton.iter(self.text):
+            target = self.text[end - length + 1:end + 1]
+            if target not in found:
+                found[target] = end - length + 1
+                if len(found) == len(automaton):
+                    break
+        return found
+
+    @property
+    def ngrams(self) -> dict:
+        """Inverted index: word n-gram -> word positions where it starts."""
+        if self._ngrams is None:
+            self._ngrams = {}
+            for i in range(len(self.words) - ALIGN_NGRAM + 1):
+                self._ngrams.setdefault(tuple(self.words[i:i + ALIGN_NGRAM]), []).append(i)
+        return self._ngrams
+
+    def _candidates(self, quote_words: list) -> list:
+        """Likely start positions (in words) of the quote, from n-grams it shares with the transcript."""
+        votes = Counter()
+        for j in range(len(quote_words) - ALIGN_NGRAM + 1):
+            postings = self.ngrams.get(tuple(quote_words[j:j + ALIGN_NGRAM]), ())
+            if len(postings) > ALIGN_MAX_POSTINGS:
+                continue
+            for i in postings:
+                # Vote for the diagonal (where the quote would start), in buckets of a few words
+                votes[(i - j) // ALIGN_NGRAM] += 1
+        return [bucket * ALIGN_NGRAM for bucket, _ in votes.most_common(ALIGN_CANDIDATES)]
+
+    def _align(self, quote_words: list, lo: int, hi: int) -> tuple:
+        """
+        Local alignment (Smith-Waterman) of the quote against words[lo:hi].
+        Returns (confidence, first word, last word); confidence = 2 * matched / (quote + span) words.
+        """
+        match, mismatch, gap = ALIGN_SCORES
+        window = self.words[lo:hi]
+        rows, cols = len(quote_words) + 1, len(window) + 1
+        score = [[0] * cols for _ in range(rows)]
+        best, best_cell = 0, None
+        for r in range(1, rows):
+            word = quote_words[r - 1]
+            previous, current = score[r - 1], score[r]
+            for c in range(1, cols):
+                value = max(
+                    0,
+                    previous[c - 1] + (match if window[c - 1] == word else mismatch),
+                    previous[c] + gap,
+                    current[c - 1] + gap
+                )
+                current[c] = value
+                if value > best:
+                    best, best_cell = value, (r, c)
+        if best_cell is None:
+            return 0.0, None, None
+
+        # Trace back to the start of the aligned span, counting matched words
+        r, c = best_cell
+        matched = 0
+        while r > 0 and c > 0 and score[r][c] > 0:
+            value = score[r][c]
+            if window[c - 1] == quote_words[r - 1] and value == score[r - 1][c - 1] + match:
+                matched += 1
+                r, c = r - 1, c - 1
+            elif value == score[r - 1][c - 1] + mismatch:
+                r, c = r - 1, c - 1
+            elif value == score[r - 1][c] + gap:
+                r -= 1
+            else:
+                c -= 1
+        first, last = lo + c, lo + best_cell[1] - 1
+        confidence = 2 * matched / (len(quote_words) + last - first + 1)
+        return confidence, first, last
+
+    def align(self, quote: str) -> tuple:
+        """Best approximate (start char, end char, confidence) of the quote, or None (also for quotes shorter than an n-gram)."""
+        quote_words = re.findall(r'\w+', quote.lower())
+        if len(quote_words) < ALIGN_NGRAM or not self.words:
+            return None
+        key = tuple(quote_words)
+        if key not in self._aligned:
+            self._aligned[key] = self._align_words(quote_words)
+        return self._aligned[key]
+
+    def _align_words(self, quote_words: list):
+        best = (0.0, None, None)
+        slack = len(quote_words) // 2 + ALIGN_NGRAM
+        for start in self._candidates(quote_words):
+            lo = max(0, start - slack)
+            hi = min(len(self.words), start + len(quote_words) + slack)
+            best = max(best, self._align(quote_words, lo, hi), key=lambda result: result[0])
+        confidence, first, last = best
+        if first is None:
+            return None
+        return self.word_offsets[first], self.word_offsets[last] + len(self.words[last]), confidence
+
+    def _clip(self, quote: str, match_start: int, match_end: int, confidence: float) -> dict:
+        t_start, t_end = self.span_to_times(match_start, match_end)
+        final_start = max(0, t_start - CLIP_PADDING_SECONDS)
+        final_end = t_end + CLIP_PADDING_SECONDS
+        return {
+            "text": quote,
+            "start": round(final_start, 2),
+            "end": round(final_end, 2),
+            "duration": round(final_end - final_start, 2),
+            "confidence": round(confidence, 2)
+        }
+
+    def _approximate_clip(self, quote: str, target: str, min_confidence: float):
+        aligned = self.align(quote) if target else None
+        if aligned is None or aligned[2] < min_confidence:
+            self.matches["unmatched"] += 1
+            return None
+        self.matches["approximate"] += 1
+        return self._clip(quote, *aligned)
+
+    def map_quote(self, quote: str, min_confidence: float = ALIGN_MIN_CONFIDENCE):
+        """Highlight clip for one quote (see map_quotes); for quotes arriving one at a time."""
+        target = normalize(quote)
+        match_start = self.text.find(target) if target else -1
+        if match_start == -1:
+            return self._approximate_clip(quote, target, min_confidence)
+        self.matches["exact"] += 1
+        return self._clip(quote, match_start, match_start + len(target), 1.0)
+
+    def map_quotes(self, quotes: list, min_confidence: float = ALIGN_MIN_CONFIDENCE) -> list:
+        """
+        Highlight clips ({"text", "start", "end", "duration", "confidence"}) for a list of quote
+        strings, in the same order; None where a quote could not be aligned with enough confidence.
+        Verbatim matches have confidence 1.0; the rest go through the approximate aligner.
+        """
+        targets = [normalize(quote) for quote in quotes]
+        positions = self.find_all(targets)
+
+        clips = []
+        for quote, target in zip(quotes, targets):
+            if target in positions:
+                self.matches["exact"] += 1
+                clips.append(self._clip(quote, positions[target], positions[target] + len(target), 1.0))
+            else:
+                clips.append(self._approximate_clip(quote, target, min_confidence))
+        return clips
+
+
+class HighlightCollector:
+    """
+    Accumulates highlight clips while quotes stream in (mapping overlaps generation).
+    Repeated quotes (same normalized text or contained in another, e.g. from chunk overlap)
+    keep a single clip; merged() consolidates overlapping clips at any point.
+    Once extraction is done, finalize() re-maps every collected quote in one batch pass.
+    """
+
+    def __init__(self, index: TranscriptIndex):
+        self.index = index
+        self.quotes = []  # every distinct quote seen, in arrival order
+        self.clips = {}  # normalized quote -> clip
+        self.unmapped = []
+
+    def add(self, quote: str):
+        """Maps one quote; returns its clip, or None if it was a repeat or could not be mapped."""
+        target = normalize(quote)
+        if not target:
+            return None
+        if target not in {normalize(seen) for seen in self.quotes}:
+            self.quotes.append(quote)
+        if any(target in other for other in self.clips):
+            return None
+        clip = self.index.map_quote(quote)
+        if clip is None:
+            self.unmapped.append(quote)
+            return None
+        self._keep(target, clip)
+        return clip
+
+    def _keep(self, target: str, clip: dict):
+        # A longer quote replaces the shorter ones it contains
+        for other in [other for other in self.clips if other in target]:
+            del self.clips[other]
+        self.clips[target] = clip
+
+    def finalize(self, min_confidence: float = ALIGN_MIN_CONFIDENCE) -> list:
+        """
+        Re-maps all collected quotes with TranscriptIndex.map_quotes (one Aho-Corasick pass;
+        approximate alignments computed while streaming are reused) and returns merged().
+        The index's match counters are reset so they describe this final mapping.
+        """
+        self.index.matches = {"exact": 0, "approximate": 0, "unmatched": 0}
+        self.clips, self.unmapped = {}, []
+        # Longest first, so contained repeats are dropped exactly as add() would
+        ordered = sorted(self.quotes, key=lambda quote: -len(normalize(quote)))
+        for quote, clip in zip(ordered, self.index.map_quotes(ordered, min_confidence)):
+            target = normalize(quote)
+            if clip is None:
+                self.unmapped.append(quote)
+            elif not any(target in other for other in self.clips):
+                self._keep(target, clip)
+        return self.merged()
+
+    def merged(self, gap_seconds: float = MERGE_GAP_SECONDS) -> list:
+        """Clips sorted by time, with clips closer than gap_seconds merged into one (copies, the collector keeps its clips)."""
+        # SMART MERGE: Consolidate Overlapping Headers
+        merged = []
+        for clip in sorted(self.clips.values(), key=lambda x: x['start']):
+            if merged and clip['start'] <= merged[-1]['end'] + gap_seconds:
+                current = merged[-1]
+                current['end'] = max(current['end'], clip['end'])
+                current['text'] += " " + clip['text']
+                current['duration'] = current['end'] - current['start']
+                current['confidence'] = min(current['confidence'], clip['confidence'])
+            else:
+                merged.append(dict(clip))
+        return merged
@@ -5,8 +5,35 @@ import cv2
 import numpy as np
 import yt_dlp
 import uuid
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dotenv import load_dotenv
 from youtube_transcript_api import YouTubeTranscriptApi, TranscriptsDisabled, NoTranscriptFound
-from services.summarization import summarize_text_cloud as summarize_text, extract_key_quotes_local, summarize_visual_fallback
+from services.concurrency import limiters
+from services.summarization import summarize_text_cloud_stream, extract_key_quotes_local_stream, summarize_visual_fallback_stream, collect_result, compress_transcript, summarize_segments_stream, cloud_prompt_tokens
+from services.token_budget import token_counter, IMAGE_TOKENS
+from services.quota import load_quotas
+from services.cloud_dispatch import CLOUD_MODELS
+from services.transcript_index import TranscriptIndex, HighlightCollector, ALIGN_MIN_CONFIDENCE
+
+load_dotenv()
+
+# Long-video mode: videos at least this long are summarized per segment, then reduced
+LONG_VIDEO_SECONDS = float(os.getenv("LONG_VIDEO_SECONDS", 3600))
+# Segment length when the video has no chapters (chapters shorter than half of this are merged)
+LONG_VIDEO_WINDOW_SECONDS = float(os.getenv("LONG_VIDEO_WINDOW_SECONDS", 1200))
+LONG_VIDEO_MAX_SEGMENTS = int(os.getenv("LONG_VIDEO_MAX_SEGMENTS", 12))
+# Segments summarized concurrently (the cloud limiter/quota ledger still apply per call)
+LONG_VIDEO_MAX_PARALLEL = int(os.getenv("LONG_VIDEO_MAX_PARALLEL", 4))
+# Frames taken from inside each segment's time range
+SEGMENT_FRAMES = int(os.getenv("SEGMENT_FRAMES", 4))
+# Per-segment transcript budget (tokens), also capped so one segment prompt (text, frames and
+# instructions) fits the primary cloud model's tokens-per-minute quota
+SEGMENT_MAX_TOKENS = int(os.getenv("SEGMENT_MAX_TOKENS", 12000))
+SEGMENT_MIN_TOKENS = int(os.getenv("SEGMENT_MIN_TOKENS", 1000))
+# Segment calls wait up to this long for the primary model's token bucket to refill
+# before spilling over to the next cloud model
+SEGMENT_QUOTA_WAIT_SECONDS = float(os.getenv("SEGMENT_QUOTA_WAIT_SECONDS", 120))
 
 class VideoService:
 
@@ -32,7 +59,8 @@ class VideoService:
             }
             
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
+                with limiters["ytdlp"].slot("extract_info"):
+                    info = ydl.extract_info(url, download=False)
                 stream_url = info.get('url')
                 if stream_url: return stream_url
                 if 'formats' in info:
@@ -43,10 +71,10 @@ class VideoService:
             print(f"[WARN] Stream resolution failed: {e}")
             return None
 
-    def extract_frames_from_stream(self, stream_url: str, num_frames: int = 30, check_cancel=None) -> list:
+    def extract_frames_from_stream(self, stream_url: str, num_frames: int = 30, check_cancel=None, start_seconds: float = None, end_seconds: float = None) -> list:
         """
         Streams frames directly from the URL via OpenCV.
-        Zero disk usage.
+        Zero disk usage. start_seconds/end_seconds limit sampling to one time range.
         """
         import PIL.Image
         frames = []
@@ -66,10 +94,17 @@ class VideoService:
                  # Fallback: Capture first 30 frames if length unknown
                  total_frames = 3000 # Guess
                  
-            interval = max(1, total_frames // num_frames)
+            first_frame, last_frame = 0, total_frames
+            if start_seconds is not None or end_seconds is not None:
+                fps = cap.get(cv2.CAP_PROP_FPS) or 30
+                first_frame = min(total_frames, int((start_seconds or 0) * fps))
+                if end_seconds is not None:
+                    last_frame = min(total_frames, int(end_seconds * fps))
+
+            interval = max(1, (last_frame - first_frame) // num_frames)
             print(f"[STREAM-EXTRACT] Stream Open. Extracting ~{num_frames} frames...")
 
-            for i in range(0, total_frames, interval):
+            for i in range(first_frame, last_frame, interval):
                 if check_cancel: check_cancel()
                 cap.set(cv2.CAP_PROP_POS_FRAMES, i)
                 ret, frame = cap.read()
@@ -89,117 +124,6 @@ class VideoService:
             print(f"[ERROR] Stream frame extraction error: {e}")
             return []
 
-    def _map_quote_to_timestamps(self, quote: str, transcript_data: list) -> dict:
-        """
-        Reverse-Engineers timestamps by matching the quote against the transcript chunks.
-        """
-        # 1. Normalize Helper
-        def normalize(s):
-            return re.sub(r'\W+', '', s.lower())
-
-        target = normalize(quote)
-        if not target: return None
-        
-        # 2. Build Global Text & Map
-        full_text = ""
-        chunk_map = [] 
-        
-        current_idx = 0
-        for i, chunk in enumerate(transcript_data):
-            # Handle both object (FetchedTranscriptSnippet) and dict access
-            if hasattr(chunk, 'text'):
-                 c_text_raw = chunk.text
-                 c_start = chunk.start
-                 c_dur = chunk.duration
-            else:
-                 c_text_raw = chunk.get('text', '')
-                 c_start = chunk.get('start', 0.0)
-                 c_dur = chunk.get('duration', 0.0)
-
-            c_text = normalize(c_text_raw)
-            
-            # Clamp End Time: Use min(start + duration, next_start)
-            c_end = c_start + c_dur
-            if i + 1 < len(transcript_data):
-                next_chunk = transcript_data[i+1]
-                if hasattr(next_chunk, 'start'):
-                    next_start = next_chunk.start
-                else:
-                    next_start = next_chunk.get('start', 0.0)
-                
-                # If overlap exists, clamp to next start
-                if c_end > next_start:
-                    c_end = next_start
-
-            start_idx = current_idx
-            end_idx = current_idx + len(c_text)
-            
-            chunk_map.append({
-                "start_idx": start_idx,
-                "end_idx": end_idx,
-                "timestamp_start": c_start,
-                "timestamp_end": c_end
-            })
-            
-            full_text += c_text
-            current_idx = end_idx
-            
-        # 3. Find Matches
-        match_start = full_text.find(target)
-        
-        # Fallback: fuzzy-ish
-        if match_start == -1:
-            match_start = full_text.find(target[:50])
-            
-        if match_start == -1:
-            return None 
-            
-        match_end = match_start + len(target)
-        
-        # 4. Map to Timestamps
-        t_start = -1.0
-        t_end = -1.0
-        
-        found_start = False
-        
-        for mapping in chunk_map:
-            if not found_start and match_start >= mapping['start_idx'] and match_start < mapping['end_idx']:
-                t_start = mapping['timestamp_start']
-                found_start = True
-            
-            if found_start:
-                # Calculate Proportional End Time
-                # If the quote ends in the middle of this chunk, we shouldn't take the full duration.
-                if mapping['end_idx'] >= match_end:
-                    # Calculate how much of this chunk is actually used
-                    chunk_text_len = mapping['end_idx'] - mapping['start_idx']
-                    overlap_len = match_end - mapping['start_idx']
-                    
-                    if chunk_text_len > 0:
-                        ratio = overlap_len / chunk_text_len
-                        chunk_duration = mapping['timestamp_end'] - mapping['timestamp_start']
-                        # Refined end time
-                        t_end = mapping['timestamp_start'] + (chunk_duration * ratio)
-                    else:
-                        t_end = mapping['timestamp_end']
-                    
-                    break # Reached the end
-                else:
-                    t_end = mapping['timestamp_end'] # We used the whole chunk
-        
-        if t_start == -1.0: return None
-        
-        # 5. Apply Buffers
-        final_start = max(0, t_start - 1.0) 
-        final_end = t_end + 1.0 
-        
-        return {
-            "text": quote,
-            "start": round(final_start, 2),
-            "end": round(final_end, 2),
-            "duration": round(final_end - final_start, 2)
-        }
-
     def get_metadata(self, url: str) -> dict:
         """
         Safely fetches video metadata (Title, Category, Tags, Description, Uploader).
@@ -211,7 +135,8 @@ class VideoService:
                 'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36'
             }
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
+                with limiters["ytdlp"].slot("extract_info"):
+                    info = ydl.extract_info(url, download=False)
                 
                 title = info.get('title')
                 if not title: title = f"Video {info.get('id', 'Unknown')}"
@@ -248,7 +173,12 @@ class VideoService:
                     "tags": info.get('tags', [])[:10],
                     "description": info.get('description', '')[:500],
                     "available_qualities": filtered_qualities,
-                    "quality_bitrates": quality_data
+                    "quality_bitrates": quality_data,
+                    "duration": info.get('duration'),
+                    "chapters": [
+                        {"start": c.get('start_time', 0), "end": c.get('end_time', 0), "title": c.get('title', '')}
+                        for c in (info.get('chapters') or [])
+                    ]
                 }
         except Exception as e:
             print(f"[WARN] Metadata fetch failed: {e}")
@@ -286,11 +216,159 @@ class VideoService:
 
 
 
-    def process_video_url(self, url: str, length: str, style: str, task: str = "summary", check_cancel=None) -> dict:
+    def plan_segments(self, transcript_data: list, metadata: dict) -> list:
+        """
+        Long-video segments [{"start", "end", "title"}]: YouTube chapters when available
+        (short chapters merged into their neighbour), otherwise fixed time windows.
+        """
+        duration = metadata.get("duration") or (transcript_data[-1].start + transcript_data[-1].duration)
+        chapters = [c for c in metadata.get("chapters", []) if c["end"] > c["start"]]
+
+        segments = []
+        if len(chapters) >= 2:
+            for chapter in chapters:
+                if segments and segments[-1]["end"] - segments[-1]["start"] < LONG_VIDEO_WINDOW_SECONDS / 2:
+                    segments[-1]["end"] = chapter["end"]
+                    segments[-1]["title"] += f" / {chapter['title']}"
+                else:
+                    segments.append(dict(chapter))
+        else:
+            window = max(LONG_VIDEO_WINDOW_SECONDS, duration / LONG_VIDEO_MAX_SEGMENTS)
+            start = 0.0
+            while start < duration:
+                segments.append({"start": start, "end": min(duration, start + window), "title": ""})
+                start += window
+
+        # Too many segments: merge neighbours pairwise until under the cap
+        while len(segments) > LONG_VIDEO_MAX_SEGMENTS:
+            merged = []
+            for i in range(0, len(segments), 2):
+                pair = segments[i:i + 2]
+                titles = " / ".join(seg["title"] for seg in pair if seg["title"])
+                merged.append({"start": pair[0]["start"], "end": pair[-1]["end"], "title": titles})
+            segments = merged
+        segments[-1]["end"] = max(segments[-1]["end"], duration)
+
+        # A short trailing segment is not worth its own cloud call: fold it into the previous one
+        if len(segments) > 1 and segments[-1]["end"] - segments[-1]["start"] < LONG_VIDEO_WINDOW_SECONDS / 2:
+            last = segments.pop()
+            segments[-1]["end"] = last["end"]
+            if last["title"]:
+                segments[-1]["title"] = " / ".join(title for title in (segments[-1]["title"], last["title"]) if title)
+        return segments
+
+    def segment_token_budget(self, frames: int, metadata: dict) -> int:
+        """
+        Transcript tokens for one segment prompt. Concurrent segments are not split statically:
+        each call waits for the primary model's token bucket (SEGMENT_QUOTA_WAIT_SECONDS).
+        """
+        tpm = load_quotas().get(CLOUD_MODELS[0], {}).get("tpm")
+        budget = SEGMENT_MAX_TOKENS
+        if tpm:
+            budget = min(budget, tpm - frames * IMAGE_TOKENS - cloud_prompt_tokens(metadata, "medium", "paragraph"))
+        return max(SEGMENT_MIN_TOKENS, budget)
+
+    def _summarize_segment(self, index: int, segment: dict, transcript_data: list, stream_url: str, metadata: dict, check_cancel=None, force_new: bool = False) -> dict:
+        """Map step: summarize one segment's transcript with the frames from its time range."""
+        start = time.perf_counter()
+        text = " ".join(item.text for item in transcript_data if segment["start"] <= item.start < segment["end"])
+        if not text.strip():
+            return {"summary": "", "seconds": 0.0, "model": None}
+
+        frames = []
+        if stream_url and SEGMENT_FRAMES > 0:
+            frames = self.extract_frames_from_stream(stream_url, SEGMENT_FRAMES, check_cancel, segment["start"], segment["end"])
+
+        segment_metadata = dict(metadata)
+        label = f"Part {index + 1}" + (f": {segment['title']}" if segment["title"] else "")
+        segment_metadata["title"] = f"{metadata.get('title', 'Unknown Title')} ({label})"
+        budget = self.segment_token_budget(len(frames), segment_metadata)
+        text, _ = compress_transcript(text, budget)
+        result = collect_result(summarize_text_cloud_stream(
+            text, length="medium", format_mode="paragraph", images=frames,
+            metadata=segment_metadata, check_cancel=check_cancel, force_new=force_new,
+            quota_wait=SEGMENT_QUOTA_WAIT_SECONDS
+        ))
+        model = result.get("model_used")
+        # A failed call returns its error text as the summary (also after a model started streaming)
+        failed = not model or result["stats"].get("error")
+        return {
+            "summary": "" if failed else result["summary_text"],
+            "model": model,
+            "frames": len(frames),
+            "token_budget": budget,
+            "seconds": round(time.perf_counter() - start, 2)
+        }
+
+    def summarize_long_video_stream(self, transcript_data: list, metadata: dict, stream_url: str, length: str, style: str, check_cancel=None, force_new: bool = False):
+        """
+        Long-video mode: segments (chapters or time windows) are summarized concurrently,
+        each with its own frames, then one reduce call merges them. Wall-clock time follows
+        the slowest segment instead of the total duration.
+        Yields status/token events, then a result event (summary_text, model_used, stats).
+        """
+        start = time.perf_counter()
+        segments = self.plan_segments(transcript_data, metadata)
+        source = "chapters" if len(metadata.get("chapters", [])) >= 2 else "windows"
+        parallel = max(1, min(LONG_VIDEO_MAX_PARALLEL, len(segments)))
+        print(f"[LONG-VIDEO] {len(segments)} segments ({source}), parallel={parallel}.")
+        yield {"type": "status", "stage": "summarizing_segments", "segments": len(segments)}
+
+        notes = [None] * len(segments)
+        with ThreadPoolExecutor(max_workers=parallel) as pool:
+            futures = {
+                pool.submit(self._summarize_segment, i, seg, transcript_data, stream_url, metadata, check_cancel, force_new): i
+                for i, seg in enumerate(segments)
+            }
+            done = 0
+            for future in as_completed(futures):
+                i = futures[future]
+                notes[i] = dict(segments[i], **future.result())
+                done += 1
+                yield {"type": "status", "stage": "segment_done", "done": done, "segments": len(segments)}
+        map_seconds = round(time.perf_counter() - start, 2)
+
+        usable = [n for n in notes if n["summary"]]
+        if not usable:
+            raise Exception("All video segments failed to summarize.")
+
+        yield {"type": "status", "stage": "merging_segments"}
+        reduce_result = None
+        for event in summarize_segments_stream(usable, length, style, metadata, check_cancel, force_new):
+            if event["type"] == "result":
+                reduce_result = event["result"]
+            else:
+                yield event
+
+        reduce_result["stats"]["segments"] = {
+            "source": source,
+            "count": len(segments),
+            "failed": len(segments) - len(usable),
+            "map_seconds": map_seconds,
+            "slowest_segment_seconds": max(n["seconds"] for n in notes),
+            "total_seconds": round(time.perf_counter() - start, 2),
+            "parts": [
+                {"start": n["start"], "end": n["end"], "title": n["title"], "model": n["model"], "token_budget": n.get("token_budget"), "seconds": n["seconds"]}
+                for n in notes
+            ]
+        }
+        yield {"type": "result", "result": reduce_result}
+
+    def process_video_url(self, url: str, length: str, style: str, task: str = "summary", check_cancel=None, force_new: bool = False) -> dict:
         """
         Main Pipeline (Streaming Mode):
         URL -> VideoID -> Transcript -> Metadata -> Stream URL -> Frames -> Summary OR Highlights
         """
+        return collect_result(self.process_video_url_stream(url, length, style, task, check_cancel, force_new))
+
+    def process_video_url_stream(self, url: str, length: str, style: str, task: str = "summary", check_cancel=None, force_new: bool = False):
+        """
+        Generator version of process_video_url.
+        Yields status/token events while the summary is generated (for the highlights task,
+        {"type": "highlights", ...} events with the provisionally merged clips after each
+        transcript chunk), then one {"type": "result", "result": {...}} event with the same
+        payload process_video_url returns.
+        """
         if check_cancel: check_cancel()
         
         images = []
@@ -310,36 +388,48 @@ class VideoService:
                 print(f"[VIDEO-SERVICE] No Transcript Found. Switching to VISUAL FALLBACK MODE.")
             
             # 2. Metadata
+            yield {"type": "status", "stage": "fetching_metadata"}
             metadata = self.get_metadata(url)
             print(f"[VIDEO-SERVICE] Metadata: {metadata['title']} ({metadata['category']})")
 
             # 3. Visual Stream (Smart Token Budgeting)
             # Goal: Maximize Context within 15k Token Limit
             # Priority: Metadata + Transcript > Frames
+            # Counts come from the cloud tokenizer (memoized per text, see TokenCounter)
             TOKEN_LIMIT = 15000
-            TOKENS_PER_IMAGE = 260
+            MAX_FRAMES = 30 # Limit for Gemma 3 27B is 32 images
+            MIN_FRAMES = 8 # Frames always left room for after compression
+            instruction_tokens = cloud_prompt_tokens(metadata, length, style)
+            text_tokens = token_counter.count(transcript_text)
             
-            # Estimate Text Tokens (approx 4 chars/token)
-            text_content = transcript_text + str(metadata)
-            estimated_text_tokens = len(text_content) / 4
+            # Pre-flight compression: an over-budget transcript would be rejected (429),
+            # so keep its highest-value sentences (time order) until the prompt fits
+            duration = metadata.get("duration") or (transcript_data[-1].start + transcript_data[-1].duration if transcript_present else 0)
+            long_video = task == "summary" and transcript_present and duration >= LONG_VIDEO_SECONDS
+            compression = None
+            token_budget = token_counter.frame_budget(TOKEN_LIMIT, text_tokens, instruction_tokens, MAX_FRAMES, MIN_FRAMES)
+            if task == "summary" and transcript_present and not long_video and token_budget["text_over_limit"]:
+                yield {"type": "status", "stage": "compressing_transcript"}
+                full_transcript_text = transcript_text
+                transcript_text, compression = compress_transcript(transcript_text, token_budget["text_limit"])
+                text_tokens = compression["tokens_after"]
+                token_budget = token_counter.frame_budget(TOKEN_LIMIT, text_tokens, instruction_tokens, MAX_FRAMES, MIN_FRAMES)
             
             # --- VALIDATION CHECK ---
-            if estimated_text_tokens > TOKEN_LIMIT:
-                print(f"[WARN] Video Long: Estimated {int(estimated_text_tokens)} text tokens. Proceeding with chunking for highlights.")
+            if text_tokens + instruction_tokens > TOKEN_LIMIT:
+                print(f"[WARN] Video Long: {text_tokens + instruction_tokens} prompt tokens. Proceeding with chunking for highlights.")
 
-            remaining_tokens = TOKEN_LIMIT - estimated_text_tokens
-            max_frames = 0
+            max_frames = token_budget["frames"]
             
             # VISUAL FALLBACK: If no transcript, prioritize visual frames
             if not transcript_present:
-                print("[TOKEN-BUDGET] Visual Fallback: Maximizing Frame Count (Limit 30).")
-                max_frames = 30 # Limit for Gemma 3 27B is 32 images
-            elif remaining_tokens > 0:
-                max_frames = int(remaining_tokens // TOKENS_PER_IMAGE)
-                # Cap at 30 frames max to avoid overload even if budget allows
-                max_frames = min(max_frames, 30)
+                print(f"[TOKEN-BUDGET] Visual Fallback: Maximizing Frame Count (Limit {MAX_FRAMES}).")
+                max_frames = token_budget["frames"] = MAX_FRAMES
+                token_budget["frame_tokens"] = MAX_FRAMES * IMAGE_TOKENS
+                token_budget["text_limit"] = TOKEN_LIMIT - instruction_tokens - token_budget["frame_tokens"]
+                token_budget["unused_tokens"] = max(0, token_budget["text_limit"])
             
-            print(f"[TOKEN-BUDGET] Text: ~{int(estimated_text_tokens)} tokens | Remaining: {int(remaining_tokens)} | Allocated Frames: {max_frames}")
+            print(f"[TOKEN-BUDGET] Text: {text_tokens} | Instructions: {instruction_tokens} | Unused: {token_budget['unused_tokens']} | Allocated Frames: {max_frames} ({token_budget['tokenizer']})")
 
             # Initialize Variables
             images = []
@@ -361,35 +451,28 @@ class VideoService:
                     # 4a. Generate Highlights (Local Trace-Based)
                     print("[VIDEO-SERVICE] Generating Local Text Highlights (Trace-Based)...")
                     
-                    # Use local model to get verbatim quotes
-                    raw_quotes = extract_key_quotes_local(transcript_text, metadata, check_cancel=check_cancel)
-                    print(f"[VIDEO-SERVICE] Extracted {len(raw_quotes)} raw quotes. Mapping timestamps...")
-                    
-                    # Map quotes to timestamps
-                    mapped_highlights = []
-                    for item in raw_quotes:
-                        quote = item.get("quote", "")
-                        mapped = self._map_quote_to_timestamps(quote, transcript_data)
-                        if mapped:
-                            mapped_highlights.append(mapped)
+                    # Use local model to get verbatim quotes. Each quote is mapped to its timestamps as
+                    # soon as the model closes it (one alignment index per video; paraphrased quotes are
+                    # aligned approximately and carry a confidence), so mapping overlaps generation
+                    quote_stats = {}
+                    transcript_index = TranscriptIndex(transcript_data)
+                    collector = HighlightCollector(transcript_index)
+                    raw_quotes = 0
+                    for event in extract_key_quotes_local_stream(transcript_text, metadata, check_cancel=check_cancel, force_new=force_new, stats=quote_stats):
+                        if event["type"] == "quote":
+                            raw_quotes += 1
+                            collector.add(event["quote"].get("quote", ""))
                         else:
-                            print(f"[WARN] Could not map quote to timestamp: {quote[:50]}...")
-                    
-                    # SMART MERGE: Consolidate Overlapping Headers
-                    mapped_highlights.sort(key=lambda x: x['start'])
-                    
-                    final_highlights = []
-                    if mapped_highlights:
-                        current_clip = mapped_highlights[0]
-                        for next_clip in mapped_highlights[1:]:
-                            if next_clip['start'] <= current_clip['end'] + 3.0:
-                                current_clip['end'] = max(current_clip['end'], next_clip['end'])
-                                current_clip['text'] += " " + next_clip['text']
-                                current_clip['duration'] = current_clip['end'] - current_clip['start']
-                            else:
-                                final_highlights.append(current_clip)
-                                current_clip = next_clip
-                        final_highlights.append(current_clip)
+                            # Progressive highlights: everything mapped so far, provisionally merged,
+                            # so the player can start before the last chunk is done
+                            yield {"type": "highlights", "done": event["done"], "chunks": event["chunks"], "highlights": collector.merged()}
+                    result["model_used"] = ", ".join(quote_stats.get("models", [])) or None
+                    # Final mapping: all quotes at once in one Aho-Corasick pass over the transcript
+                    final_highlights = collector.finalize()
+                    for quote in collector.unmapped:
+                        print(f"[WARN] Could not map quote to timestamp: {quote[:50]}...")
+                    print(f"[VIDEO-SERVICE] Extracted {raw_quotes} raw quotes, mapped {len(collector.clips)}.")
+                    result["stats"]["alignment"] = dict(transcript_index.matches, min_confidence=ALIGN_MIN_CONFIDENCE)
                     
                     # Pass structured highlights to frontend
                     result["highlights"] = final_highlights
@@ -414,47 +497,82 @@ class VideoService:
                         "details": "Highlights require a transcript, which is not available for this video. Please try the 'Summary' mode for a visual analysis."
                     }]
                 
-                return result
+                yield {"type": "result", "result": result}
+                return
 
             # 5. SUMMARY TASK (Multimodal)
             # Only fetch stream/frames if we need them for summary (or visual fallback)
             stream_url = self.get_stream_url(url)
+
+            if long_video:
+                # 5a. Long video: per-segment map (frames per time range) + reduce
+                for event in self.summarize_long_video_stream(transcript_data, metadata, stream_url, length, style, check_cancel, force_new):
+                    if event["type"] == "result":
+                        result.update(event["result"])
+                    else:
+                        yield event
+                result["stats"]["original"] = {
+                    "words": len(transcript_text.split()),
+                    "sentences": transcript_text.count('.'),
+                    "chars": len(transcript_text)
+                }
+                yield {"type": "result", "result": result}
+                return
             
             # Logic Update: Allow frames if task is summary OR if transcripts are missing (visual fallback)
             should_extract_frames = (task == "summary") or (not transcript_present)
             
             if stream_url and should_extract_frames and max_frames > 0:
+                yield {"type": "status", "stage": "extracting_frames"}
                 images = self.extract_frames_from_stream(stream_url, num_frames=max_frames, check_cancel=check_cancel)
             
             if task == "summary":
+                yield {"type": "status", "stage": "summarizing"}
                 # Summarize (Multimodal + Rich Context)
                 if transcript_present:
-                    summary_result = summarize_text(
+                    summary_events = summarize_text_cloud_stream(
                         transcript_text, 
                         length=length, 
                         format_mode=style,
                         images=images,
                         metadata=metadata,
-                        check_cancel=check_cancel
+                        check_cancel=check_cancel,
+                        force_new=force_new
                     )
                 else:
                     # Visual Fallback
                     print("[VIDEO-SERVICE] Calling Visual Fallback Summary...")
-                    summary_result = summarize_visual_fallback(
+                    summary_events = summarize_visual_fallback_stream(
                         images=images,
                         metadata=metadata,
                         length=length,
                         format_mode=style,
-                        check_cancel=check_cancel
+                        check_cancel=check_cancel,
+                        force_new=force_new
                     )
-                    
-                result.update(summary_result) # Merges summary_text and stats
+                
+                for event in summary_events:
+                    if event["type"] == "result":
+                        result.update(event["result"]) # Merges summary_text and stats
+                    else:
+                        yield event
+
+                if compression:
+                    # Report the full transcript, not the compressed prompt
+                    result["stats"]["original"] = {
+                        "words": len(full_transcript_text.split()),
+                        "sentences": full_transcript_text.count('.'),
+                        "chars": len(full_transcript_text)
+                    }
+                    result["stats"]["compression"] = compression
+                token_budget["frames_extracted"] = len(images)
+                result["stats"]["token_budget"] = token_budget
 
-            return result
+            yield {"type": "result", "result": result}
 
         except Exception as e:
             print(f"[VIDEO-SERVICE] Error: {e}")
-            return {"error": str(e)}
+            yield {"type": "result", "result": {"error": str(e)}}
 
 
 
@@ -531,7 +649,11 @@ class VideoService:
                 # This avoids Windows asyncio loop issues with subprocesses
                 def run_dl():
                     import subprocess
-                    return subprocess.run(cmd, capture_output=True)
+                    with limiters["ytdlp"].slot("download") as slot:
+                        result = subprocess.run(cmd, capture_output=True)
+                        if result.returncode != 0:
+                            slot.fail(throttled=b"429" in result.stderr)
+                        return result
                 
                 result = await asyncio.to_thread(run_dl)
                 
@@ -0,0 +1,14 @@
+from database import engine, Base
+from sqlalchemy import text
+
+def add_degraded_column():
+    with engine.connect() as conn:
+        try:
+            conn.execute(text("ALTER TABLE history ADD COLUMN degraded BOOLEAN DEFAULT FALSE"))
+            conn.commit()
+            print("Successfully added 'degraded' column.")
+        except Exception as e:
+            print(f"Error (might already exist): {e}")
+
+if __name__ == "__main__":
+    add_degraded_column()
@@ -0,0 +1,14 @@
+from database import engine, Base
+from sqlalchemy import text
+
+def add_model_used_column():
+    with engine.connect() as conn:
+        try:
+            conn.execute(text("ALTER TABLE history ADD COLUMN model_used VARCHAR(100) NULL"))
+            conn.commit()
+            print("Successfully added 'model_used' column.")
+        except Exception as e:
+            print(f"Error (might already exist): {e}")
+
+if __name__ == "__main__":
+    add_model_used_column()
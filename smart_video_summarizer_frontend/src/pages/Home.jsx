@@ -867,7 +867,7 @@ export default function Home() {
                                                     </div>
                                                 )}
                                                 {summary && (
-                                                    summary === "The video is too long. Please try a shorter length video." ? (
+                                                    (summary.startsWith("Cloud models are busy") || summary.startsWith("The request exceeds every cloud model's token limit")) ? (
                                                         <motion.div
                                                             initial={{ opacity: 0, scale: 0.95 }}
                                                             animate={{ opacity: 1, scale: 1 }}
@@ -878,7 +878,7 @@ export default function Home() {
                                                                     <span className="text-3xl">⚠️</span>
                                                                 </div>
                                                                 <h3 className="text-xl font-black text-red-600 dark:text-red-400">
-                                                                    Video Too Long
+                                                                    {summary.startsWith("Cloud models are busy") ? "Cloud Models Busy" : "Video Too Long"}
                                                                 </h3>
                                                                 <p className="text-red-700 dark:text-red-300 font-medium text-lg max-w-md mx-auto">
                                                                     {summary}